@@ -0,0 +1,150 @@
+"""
+asyncio streaming codecs:
+
+    async for building in Building.aiter_decode(reader):
+        ...
+    await Building.aencode_to(writer, buildings)
+
+records are framed as newline delimited json(`framing='ndjson'`), or prefixed by
+their size as a 4 bytes big endian integer(`framing='length'`).
+
+data is read in chunks into one buffer, from which all the complete records are
+decoded before the consumed part is dropped at once, and encoded records are
+batched into one buffer before being written.
+a record longer than `max_frame` bytes is rejected before being buffered whole.
+"""
+from json import dumps, loads
+import asyncio
+import struct
+import typing as t
+
+length_prefix = struct.Struct('>I')
+default_chunk_size = 64 * 1024
+default_max_frame = 64 * 1024 * 1024
+# records decoded/encoded between two yields to the event loop.
+default_yield_every = 100
+framings = ('ndjson', 'length')
+
+
+def get_encoder(typ: type) -> t.Callable[[t.Any], bytes]:
+    to_json = getattr(typ, 'to_json', None)
+    if to_json is not None:
+        return to_json
+    to_dict = typ.to_dict
+
+    def encode(obj) -> bytes:
+        return dumps(to_dict(obj), separators=(',', ':')).encode()
+
+    return encode
+
+
+def check_framing(framing: str):
+    if framing not in framings:
+        raise ValueError(
+            f'unknown framing {framing!r}, expected one of {framings}.')
+
+
+async def aiter_decode(typ: type,
+                       reader: asyncio.StreamReader,
+                       framing: str = 'ndjson',
+                       chunk_size: int = default_chunk_size,
+                       yield_every: int = default_yield_every,
+                       max_frame: int = default_max_frame):
+    check_framing(framing)
+    from_dict = typ.from_dict
+    buf = bytearray()
+    find = buf.find
+    n = 0
+    # where to look for the next newline, the bytes before hold none.
+    scanned = 0
+    while True:
+        chunk = await reader.read(chunk_size)
+        if not chunk:
+            break
+        buf += chunk
+        start = 0
+        while True:
+            if framing == 'ndjson':
+                end = find(b'\n', max(start, scanned))
+                if end == -1:
+                    scanned = len(buf)
+                    if scanned - start > max_frame:
+                        raise ValueError(
+                            f'record exceeds the max frame of {max_frame} bytes.'
+                        )
+                    break
+                record = buf[start:end]
+                start = end + 1
+                if not record.strip():
+                    continue
+            else:
+                if len(buf) - start < 4:
+                    break
+                size, = length_prefix.unpack_from(buf, start)
+                if size > max_frame:
+                    raise ValueError(
+                        f'record of {size} bytes exceeds the max frame of '
+                        f'{max_frame} bytes.')
+                end = start + 4 + size
+                if end > len(buf):
+                    break
+                record = buf[start + 4:end]
+                start = end
+            yield from_dict(loads(record.decode('utf-8')))
+            n += 1
+            if n % yield_every == 0:
+                # the buffered records are decoded without awaiting the reader.
+                await asyncio.sleep(0)
+        if start:
+            del buf[:start]
+            scanned = max(scanned - start, 0)
+
+    if framing == 'ndjson' and buf.strip():
+        yield from_dict(loads(buf.decode('utf-8')))
+    elif framing == 'length' and buf:
+        raise ValueError(f'incomplete record of {len(buf)} bytes at the end.')
+
+
+async def aencode_to(typ: type,
+                     writer: asyncio.StreamWriter,
+                     objs: t.Union[t.Iterable, t.AsyncIterable],
+                     framing: str = 'ndjson',
+                     chunk_size: int = default_chunk_size,
+                     yield_every: int = default_yield_every) -> int:
+    """
+    :return: the number of records written.
+    """
+    check_framing(framing)
+    encode = get_encoder(typ)
+    buf = bytearray()
+    n = 0
+
+    async def flush():
+        writer.write(bytes(buf))
+        del buf[:]
+        await writer.drain()
+
+    async def write(obj):
+        nonlocal n
+        data = encode(obj)
+        if framing == 'ndjson':
+            buf.extend(data)
+            buf.extend(b'\n')
+        else:
+            buf.extend(length_prefix.pack(len(data)))
+            buf.extend(data)
+        n += 1
+        if len(buf) >= chunk_size:
+            await flush()
+        elif n % yield_every == 0:
+            await asyncio.sleep(0)
+
+    if hasattr(objs, '__aiter__'):
+        async for obj in objs:
+            await write(obj)
+    else:
+        for obj in objs:
+            await write(obj)
+    if buf:
+        await flush()
+    return n
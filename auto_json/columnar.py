@@ -0,0 +1,176 @@
+"""
+columnar decoding of records, for scans over a few fields:
+
+    table = Room.from_dicts_columnar(records)
+    sum(table.column('area'))  # array('d'), or a numpy array when installed
+    table[10]                  # a Room, made on access
+
+each field is decoded into one column: `int` and `float` fields into
+`array.array`s(numpy arrays when installed), `str` fields into lists, with the
+strings of the chosen fields interned, and the others into lists of decoded
+values.
+optional fields are marked in a validity bitmap, 1 bit per record, where 0 is
+`None`, and the falsy values are `None` as in the decoders.
+
+the data is validated as `from_dict` does, and the invalid values are located
+on failures only, see `validate`.
+"""
+from .schema_analyse import *
+from array import array
+from itertools import repeat
+import sys
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+new = object.__new__
+
+# concrete type -> array typecode, numpy dtype
+array_types = {
+    int: ('q', 'int64'),
+    float: ('d', 'float64'),
+}
+# the nulls of the columns, held where the validity bit is 0.
+nulls = {int: 0, float: 0.0}
+
+
+def is_set(bitmap: bytearray, i: int) -> bool:
+    return bool(bitmap[i >> 3] & (1 << (i & 7)))
+
+
+def make_bitmap(valid: t.List[bool]) -> bytearray:
+    ret = bytearray((len(valid) + 7) >> 3)
+    for i, each in enumerate(valid):
+        if each:
+            ret[i >> 3] |= 1 << (i & 7)
+    return ret
+
+
+class Table:
+    """
+    the records of `typ` as columns, see `from_dicts_columnar`.
+    """
+
+    def __init__(self, typ: type, columns: t.Dict[str, t.Sequence],
+                 validity: t.Dict[str, bytearray], length: int):
+        self.typ = typ
+        self.columns = columns
+        # optional field -> validity bitmap
+        self.validity = validity
+        self.length = length
+        self._getters = [
+            (attr,
+             column.item if numpy is not None
+             and isinstance(column, numpy.ndarray) else column.__getitem__,
+             validity.get(attr)) for attr, column in columns.items()
+        ]
+
+    def __len__(self):
+        return self.length
+
+    def column(self, attr: str) -> t.Sequence:
+        return self.columns[attr]
+
+    def is_valid(self, attr: str, i: int) -> bool:
+        """
+        whether the field of the i-th record is not `None`.
+        """
+        bitmap = self.validity.get(attr)
+        return bitmap is None or is_set(bitmap, i)
+
+    def row(self, i: int):
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError(f'record {i} out of {self.length}.')
+        obj = new(self.typ)
+        for attr, get, bitmap in self._getters:
+            setattr(obj, attr,
+                    get(i) if bitmap is None or is_set(bitmap, i) else None)
+        return obj
+
+    def __getitem__(self, item: t.Union[int, slice]):
+        if isinstance(item, slice):
+            return [self.row(i) for i in range(*item.indices(self.length))]
+        return self.row(item)
+
+    def __iter__(self):
+        return map(self.row, range(self.length))
+
+    def __repr__(self):
+        return f'Table({self.typ.__qualname__}, {self.length} records)'
+
+
+def concrete_of(spec: Spec) -> t.Optional[type]:
+    if isinstance(spec, Optional):
+        spec = spec.typ
+    if isinstance(spec, Concrete) and spec.typ in (int, float, str):
+        return spec.typ
+    return None
+
+
+def from_dicts_columnar(typ: type,
+                        records: t.Iterable[dict],
+                        intern: t.Union[bool, t.Collection[str]] = False,
+                        use_numpy: bool = None) -> Table:
+    """
+    :param intern: the `str` fields whose strings are interned, or True for
+    all, for the columns of few distinct values.
+    :param use_numpy: store the numeric columns in numpy arrays,
+    default to whether numpy is installed.
+    """
+    from .graph import decoder
+
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    elif use_numpy and numpy is None:
+        raise ImportError('numpy is not installed.')
+    records = records if isinstance(records, list) else list(records)
+    _, fields = SchemaMonitor.schemas[typ.__qualname__]
+    columns = {}
+    validity = {}
+    try:
+        for attr, spec in fields:
+            values = [each[attr] for each in records]
+            concrete = concrete_of(spec)
+            if concrete is not None and isinstance(spec, Optional):
+                valid = [bool(each) for each in values]
+                validity[attr] = make_bitmap(valid)
+                null = nulls.get(concrete)
+                values = [
+                    each if ok else null for each, ok in zip(values, valid)
+                ]
+                checked = [each for each, ok in zip(values, valid) if ok]
+            else:
+                checked = values
+
+            if concrete is None:
+                decode = decoder(spec)
+                columns[attr] = [decode(each, {}) for each in values]
+                continue
+            if not all(map(isinstance, checked, repeat(concrete))):
+                raise TypeError(f'expected instances of {concrete!r}.')
+            if concrete is str:
+                columns[attr] = [
+                    each and sys.intern(each) for each in values
+                ] if intern is True or intern and attr in intern else values
+                continue
+            typecode, dtype = array_types[concrete]
+            try:
+                column = array(typecode, values)
+            except OverflowError:
+                # integers beyond 64 bits.
+                columns[attr] = values
+                continue
+            columns[attr] = numpy.frombuffer(
+                column, dtype) if use_numpy else column
+    except Exception as err:
+        from .validate import validator, ValidationError
+        try:
+            validator(List(Named(typ)))(records, '')
+        except ValidationError as e:
+            raise e from err
+        raise
+    return Table(typ, columns, validity, len(records))
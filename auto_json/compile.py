@@ -0,0 +1,67 @@
+"""
+ahead-of-time codec compilation:
+
+    python -m auto_json.compile myapp.schemas -o myapp/_codecs.py
+    python -m auto_json.compile myapp.schemas -o myapp/_codecs.py --cython
+
+then in each worker, after importing the schemas:
+
+    from auto_json.graphql_ast import load_precompiled
+    SchemaMonitor.resolve(strict=True)
+    load_precompiled('myapp._codecs')
+"""
+from .schema_analyse import SchemaMonitor
+from .graphql_ast import generate_source
+from .load_cy import build_extension
+import argparse
+import importlib
+import os
+import sys
+
+
+def compile_schemas(modules: list, output: str, use_cython=False,
+                    merge=False) -> str:
+    """
+    :param modules: modules registering the schemas.
+    :param merge: also generate `merge_from_dict`.
+    :return: path of the written module.
+    """
+    for each in modules:
+        importlib.import_module(each)
+    SchemaMonitor.resolve(strict=True)
+    source = generate_source(merge=merge)
+
+    if use_cython:
+        output = os.path.splitext(output)[0] + '.pyx'
+    with open(output, 'w') as f:
+        f.write(source)
+
+    if use_cython:
+        return build_extension(output)
+    return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m auto_json.compile',
+        description='write generated json codecs to an importable module.')
+    parser.add_argument(
+        'modules', nargs='+', help='modules registering the schemas.')
+    parser.add_argument(
+        '-o', '--output', required=True, help='path of the generated module.')
+    parser.add_argument(
+        '--cython',
+        action='store_true',
+        help='build a cython extension next to the output instead.')
+    parser.add_argument(
+        '--merge',
+        action='store_true',
+        help='also generate merge_from_dict.')
+    args = parser.parse_args(argv)
+    # allow importing schema modules from the working directory.
+    sys.path.insert(0, os.getcwd())
+    print(compile_schemas(args.modules, args.output, args.cython, args.merge))
+
+
+if __name__ == '__main__':
+    main()
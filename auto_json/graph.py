@@ -0,0 +1,299 @@
+"""
+identity preserving codecs, for objects shared or referring to themselves:
+
+    data = building.to_dict_graph()
+    building = Building.from_dict_graph(data)
+
+each object is encoded once: the later occurrences are encoded as
+`{"$ref": <id>}`, and the `$id` is added to the first one, so unshared objects
+are encoded as `to_dict` does. decoding restores the shared references and the cycles.
+
+`clone_graph` copies objects the same way, without the intermediate dicts,
+generated by `graphql_ast`(`clone_graph_<Type>`), this module is the fallback
+of the other backends.
+"""
+from .schema_analyse import *
+from json import dumps
+
+
+class Memo(dict):
+    """
+    id(obj) -> the dict encoding obj
+    """
+    __slots__ = ('shared', )
+
+    def __init__(self):
+        super().__init__()
+        self.shared = 0
+
+
+# spec -> encoder(obj, memo)
+encoders: t.Dict[Spec, t.Callable[[t.Any, dict], t.Any]] = {}
+# spec -> decoder(data, table), table: `$id` -> obj
+decoders: t.Dict[Spec, t.Callable[[t.Any, dict], t.Any]] = {}
+# spec -> cloner(obj, memo), memo: id(obj) -> copy
+cloners: t.Dict[Spec, t.Callable[[t.Any, dict], t.Any]] = {}
+
+
+def invalidate(_):
+    encoders.clear()
+    decoders.clear()
+    cloners.clear()
+
+
+SchemaMonitor.listeners.append(invalidate)
+
+new = object.__new__
+
+
+def identity(x, _):
+    return x
+
+
+def encoder(spec: Spec) -> t.Callable[[t.Any, dict], t.Any]:
+    fn = encoders.get(spec)
+    if fn is None:
+        fn = encoders[spec] = make_encoder(spec)
+    return fn
+
+
+def decoder(spec: Spec) -> t.Callable[[t.Any, dict], t.Any]:
+    fn = decoders.get(spec)
+    if fn is None:
+        fn = decoders[spec] = make_decoder(spec)
+    return fn
+
+
+def cloner(spec: Spec) -> t.Callable[[t.Any, dict], t.Any]:
+    fn = cloners.get(spec)
+    if fn is None:
+        fn = cloners[spec] = make_cloner(spec)
+    return fn
+
+
+def make_encoder(spec: Spec) -> t.Callable[[t.Any, dict], t.Any]:
+    if isinstance(spec, ForwardRef):
+        raise TypeError(f'forward ref: {spec}.')
+
+    if isinstance(spec, Concrete):
+        return identity
+
+    if isinstance(spec, List):
+        elem = encoder(spec.elem)
+        if elem is identity:
+            return lambda obj, _: list(obj)
+        return lambda obj, memo: [elem(each, memo) for each in obj]
+
+    if isinstance(spec, Dict):
+        key, value = encoder(spec.key), encoder(spec.value)
+        return lambda obj, memo: {
+            key(k, memo): value(v, memo)
+            for k, v in obj.items()
+        }
+
+    if isinstance(spec, Optional):
+        elem = encoder(spec.typ)
+        return lambda obj, memo: None if obj is None else elem(obj, memo)
+
+    if isinstance(spec, Union):
+        layout = union_layout(spec)
+        by_class = {
+            cls: (member, tag)
+            for cls, member, tag in layout.by_class()
+        }
+
+        def encode_union(obj, memo):
+            member, tag = by_class.get(obj.__class__, (None, None))
+            if member is None:
+                raise TypeError(f'no member of {spec_repr(spec)} matches {obj!r}.')
+            ret = encoder(member)(obj, memo)
+            if tag is not None:
+                ret[layout.discriminator] = tag
+            return ret
+
+        return encode_union
+
+    if isinstance(spec, Named):
+        _, fields = SchemaMonitor.schemas[spec.typ.__qualname__]
+        # resolved on first call, for recursive types.
+        field_encoders = []
+
+        def encode_named(obj, memo):
+            first = memo.get(id(obj))
+            if first is not None:
+                ref = first.get('$id')
+                if ref is None:
+                    ref = first['$id'] = memo.shared
+                    memo.shared += 1
+                return {'$ref': ref}
+            if not field_encoders:
+                field_encoders.extend(
+                    (attr, encoder(field_spec)) for attr, field_spec in fields)
+            ret = memo[id(obj)] = {}
+            for attr, encode in field_encoders:
+                ret[attr] = encode(getattr(obj, attr), memo)
+            return ret
+
+        return encode_named
+
+    raise TypeError(spec)
+
+
+def make_decoder(spec: Spec) -> t.Callable[[t.Any, dict], t.Any]:
+    if isinstance(spec, ForwardRef):
+        raise TypeError(f'forward ref: {spec}.')
+
+    if isinstance(spec, Concrete):
+        typ = spec.typ
+        if typ is object:
+            return identity
+
+        def decode_concrete(data, _):
+            if isinstance(data, typ):
+                return data
+            raise TypeError(f'expected an instance of {typ!r}, got {data!r}.')
+
+        return decode_concrete
+
+    if isinstance(spec, List):
+        elem = decoder(spec.elem)
+        return lambda data, table: [elem(each, table) for each in data]
+
+    if isinstance(spec, Dict):
+        key, value = decoder(spec.key), decoder(spec.value)
+        return lambda data, table: {
+            key(k, table): value(v, table)
+            for k, v in data.items()
+        }
+
+    if isinstance(spec, Optional):
+        elem = decoder(spec.typ)
+        return lambda data, table: elem(data, table) if data else None
+
+    if isinstance(spec, Union):
+        layout = union_layout(spec)
+        by_type = dict(layout.by_type)
+        tags = dict(layout.by_key)
+
+        def decode_union(data, table):
+            member = by_type.get(data.__class__)
+            if member is None and isinstance(data, dict):
+                if '$ref' in data:
+                    return table[data['$ref']]
+                if layout.discriminator is not None:
+                    member = tags.get(
+                        data.get(layout.discriminator), layout.default)
+                else:
+                    member = next(
+                        (each for key, each in layout.by_key if key in data),
+                        layout.default)
+            if member is None:
+                raise TypeError(
+                    f'no member of {spec_repr(spec)} matches {data!r}.')
+            return decoder(member)(data, table)
+
+        return decode_union
+
+    if isinstance(spec, Named):
+        typ = spec.typ
+        _, fields = SchemaMonitor.schemas[typ.__qualname__]
+        # resolved on first call, for recursive types.
+        field_decoders = []
+
+        def decode_named(data, table):
+            ref = data.get('$ref')
+            if ref is not None:
+                return table[ref]
+            obj = new(typ)
+            if '$id' in data:
+                # registered before the fields, which may refer to it.
+                table[data['$id']] = obj
+            if not field_decoders:
+                field_decoders.extend(
+                    (attr, decoder(field_spec)) for attr, field_spec in fields)
+            for attr, decode in field_decoders:
+                setattr(obj, attr, decode(data[attr], table))
+            return obj
+
+        return decode_named
+
+    raise TypeError(spec)
+
+
+def make_cloner(spec: Spec) -> t.Callable[[t.Any, dict], t.Any]:
+    if isinstance(spec, ForwardRef):
+        raise TypeError(f'forward ref: {spec}.')
+
+    if isinstance(spec, Concrete):
+        return identity
+
+    if isinstance(spec, List):
+        elem = cloner(spec.elem)
+        if elem is identity:
+            return lambda obj, _: list(obj)
+        return lambda obj, memo: [elem(each, memo) for each in obj]
+
+    if isinstance(spec, Dict):
+        key, value = cloner(spec.key), cloner(spec.value)
+        if key is identity and value is identity:
+            return lambda obj, _: dict(obj)
+        return lambda obj, memo: {
+            key(k, memo): value(v, memo)
+            for k, v in obj.items()
+        }
+
+    if isinstance(spec, Optional):
+        elem = cloner(spec.typ)
+        return lambda obj, memo: None if obj is None else elem(obj, memo)
+
+    if isinstance(spec, Union):
+        by_class = {
+            cls: member
+            for cls, member, _ in union_layout(spec).by_class()
+        }
+
+        def clone_union(obj, memo):
+            member = by_class.get(obj.__class__)
+            if member is None:
+                raise TypeError(f'no member of {spec_repr(spec)} matches {obj!r}.')
+            return cloner(member)(obj, memo)
+
+        return clone_union
+
+    if isinstance(spec, Named):
+        typ = spec.typ
+        _, fields = SchemaMonitor.schemas[typ.__qualname__]
+        # resolved on first call, for recursive types.
+        field_cloners = []
+
+        def clone_named(obj, memo):
+            ret = memo.get(id(obj))
+            if ret is not None:
+                return ret
+            ret = memo[id(obj)] = new(typ)
+            if not field_cloners:
+                field_cloners.extend(
+                    (attr, cloner(field_spec)) for attr, field_spec in fields)
+            for attr, clone in field_cloners:
+                setattr(ret, attr, clone(getattr(obj, attr), memo))
+            return ret
+
+        return clone_named
+
+    raise TypeError(spec)
+
+
+def to_dict_graph(obj) -> dict:
+    return encoder(Named(obj.__class__))(obj, Memo())
+
+
+def from_dict_graph(typ: type, data: dict):
+    return decoder(Named(typ))(data, {})
+
+
+def to_json_graph(obj) -> bytes:
+    return dumps(to_dict_graph(obj), separators=(',', ':')).encode()
+
+
+def clone_graph(obj):
+    return cloner(Named(obj.__class__))(obj, {})
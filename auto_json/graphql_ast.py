@@ -13,9 +13,14 @@ ast 层面的graphql优化:
 from rbnf.py_tools.unparse import Unparser
 from .schema_analyse import *
 from .load_cy import compile_module
+from .merge import replace, list_strategy, check_key
 import ast
+import importlib
 import io
+import json
 import textwrap
+from types import ModuleType
+import warnings
 
 
 class CollectLocal(ast.NodeVisitor):
@@ -88,24 +93,256 @@ def ast_raise_type_err(msg: str, data_var: BlockLevel):
              ]), None)
 
 
-def generate_method_maker() -> t.Tuple[t.List[type], ast.Module]:
+def ast_function(name: str, args: t.List[str], body: t.List[ast.AST]):
+    ret = ast.FunctionDef(
+        name=name,
+        args=ast.arguments(
+            args=[ast.arg(each, None) for each in args],
+            vararg=None,
+            kwonlyargs=[],
+            kwarg=None,
+            kw_defaults=[],
+            defaults=[]),
+        body=body,
+        decorator_list=[],
+        returns=None)
+    ast.fix_missing_locations(ret)
+    return ret
+
+
+def ast_is(var: BlockLevel, name: str):
+    return ast.Compare(ast_name(var), [ast.Is()], [ast_name(name)])
+
+
+def ast_set_item(var: BlockLevel, key: str, value: ast.expr):
+    return ast.Assign(
+        [ast.Subscript(ast_name(var), ast.Index(ast.Str(key)), ast.Store())],
+        value)
+
+
+def ast_if_chain(branches: t.List[t.Tuple[ast.expr, t.List[ast.AST]]],
+                 orelse: t.List[ast.AST]) -> t.List[ast.AST]:
+    """
+    if test1: body1 elif test2: body2 ... else: orelse
+    """
+    for test, body in reversed(branches):
+        orelse = [ast.If(test, body, orelse)]
+    return orelse
+
+
+def ast_write(value: t.Union[str, ast.expr]):
+    if isinstance(value, str):
+        value = ast.Str(value)
+    return ast.Expr(ast_call(ast_name('write'), [value]))
+
+
+def is_const_write(node: ast.AST):
+    if not isinstance(node, ast.Expr) or not isinstance(node.value, ast.Call):
+        return False
+    call = node.value
+    return isinstance(call.func, ast.Name) and call.func.id == 'write' and \
+        isinstance(call.args[0], ast.Str)
+
+
+def merge_writes(suites: t.List[ast.AST]) -> t.List[ast.AST]:
+    """
+    join adjacent `write('...')` of constant fragments into a single call.
+    """
+    ret = []
+    for each in suites:
+        if ret and is_const_write(each) and is_const_write(ret[-1]):
+            ret[-1] = ast_write(ret[-1].value.args[0].s + each.value.args[0].s)
+        else:
+            ret.append(each)
+    return ret
+
+
+# module level names required by the generated functions.
+prelude = ast.parse(
+    textwrap.dedent('''
+    new = object.__new__
+    from io import StringIO
+    from json.encoder import encode_basestring
+    from json import dumps
+    NoneType = type(None)
+
+    def int_repr(x, repr_=int.__repr__):
+        # the decoders take bools for ints, written as `json.dumps` does.
+        if x is True:
+            return 'true'
+        if x is False:
+            return 'false'
+        return repr_(x)
+
+    def float_repr(x, repr_=float.__repr__, inf=float('inf')):
+        # as `json.dumps` writes them, `repr` gives nan and inf.
+        if x != x:
+            return 'NaN'
+        if x == inf:
+            return 'Infinity'
+        if x == -inf:
+            return '-Infinity'
+        return repr_(x)
+
+    def write_tagged(write_obj, obj, write, head):
+        # `head` is the opening of a json object holding the discriminator,
+        # which is spliced before the fields written by `write_obj`.
+        buf = StringIO()
+        write_obj(obj, buf.write)
+        fields = buf.getvalue()
+        write(head + '}' if fields == '{}' else head + ',' + fields[1:])
+
+    def raise_invalid(typ, data, err):
+        # locate the invalid value on failures only, see `auto_json.validate`.
+        from auto_json.validate import raise_invalid
+        raise_invalid(typ, data, err)
+    ''')).body
+
+json_concrete_writers = {
+    str: '_encode_basestring',
+    int: '_int_repr',
+    float: '_float_repr',
+}
+
+
+class InlinePolicy(t.NamedTuple):
+    """
+    when the codecs of a `Named` field are inlined into the function of the
+    referring type, instead of calling the function of the field type,
+    e.g: `make_Room(b__0)`.
+    the default inlines everything but the second expansion of a type in itself.
+    """
+    # expansions of a type nested in itself.
+    max_recursion: int = 2
+    # nesting of inlined types in a function, 0 to inline none.
+    max_depth: t.Optional[int] = None
+    # statements inlined from other types into a function.
+    max_statements: t.Optional[int] = None
+    # types referred by at least so many fields are always called,
+    # to share one copy of their codecs.
+    max_sites: t.Optional[int] = None
+
+
+default_policy = InlinePolicy()
+
+
+def count_statements(suites: t.List[ast.AST]) -> int:
+    return sum(
+        isinstance(node, ast.stmt) for each in suites
+        for node in ast.walk(each))
+
+
+def count_sites(types: t.List[type]) -> t.Dict[type, int]:
+    """
+    type -> the number of fields referring to it.
+    """
+    ret = {}
+    for ty in types:
+        _, fields = SchemaMonitor.schemas[ty.__qualname__]
+        for _, spec in fields:
+            for each in named_types(spec):
+                ret[each] = ret.get(each, 0) + 1
+    return ret
+
+
+def generate_method_maker(
+        types: t.List[type] = None,
+        selections: t.Dict[str, t.Tuple[type, dict]] = None,
+        policy: InlinePolicy = None,
+        trusted=False,
+        generated: t.Collection[type] = None,
+        merge=False,
+) -> t.Tuple[t.List[type], ast.Module]:
+    """
+    :param types: types to generate codecs for, default to all registered ones.
+    inlined `Named` types must be included, see `SchemaMonitor.reachable`.
+    :param generated: the types among `types` whose functions are generated,
+    default to all, the others are only inlined.
+    :param selections: {function name: (type, selection)}, to generate
+    projection decoders instead, see `graphql_query.compile_decoder`.
+    :param policy: see `InlinePolicy`, projection decoders inline everything.
+    :param trusted: also generate `make_trusted_<Type>` decoders which skip
+    the type checks of concrete values, see `generate(trusted=True)`.
+    :param merge: also generate the `merge_<Type>` functions, see `merge`.
+    """
+    if types is None:
+        types = [a[0] for a in SchemaMonitor.schemas.values()]
+    policy = policy or default_policy
+    sites = count_sites(types) if policy.max_sites is not None else {}
+    # statements which can still be inlined into the function being generated.
+    budget = [policy.max_statements]
+    # prefix of the decoders being generated, 'make_' or 'make_trusted_'.
+    decoder_prefix = ['make_']
+    # whether the `Named` values are decoded by calling their `from_dict`,
+    # the merges do so for the objects not already there.
+    calls_from_dict = [False]
+
+    def inline_named(spec: Named, recur: tuple,
+                     inline: t.Callable[[], t.List[ast.AST]],
+                     call: t.List[ast.AST]) -> t.List[ast.AST]:
+        """
+        :param inline: makes the inlined codes of `spec`.
+        :param call: the call to the function of `spec`.
+        """
+        if recur.count(spec) >= policy.max_recursion:
+            # avoid recursive expanding
+            return call
+        if policy.max_depth is not None and sum(
+                isinstance(each, Named) for each in recur) > policy.max_depth:
+            return call
+        if sites.get(spec.typ, 0) >= (policy.max_sites or float('inf')):
+            return call
+        if budget[0] is None:
+            return inline()
+        remaining = budget[0]
+        suites = inline()
+        size = count_statements(suites)
+        if size > remaining:
+            budget[0] = remaining
+            return call
+        budget[0] = remaining - size
+        return suites
+
     def make_match_from_spec(
             spec: Spec,
             block: BlockLevel = BlockLevel(),
             recur=(),
+            selection: dict = None,
+            inlined=False,
     ) -> t.List[ast.AST]:
-        def _make_match_from_spec(spec_, reg_=block):
-            return make_match_from_spec(spec_, reg_, (*recur, spec_))
+        """
+        :param selection: {field name: sub selection or None}, fields of
+        `Named` types not in it are skipped and left unset.
+        :param inlined: whether `spec` is already decided to be inlined,
+        see `inline_named`.
+        """
+        def _make_match_from_spec(spec_, reg_=block, selection_=selection):
+            return make_match_from_spec(spec_, reg_, (*recur, spec_),
+                                        selection_)
 
-        if recur.count(spec) is 2 and isinstance(spec, Named):
-            # avoid recursive expanding
-            return [
-                ast_assign(
-                    block.var('ret'),
-                    ast_call(
-                        ast_name('make_' + spec.typ.__name__),
-                        [ast_name(block)]))
-            ]
+        if selection is not None and not any(named_types(spec)):
+            raise TypeError(f'{spec_repr(spec)} has no fields to select.')
+
+        if selection is None and recur and not inlined and isinstance(
+                spec, Named):
+            if calls_from_dict[0]:
+                return [
+                    ast_assign(
+                        block.var('ret'),
+                        ast_call(
+                            ast_attr(
+                                ast_name('_' + spec.typ.__name__),
+                                'from_dict'), [ast_name(block)]))
+                ]
+            return inline_named(
+                spec, recur,
+                lambda: make_match_from_spec(spec, block, recur, None, True), [
+                    ast_assign(
+                        block.var('ret'),
+                        ast_call(
+                            ast_name(decoder_prefix[0] + spec.typ.__name__),
+                            [ast_name(block)]))
+                ])
 
         if isinstance(spec, ForwardRef):
             raise TypeError
@@ -113,7 +350,7 @@ def generate_method_maker() -> t.Tuple[t.List[type], ast.Module]:
         if isinstance(spec, Concrete):
             typ = spec.typ
             assign_suites = [ast_assign(block.var('ret'), block)]
-            if typ is object:
+            if typ is object or decoder_prefix[0] != 'make_':
                 return assign_suites
             else:
                 return [
@@ -148,7 +385,80 @@ def generate_method_maker() -> t.Tuple[t.List[type], ast.Module]:
             ]
 
         if isinstance(spec, Union):
-            raise NotImplementedError
+            layout = union_layout(spec)
+            cls_var = block.var('cls')
+            if selection is not None:
+                declared = {
+                    attr
+                    for each in named_types(spec)
+                    for attr, _ in SchemaMonitor.schemas[each.__qualname__][1]
+                }
+                unknown = [attr for attr in selection if attr not in declared]
+                if unknown:
+                    raise TypeError(
+                        f'no member of {spec_repr(spec)} has field {unknown[0]!r}.'
+                    )
+
+            def match_member(member: Spec):
+                if isinstance(member, Concrete):
+                    # the class is already checked.
+                    return [ast_assign(block.var('ret'), block)]
+                if selection is None:
+                    return _make_match_from_spec(member)
+                if isinstance(member, Named):
+                    # fields selected on a union apply to the members declaring them.
+                    _, fields = SchemaMonitor.schemas[member.typ.__qualname__]
+                    declared = {attr for attr, _ in fields}
+                    return _make_match_from_spec(
+                        member, selection_={
+                            attr: sub
+                            for attr, sub in selection.items()
+                            if attr in declared
+                        })
+                return _make_match_from_spec(
+                    member,
+                    selection_=selection if any(named_types(member)) else None)
+
+            no_match = [
+                ast_raise_type_err(
+                    f'no member of {spec_repr(spec)} matches {{!r}}.', block)
+            ]
+            branches = [(ast_is(cls_var, '_' + cls.__name__),
+                         match_member(member))
+                        for cls, member in layout.by_type]
+            if layout.by_key or layout.default:
+                if layout.discriminator is not None:
+                    tag_var = block.var('tag')
+                    prepare = [
+                        ast_assign(
+                            tag_var,
+                            ast_call(
+                                ast_attr(ast_name(block), 'get'),
+                                [ast.Str(layout.discriminator)]))
+                    ]
+                    tests = [
+                        ast.Compare(
+                            ast_name(tag_var), [ast.Eq()], [ast.Str(tag)])
+                        for tag, _ in layout.by_key
+                    ]
+                else:
+                    prepare = []
+                    tests = [
+                        ast.Compare(
+                            ast.Str(key), [ast.In()], [ast_name(block)])
+                        for key, _ in layout.by_key
+                    ]
+                branches.append((ast_is(cls_var, '_dict'), [
+                    *prepare, *ast_if_chain(
+                        [(test, match_member(member))
+                         for test, (_, member) in zip(tests, layout.by_key)],
+                        match_member(layout.default)
+                        if layout.default else no_match)
+                ]))
+            return [
+                ast_assign(cls_var, ast_attr(ast_name(block), '__class__')),
+                *ast_if_chain(branches, no_match)
+            ]
 
         if isinstance(spec, Dict):
 
@@ -162,7 +472,7 @@ def generate_method_maker() -> t.Tuple[t.List[type], ast.Module]:
             value_block = block.let().var('value')
 
             key_match, value_match = _make_match_from_spec(
-                spec.key, key_block), _make_match_from_spec(
+                spec.key, key_block, None), _make_match_from_spec(
                     spec.value, value_block)
 
             return [
@@ -206,12 +516,12 @@ def generate_method_maker() -> t.Tuple[t.List[type], ast.Module]:
             cls_instance_var = block.var('ret')
             data_field_getter_var = block.var('append')
 
-            def make_match_for_attr(attr: str, field_spec: Spec):
+            def make_match_for_attr(attr: str, field_spec: Spec, sub=None):
                 if isinstance(field_spec, ForwardRef):
                     raise TypeError
                 else:
                     extract_suites = _make_match_from_spec(
-                        field_spec, field_block)
+                        field_spec, field_block, sub)
                     return [
                         ast_assign(
                             field_block,
@@ -225,10 +535,28 @@ def generate_method_maker() -> t.Tuple[t.List[type], ast.Module]:
                     ]
 
             _, fields = SchemaMonitor.schemas[named_type.__qualname__]
-            fields_making = list(map(make_match_for_attr, *zip(*fields)))
+            if selection is not None:
+                field_specs = dict(fields)
+                fields = []
+                for attr, sub in selection.items():
+                    field_spec = field_specs.get(attr)
+                    if field_spec is None:
+                        raise TypeError(
+                            f'{named_type.__qualname__} has no field {attr!r}.'
+                        )
+                    if sub is None and any(named_types(field_spec)):
+                        raise TypeError(
+                            f'{named_type.__qualname__}.{attr} of '
+                            f'{spec_repr(field_spec)} needs a selection of fields.'
+                        )
+                    fields.append((attr, field_spec, sub))
+            fields_making = [make_match_for_attr(*each) for each in fields]
             return [
-                ast_assign(cls_instance_var,
-                           ast_call(ast_name('_' + named_type.__name__), [])),
+                ast_assign(
+                    cls_instance_var,
+                    ast_call(
+                        ast_name('_new'),
+                        [ast_name('_' + named_type.__name__)])),
                 ast_assign(data_field_getter_var,
                            ast_attr(ast_name(block), '__getitem__')),
                 *sum(fields_making, [])
@@ -236,12 +564,876 @@ def generate_method_maker() -> t.Tuple[t.List[type], ast.Module]:
         else:
             raise TypeError(spec)
 
-    def make_function_ast(ty: type):
+    def make_dump_from_spec(
+            spec: Spec,
+            block: BlockLevel = BlockLevel(),
+            recur=(),
+            inlined=False,
+    ) -> t.List[ast.AST]:
+        def _make_dump_from_spec(spec_, reg_=block):
+            return make_dump_from_spec(spec_, reg_, (*recur, spec_))
+
+        if recur and not inlined and isinstance(spec, Named):
+            return inline_named(
+                spec, recur,
+                lambda: make_dump_from_spec(spec, block, recur, True), [
+                    ast_assign(
+                        block.var('ret'),
+                        ast_call(
+                            ast_name('to_dict_' + spec.typ.__name__),
+                            [ast_name(block)]))
+                ])
+
+        if isinstance(spec, ForwardRef):
+            raise TypeError
+
+        if isinstance(spec, Concrete):
+            return [ast_assign(block.var('ret'), block)]
+
+        if isinstance(spec, List):
+            lst_var = block.var('ret')
+            if isinstance(spec.elem, Concrete):
+                return [
+                    ast_assign(lst_var,
+                               ast_call(ast_name('_list'), [ast_name(block)]))
+                ]
+
+            append_var = block.var('append')
+            iter_block = block.let()
+            method_ast_suites = _make_dump_from_spec(spec.elem, iter_block)
+            return [
+                ast_assign(lst_var, ast.List([], ast.Load())),
+                ast_assign(append_var, ast_attr(ast_name(lst_var), 'append')),
+                ast.For(
+                    target=ast_name(iter_block, is_lhs=True),
+                    iter=ast_name(block),
+                    body=[
+                        *method_ast_suites,
+                        ast.Expr(
+                            ast_call(
+                                ast_name(append_var),
+                                [ast_name(iter_block.var('ret'))]))
+                    ],
+                    orelse=[])
+            ]
+
+        if isinstance(spec, Union):
+            layout = union_layout(spec)
+            cls_var = block.var('cls')
+            branches = []
+            for cls, member, tag in layout.by_class():
+                suites = _make_dump_from_spec(member)
+                if tag is not None:
+                    suites.append(
+                        ast_set_item(
+                            block.var('ret'), layout.discriminator,
+                            ast.Str(tag)))
+                branches.append((ast_is(cls_var, '_' + cls.__name__), suites))
+            return [
+                ast_assign(cls_var, ast_attr(ast_name(block), '__class__')),
+                *ast_if_chain(branches, [
+                    ast_raise_type_err(
+                        f'no member of {spec_repr(spec)} matches {{!r}}.',
+                        block)
+                ])
+            ]
+
+        if isinstance(spec, Dict):
+            dict_var = block.var('ret')
+            if isinstance(spec.key, Concrete) and isinstance(
+                    spec.value, Concrete):
+                return [
+                    ast_assign(dict_var,
+                               ast_call(ast_name('_dict'), [ast_name(block)]))
+                ]
+
+            dict_add_var = dict_var.var('append')
+            # the `ret` of the key and the value blocks are the same variable.
+            key_var = block.var('key')
+            key_block = block.let().var('key')
+            value_block = block.let().var('value')
+
+            key_dump, value_dump = _make_dump_from_spec(
+                spec.key, key_block), _make_dump_from_spec(
+                    spec.value, value_block)
+
+            return [
+                ast_assign(dict_var, ast.Dict([], [])),
+                ast_assign(dict_add_var,
+                           ast_attr(ast_name(dict_var), '__setitem__')),
+                ast.For(
+                    target=ast.Tuple([
+                        ast_name(key_block, is_lhs=True),
+                        ast_name(value_block, is_lhs=True)
+                    ], ast.Store()),
+                    iter=ast_call(ast_attr(ast_name(block), 'items'), []),
+                    body=[
+                        *key_dump,
+                        ast_assign(key_var, key_block.var('ret')),
+                        *value_dump,
+                        ast.Expr(
+                            ast_call(
+                                ast_name(dict_add_var), [
+                                    ast_name(key_var),
+                                    ast_name(value_block.var('ret'))
+                                ]))
+                    ],
+                    orelse=[])
+            ]
+
+        if isinstance(spec, Optional):
+            dump_ast_suites = _make_dump_from_spec(spec.typ)
+            return [
+                ast.If(
+                    test=ast.Compare(
+                        ast_name(block), [ast.IsNot()],
+                        [ast.NameConstant(None)]),
+                    body=dump_ast_suites,
+                    orelse=[
+                        ast_assign(block.var('ret'), ast.NameConstant(None))
+                    ])
+            ]
+
+        if isinstance(spec, Named):
+            named_type = spec.typ
+            field_block = block.let()
+            keys = []
+            values = []
+            suites = []
+
+            _, fields = SchemaMonitor.schemas[named_type.__qualname__]
+            for attr, field_spec in fields:
+                if isinstance(field_spec, ForwardRef):
+                    raise TypeError
+                keys.append(ast.Str(attr))
+                getter = ast_attr(ast_name(block), attr)
+                if isinstance(field_spec, Concrete):
+                    # concrete fields go into the dict display directly.
+                    values.append(getter)
+                    continue
+                field_var = block.var('ret_' + attr)
+                suites.extend([
+                    ast_assign(field_block, getter),
+                    *_make_dump_from_spec(field_spec, field_block),
+                    ast_assign(field_var, field_block.var('ret'))
+                ])
+                values.append(ast_name(field_var))
+
+            return [
+                *suites,
+                ast_assign(block.var('ret'), ast.Dict(keys, values))
+            ]
+        else:
+            raise TypeError(spec)
+
+    def make_clone_from_spec(
+            spec: Spec,
+            block: BlockLevel = BlockLevel(),
+            recur=(),
+            inlined=False,
+            memo=False,
+    ) -> t.List[ast.AST]:
+        """
+        copy the structure, the concrete values are shared.
+        :param memo: copy each object once, looking up the copies in the
+        `memo` argument by the ids of the objects, see `graph.clone_graph`.
+        """
+        def _make_clone_from_spec(spec_, reg_=block):
+            return make_clone_from_spec(spec_, reg_, (*recur, spec_),
+                                        memo=memo)
+
+        if recur and not inlined and isinstance(spec, Named):
+            prefix, args = ('clone_graph_', [ast_name(block), ast_name('memo')
+                                             ]) if memo else ('clone_',
+                                                              [ast_name(block)])
+            return inline_named(
+                spec, recur,
+                lambda: make_clone_from_spec(spec, block, recur, True, memo), [
+                    ast_assign(
+                        block.var('ret'),
+                        ast_call(ast_name(prefix + spec.typ.__name__), args))
+                ])
+
+        if isinstance(spec, ForwardRef):
+            raise TypeError
+
+        if isinstance(spec, Concrete):
+            return [ast_assign(block.var('ret'), block)]
+
+        if isinstance(spec, List):
+            lst_var = block.var('ret')
+            if isinstance(spec.elem, Concrete):
+                return [
+                    ast_assign(lst_var,
+                               ast_call(ast_name('_list'), [ast_name(block)]))
+                ]
+
+            append_var = block.var('append')
+            iter_block = block.let()
+            return [
+                ast_assign(lst_var, ast.List([], ast.Load())),
+                ast_assign(append_var, ast_attr(ast_name(lst_var), 'append')),
+                ast.For(
+                    target=ast_name(iter_block, is_lhs=True),
+                    iter=ast_name(block),
+                    body=[
+                        *_make_clone_from_spec(spec.elem, iter_block),
+                        ast.Expr(
+                            ast_call(
+                                ast_name(append_var),
+                                [ast_name(iter_block.var('ret'))]))
+                    ],
+                    orelse=[])
+            ]
+
+        if isinstance(spec, Union):
+            layout = union_layout(spec)
+            cls_var = block.var('cls')
+            branches = [(ast_is(cls_var, '_' + cls.__name__),
+                         _make_clone_from_spec(member))
+                        for cls, member, _ in layout.by_class()]
+            return [
+                ast_assign(cls_var, ast_attr(ast_name(block), '__class__')),
+                *ast_if_chain(branches, [
+                    ast_raise_type_err(
+                        f'no member of {spec_repr(spec)} matches {{!r}}.',
+                        block)
+                ])
+            ]
+
+        if isinstance(spec, Dict):
+            dict_var = block.var('ret')
+            if isinstance(spec.key, Concrete) and isinstance(
+                    spec.value, Concrete):
+                return [
+                    ast_assign(dict_var,
+                               ast_call(ast_name('_dict'), [ast_name(block)]))
+                ]
+
+            dict_add_var = dict_var.var('append')
+            # the `ret` of the key and the value blocks are the same variable.
+            key_var = block.var('key')
+            key_block = block.let().var('key')
+            value_block = block.let().var('value')
+            return [
+                ast_assign(dict_var, ast.Dict([], [])),
+                ast_assign(dict_add_var,
+                           ast_attr(ast_name(dict_var), '__setitem__')),
+                ast.For(
+                    target=ast.Tuple([
+                        ast_name(key_block, is_lhs=True),
+                        ast_name(value_block, is_lhs=True)
+                    ], ast.Store()),
+                    iter=ast_call(ast_attr(ast_name(block), 'items'), []),
+                    body=[
+                        *_make_clone_from_spec(spec.key, key_block),
+                        ast_assign(key_var, key_block.var('ret')),
+                        *_make_clone_from_spec(spec.value, value_block),
+                        ast.Expr(
+                            ast_call(
+                                ast_name(dict_add_var), [
+                                    ast_name(key_var),
+                                    ast_name(value_block.var('ret'))
+                                ]))
+                    ],
+                    orelse=[])
+            ]
+
+        if isinstance(spec, Optional):
+            return [
+                ast.If(
+                    test=ast.Compare(
+                        ast_name(block), [ast.IsNot()],
+                        [ast.NameConstant(None)]),
+                    body=_make_clone_from_spec(spec.typ),
+                    orelse=[
+                        ast_assign(block.var('ret'), ast.NameConstant(None))
+                    ])
+            ]
+
+        if isinstance(spec, Named):
+            named_type = spec.typ
+            field_block = block.let()
+            ret_var = block.var('ret')
+            suites = [
+                ast_assign(
+                    ret_var,
+                    ast_call(
+                        ast_name('_new'), [ast_name('_' + named_type.__name__)]))
+            ]
+            _, fields = SchemaMonitor.schemas[named_type.__qualname__]
+            for attr, field_spec in fields:
+                if isinstance(field_spec, ForwardRef):
+                    raise TypeError
+                getter = ast_attr(ast_name(block), attr)
+                setter = ast_attr(ast_name(ret_var), attr, is_lhs=True)
+                if isinstance(field_spec, Concrete):
+                    suites.append(ast.Assign([setter], getter))
+                    continue
+                suites.extend([
+                    ast_assign(field_block, getter),
+                    *_make_clone_from_spec(field_spec, field_block),
+                    ast.Assign([setter], ast_name(field_block.var('ret')))
+                ])
+            if not memo:
+                return suites
+            # b_oid_<n> = _id(b__<n>)
+            # b_ret_<n> = memo.get(b_oid_<n>)
+            # if b_ret_<n> is None:
+            #     # registered before the fields, which may refer to it.
+            #     b_ret_<n> = memo[b_oid_<n>] = _new(_<Type>)
+            #     ...
+            oid_var = block.var('oid')
+            suites[0].targets.append(
+                ast.Subscript(
+                    ast_name('memo'), ast.Index(ast_name(oid_var)),
+                    ast.Store()))
+            return [
+                ast_assign(oid_var, ast_call(ast_name('_id'),
+                                             [ast_name(block)])),
+                ast_assign(
+                    ret_var,
+                    ast_call(
+                        ast_attr(ast_name('memo'), 'get'),
+                        [ast_name(oid_var)])),
+                ast.If(
+                    ast.Compare(
+                        ast_name(ret_var), [ast.Is()],
+                        [ast.NameConstant(None)]), suites, [])
+            ]
+        else:
+            raise TypeError(spec)
+
+    def make_merge_from_spec(
+            spec: Spec,
+            block: BlockLevel = BlockLevel(),
+            recur=(),
+            inlined=False,
+            strategy: tuple = replace,
+    ) -> t.List[ast.AST]:
+        """
+        merge the data in `block` into the current value in `block.var('cur')`,
+        see `merge`.
+        :param strategy: how to merge a list, see `merge.list_strategy`.
+        """
+        def _make_merge_from_spec(spec_, reg_=block, strategy_=replace):
+            return make_merge_from_spec(spec_, reg_, (*recur, spec_),
+                                        strategy=strategy_)
+
+        def _make_match_from_spec(spec_, reg_=block):
+            return make_match_from_spec(spec_, reg_, (*recur, spec_))
+
+        cur_var = block.var('cur')
+        ret_var = block.var('ret')
 
+        def is_cur(name: str):
+            # b_cur_<n>.__class__ is <name>
+            return ast.Compare(
+                ast_attr(ast_name(cur_var), '__class__'), [ast.Is()],
+                [ast_name(name)])
+
+        if isinstance(spec, ForwardRef):
+            raise TypeError
+
+        if isinstance(spec, Concrete):
+            return make_match_from_spec(spec, block, recur)
+
+        if isinstance(spec, Optional):
+            return [
+                ast.If(
+                    test=ast_name(block),
+                    body=_make_merge_from_spec(spec.typ, strategy_=strategy),
+                    orelse=[ast_assign(ret_var, ast.NameConstant(None))])
+            ]
+
+        if isinstance(spec, List):
+            kind, key = strategy
+            if kind == 'replace':
+                return make_match_from_spec(spec, block, recur)
+            iter_block = block.let()
+            if kind == 'index':
+                # if b_cur_<n>.__class__ is list:
+                #     b_ret_<n> = b_cur_<n>
+                #     for b_i_<n>, b__<n+1> in enumerate(b__<n>):
+                #         if b_i_<n> < len(b_ret_<n>): merge into b_ret_<n>[b_i_<n>]
+                #         else: decode and append
+                #     del b_ret_<n>[len(b__<n>):]
+                n_var = block.var('n')
+                i_var = block.var('i')
+                item = ast.Subscript(
+                    ast_name(ret_var), ast.Index(ast_name(i_var)), ast.Load())
+                body = [
+                    ast_assign(ret_var, cur_var),
+                    ast_assign(n_var,
+                               ast_call(ast_name('_len'), [ast_name(ret_var)])),
+                    ast.For(
+                        target=ast.Tuple([
+                            ast_name(i_var, is_lhs=True),
+                            ast_name(iter_block, is_lhs=True)
+                        ], ast.Store()),
+                        iter=ast_call(ast_name('_enumerate'), [ast_name(block)]),
+                        body=[
+                            ast.If(
+                                ast.Compare(
+                                    ast_name(i_var), [ast.Lt()],
+                                    [ast_name(n_var)]), [
+                                        ast_assign(iter_block.var('cur'), item),
+                                        *_make_merge_from_spec(
+                                            spec.elem, iter_block),
+                                        ast.Assign([
+                                            ast.Subscript(
+                                                ast_name(ret_var),
+                                                ast.Index(ast_name(i_var)),
+                                                ast.Store())
+                                        ], ast_name(iter_block.var('ret')))
+                                    ], [
+                                        *_make_match_from_spec(
+                                            spec.elem, iter_block),
+                                        ast.Expr(
+                                            ast_call(
+                                                ast_attr(
+                                                    ast_name(ret_var),
+                                                    'append'),
+                                                [
+                                                    ast_name(
+                                                        iter_block.var('ret'))
+                                                ]))
+                                    ])
+                        ],
+                        orelse=[]),
+                    ast.Delete([
+                        ast.Subscript(
+                            ast_name(ret_var),
+                            ast.Slice(
+                                ast_call(ast_name('_len'), [ast_name(block)]),
+                                None, None), ast.Del())
+                    ])
+                ]
+            else:
+                # if b_cur_<n>.__class__ is list:
+                #     b_index_<n> = {b_old_<n>.<key>: b_old_<n> for b_old_<n> in b_cur_<n>}
+                #     b_ret_<n> = []
+                #     for b__<n+1> in b__<n>:
+                #         b_cur_<n+1> = b_index_<n>.get(b__<n+1>[<key>])
+                #         merge, and append to b_ret_<n>
+                #     b_cur_<n>[:] = b_ret_<n>
+                #     b_ret_<n> = b_cur_<n>
+                check_key(spec, key)
+                index_var = block.var('index')
+                old_var = block.var('old')
+                append_var = block.var('append')
+                body = [
+                    ast_assign(
+                        index_var,
+                        ast.DictComp(
+                            ast_attr(ast_name(old_var), key),
+                            ast_name(old_var), [
+                                ast.comprehension(
+                                    ast_name(old_var, is_lhs=True),
+                                    ast_name(cur_var), [], 0)
+                            ])),
+                    ast_assign(ret_var, ast.List([], ast.Load())),
+                    ast_assign(append_var, ast_attr(ast_name(ret_var), 'append')),
+                    ast.For(
+                        target=ast_name(iter_block, is_lhs=True),
+                        iter=ast_name(block),
+                        body=[
+                            ast_assign(
+                                iter_block.var('cur'),
+                                ast_call(
+                                    ast_attr(ast_name(index_var), 'get'), [
+                                        ast.Subscript(
+                                            ast_name(iter_block),
+                                            ast.Index(ast.Str(key)),
+                                            ast.Load())
+                                    ])),
+                            *_make_merge_from_spec(spec.elem, iter_block),
+                            ast.Expr(
+                                ast_call(
+                                    ast_name(append_var),
+                                    [ast_name(iter_block.var('ret'))]))
+                        ],
+                        orelse=[]),
+                    ast.Assign([
+                        ast.Subscript(
+                            ast_name(cur_var), ast.Slice(None, None, None),
+                            ast.Store())
+                    ], ast_name(ret_var)),
+                    ast_assign(ret_var, cur_var)
+                ]
+            return [
+                ast.If(
+                    is_cur('_list'), body,
+                    make_match_from_spec(spec, block, recur))
+            ]
+
+        if isinstance(spec, Dict):
+            # the `ret` of the key and the value blocks are the same variable.
+            key_var = block.var('key')
+            key_block = block.let().var('key')
+            value_block = block.let().var('value')
+            body = [
+                *_make_match_from_spec(spec.key, key_block),
+                ast_assign(key_var, key_block.var('ret'))
+            ]
+            if isinstance(spec.value, Concrete):
+                body.extend(_make_match_from_spec(spec.value, value_block))
+            else:
+                body.extend([
+                    ast_assign(
+                        value_block.var('cur'),
+                        ast_call(
+                            ast_attr(ast_name(ret_var), 'get'),
+                            [ast_name(key_var)])),
+                    *_make_merge_from_spec(spec.value, value_block)
+                ])
+            body.append(
+                ast.Assign([
+                    ast.Subscript(
+                        ast_name(ret_var), ast.Index(ast_name(key_var)),
+                        ast.Store())
+                ], ast_name(value_block.var('ret'))))
+            return [
+                ast.If(
+                    is_cur('_dict'), [
+                        ast_assign(ret_var, cur_var),
+                        ast.For(
+                            target=ast.Tuple([
+                                ast_name(key_block, is_lhs=True),
+                                ast_name(value_block, is_lhs=True)
+                            ], ast.Store()),
+                            iter=ast_call(
+                                ast_attr(ast_name(block), 'items'), []),
+                            body=body,
+                            orelse=[])
+                    ], make_match_from_spec(spec, block, recur))
+            ]
+
+        if isinstance(spec, Union):
+            layout = union_layout(spec)
+            cls_var = block.var('cls')
+
+            def merge_member(member: Spec):
+                if isinstance(member, Concrete):
+                    # the class is already checked.
+                    return [ast_assign(ret_var, block)]
+                return _make_merge_from_spec(member)
+
+            no_match = [
+                ast_raise_type_err(
+                    f'no member of {spec_repr(spec)} matches {{!r}}.', block)
+            ]
+            branches = [(ast_is(cls_var, '_' + cls.__name__),
+                         merge_member(member))
+                        for cls, member in layout.by_type]
+            if layout.by_key or layout.default:
+                if layout.discriminator is not None:
+                    tag_var = block.var('tag')
+                    prepare = [
+                        ast_assign(
+                            tag_var,
+                            ast_call(
+                                ast_attr(ast_name(block), 'get'),
+                                [ast.Str(layout.discriminator)]))
+                    ]
+                    tests = [
+                        ast.Compare(
+                            ast_name(tag_var), [ast.Eq()], [ast.Str(tag)])
+                        for tag, _ in layout.by_key
+                    ]
+                else:
+                    prepare = []
+                    tests = [
+                        ast.Compare(
+                            ast.Str(key), [ast.In()], [ast_name(block)])
+                        for key, _ in layout.by_key
+                    ]
+                branches.append((ast_is(cls_var, '_dict'), [
+                    *prepare, *ast_if_chain(
+                        [(test, merge_member(member))
+                         for test, (_, member) in zip(tests, layout.by_key)],
+                        merge_member(layout.default)
+                        if layout.default else no_match)
+                ]))
+            return [
+                ast_assign(cls_var, ast_attr(ast_name(block), '__class__')),
+                *ast_if_chain(branches, no_match)
+            ]
+
+        if isinstance(spec, Named):
+            named_type = spec.typ
+            if recur and not inlined:
+                # objects of another class, or missing, are decoded.
+                return [
+                    ast.If(
+                        is_cur('_' + named_type.__name__),
+                        inline_named(
+                            spec, recur, lambda: make_merge_from_spec(
+                                spec, block, recur, True), [
+                                    ast_assign(
+                                        ret_var,
+                                        ast_call(
+                                            ast_name('merge_' +
+                                                     named_type.__name__),
+                                            [ast_name(cur_var),
+                                             ast_name(block)]))
+                                ]), make_match_from_spec(spec, block, recur))
+                ]
+
+            field_block = block.let()
+            suites = [
+                ast.If(
+                    ast.UnaryOp(ast.Not(), ast_isinstance(block, dict)), [
+                        ast_raise_type_err(
+                            f'expected a dict of {named_type.__qualname__}, '
+                            'got {!r}.', block)
+                    ], []),
+                ast_assign(ret_var, cur_var)
+            ]
+            _, fields = SchemaMonitor.schemas[named_type.__qualname__]
+            for attr, field_spec in fields:
+                if isinstance(field_spec, ForwardRef):
+                    raise TypeError
+                body = [
+                    ast_assign(
+                        field_block,
+                        ast.Subscript(
+                            ast_name(block), ast.Index(ast.Str(attr)),
+                            ast.Load()))
+                ]
+                if isinstance(field_spec, Concrete):
+                    body.extend(_make_match_from_spec(field_spec, field_block))
+                else:
+                    body.extend([
+                        ast_assign(
+                            field_block.var('cur'),
+                            ast_call(
+                                ast_name('_getattr'), [
+                                    ast_name(ret_var),
+                                    ast.Str(attr),
+                                    ast.NameConstant(None)
+                                ])), *_make_merge_from_spec(
+                                    field_spec, field_block,
+                                    list_strategy(named_type, attr))
+                    ])
+                body.append(
+                    ast.Assign(
+                        [ast_attr(ast_name(ret_var), attr, is_lhs=True)],
+                        ast_name(field_block.var('ret'))))
+                suites.append(
+                    ast.If(
+                        ast.Compare(ast.Str(attr), [ast.In()],
+                                    [ast_name(block)]), body, []))
+            return suites
+        else:
+            raise TypeError(spec)
+
+    def make_write_from_spec(
+            spec: Spec,
+            block: BlockLevel = BlockLevel(),
+            recur=(),
+            inlined=False,
+    ) -> t.List[ast.AST]:
+        def _make_write_from_spec(spec_, reg_=block):
+            return make_write_from_spec(spec_, reg_, (*recur, spec_))
+
+        if recur and not inlined and isinstance(spec, Named):
+            return inline_named(
+                spec, recur,
+                lambda: make_write_from_spec(spec, block, recur, True), [
+                    ast.Expr(
+                        ast_call(
+                            ast_name('write_' + spec.typ.__name__),
+                            [ast_name(block), ast_name('write')]))
+                ])
+
+        if isinstance(spec, ForwardRef):
+            raise TypeError
+
+        if isinstance(spec, Concrete):
+            typ = spec.typ
+            if typ is NoneType:
+                return [ast_write('null')]
+            writer = json_concrete_writers.get(typ, '_dumps')
+            return [ast_write(ast_call(ast_name(writer), [ast_name(block)]))]
+
+        if isinstance(spec, List):
+            elem = spec.elem
+            if isinstance(elem, Concrete) and elem.typ in json_concrete_writers:
+                return [
+                    ast_write('['),
+                    ast_write(
+                        ast_call(
+                            ast_attr(ast.Str(','), 'join'), [
+                                ast_call(
+                                    ast_name('_map'), [
+                                        ast_name(json_concrete_writers[
+                                            elem.typ]),
+                                        ast_name(block)
+                                    ])
+                            ])),
+                    ast_write(']')
+                ]
+
+            sep_var = block.var('sep')
+            iter_block = block.let()
+            return [
+                ast_write('['),
+                ast_assign(sep_var, ast.Str('')),
+                ast.For(
+                    target=ast_name(iter_block, is_lhs=True),
+                    iter=ast_name(block),
+                    body=[
+                        ast_write(ast_name(sep_var)),
+                        ast_assign(sep_var, ast.Str(',')),
+                        *merge_writes(
+                            _make_write_from_spec(elem, iter_block))
+                    ],
+                    orelse=[]),
+                ast_write(']')
+            ]
+
+        if isinstance(spec, Union):
+            layout = union_layout(spec)
+            cls_var = block.var('cls')
+            branches = []
+            for cls, member, tag in layout.by_class():
+                suites = merge_writes(_make_write_from_spec(member))
+                if tag is not None:
+                    head = '{' + json.encoder.encode_basestring(
+                        layout.discriminator) + ':' + \
+                        json.encoder.encode_basestring(tag)
+                    if is_const_write(suites[0]):
+                        # inlined, splice the tag into the first fragment.
+                        first = suites[0].value.args[0].s[1:]
+                        suites[0] = ast_write(head + (
+                            first if first.startswith('}') else ',' + first))
+                    else:
+                        suites = [
+                            ast.Expr(
+                                ast_call(
+                                    ast_name('_write_tagged'), [
+                                        ast_name('write_' + member.typ.__name__),
+                                        ast_name(block),
+                                        ast_name('write'),
+                                        ast.Str(head)
+                                    ]))
+                        ]
+                branches.append((ast_is(cls_var, '_' + cls.__name__), suites))
+            return [
+                ast_assign(cls_var, ast_attr(ast_name(block), '__class__')),
+                *ast_if_chain(branches, [
+                    ast_raise_type_err(
+                        f'no member of {spec_repr(spec)} matches {{!r}}.',
+                        block)
+                ])
+            ]
+
+        if isinstance(spec, Dict):
+            sep_var = block.var('sep')
+            key_block = block.let().var('key')
+            value_block = block.let().var('value')
+
+            key = spec.key
+            if isinstance(key, Concrete) and key.typ is str:
+                key_expr = ast_name(key_block)
+            elif isinstance(key, Concrete):
+                key_expr = ast_call(ast_name('_str'), [ast_name(key_block)])
+            else:
+                raise TypeError(f'json object keys cannot be {key}.')
+
+            return [
+                ast_write('{'),
+                ast_assign(sep_var, ast.Str('')),
+                ast.For(
+                    target=ast.Tuple([
+                        ast_name(key_block, is_lhs=True),
+                        ast_name(value_block, is_lhs=True)
+                    ], ast.Store()),
+                    iter=ast_call(ast_attr(ast_name(block), 'items'), []),
+                    body=[
+                        ast_write(ast_name(sep_var)),
+                        ast_assign(sep_var, ast.Str(',')),
+                        ast_write(
+                            ast_call(
+                                ast_name('_encode_basestring'), [key_expr])),
+                        *merge_writes([
+                            ast_write(':'),
+                            *_make_write_from_spec(spec.value, value_block)
+                        ])
+                    ],
+                    orelse=[]),
+                ast_write('}')
+            ]
+
+        if isinstance(spec, Optional):
+            return [
+                ast.If(
+                    test=ast.Compare(
+                        ast_name(block), [ast.IsNot()],
+                        [ast.NameConstant(None)]),
+                    body=merge_writes(_make_write_from_spec(spec.typ)),
+                    orelse=[ast_write('null')])
+            ]
+
+        if isinstance(spec, Named):
+            named_type = spec.typ
+            field_block = block.let()
+            suites = []
+            _, fields = SchemaMonitor.schemas[named_type.__qualname__]
+            for i, (attr, field_spec) in enumerate(fields):
+                if isinstance(field_spec, ForwardRef):
+                    raise TypeError
+                # precomputed key fragment, e.g: `{"name":` or `,"floors":`
+                suites.append(
+                    ast_write(('{' if i == 0 else ',') +
+                              json.encoder.encode_basestring(attr) + ':'))
+                suites.append(
+                    ast_assign(field_block,
+                               ast_attr(ast_name(block), attr)))
+                suites.extend(_make_write_from_spec(field_spec, field_block))
+
+            suites.append(ast_write('}' if fields else '{}'))
+            return merge_writes(suites)
+        else:
+            raise TypeError(spec)
+
+    def make_function_ast(ty: type, prefix='make_'):
+        budget[0] = policy.max_statements
+        decoder_prefix[0] = prefix
         nodes = make_match_from_spec(Named(ty))
+        decoder_prefix[0] = 'make_'
         b = BlockLevel()
+        if prefix == 'make_':
+            # try:
+            #     ...
+            # except Exception as err:
+            #     raise_invalid(<Type>, b__0, err)
+            #     raise
+            # costs nothing until an exception is raised.
+            nodes = [
+                ast.Try(
+                    body=nodes,
+                    handlers=[
+                        ast.ExceptHandler(
+                            type=ast_name('_Exception'),
+                            name='err',
+                            body=[
+                                ast.Expr(
+                                    ast_call(
+                                        ast_name('_raise_invalid'), [
+                                            ast_name('_' + ty.__name__),
+                                            ast_name(b),
+                                            ast_name('err')
+                                        ])),
+                                ast.Raise(None, None)
+                            ])
+                    ],
+                    orelse=[],
+                    finalbody=[])
+            ]
         ret = ast.FunctionDef(
-            name='make_' + ty.__name__,
+            name=prefix + ty.__name__,
             args=ast.arguments(
                 args=[ast.arg(b.to_name(), None)],
                 vararg=None,
@@ -256,15 +1448,122 @@ def generate_method_maker() -> t.Tuple[t.List[type], ast.Module]:
         ast.fix_missing_locations(ret)
         return ret
 
-    types = [a[0] for a in SchemaMonitor.schemas.values()]
+    def make_decoder_ast(name: str, ty: type, selection: dict):
+        b = BlockLevel()
+        nodes = make_match_from_spec(Named(ty), b, selection=selection)
+        return ast_function(name, [b.to_name()],
+                            [*nodes, ast.Return(ast_name(b.var('ret')))])
 
-    fns = list(map(make_function_ast, types))
+    def make_dump_function_ast(ty: type):
+        budget[0] = policy.max_statements
+        b = BlockLevel()
+        nodes = make_dump_from_spec(Named(ty), b)
+        return ast_function('to_dict_' + ty.__name__, [b.to_name()],
+                            [*nodes, ast.Return(ast_name(b.var('ret')))])
 
-    exports = ast.Return(
-        ast.Dict(*map(
-            list,
-            zip(*[(ast.Str(each.__qualname__),
-                   ast_name('make_' + each.__name__)) for each in types]))))
+    def make_clone_function_ast(ty: type):
+        budget[0] = policy.max_statements
+        b = BlockLevel()
+        nodes = make_clone_from_spec(Named(ty), b)
+        return ast_function('clone_' + ty.__name__, [b.to_name()],
+                            [*nodes, ast.Return(ast_name(b.var('ret')))])
+
+    def make_clone_graph_function_ast(ty: type):
+        # def clone_graph_<Type>(b__0, memo):
+        budget[0] = policy.max_statements
+        b = BlockLevel()
+        nodes = make_clone_from_spec(Named(ty), b, memo=True)
+        return ast_function('clone_graph_' + ty.__name__,
+                            [b.to_name(), 'memo'],
+                            [*nodes, ast.Return(ast_name(b.var('ret')))])
+
+    def make_merge_function_ast(ty: type):
+        # def merge_<Type>(b_cur_0, b__0):
+        #     if not isinstance(b_cur_0, <Type>): raise TypeError
+        #     ...
+        budget[0] = policy.max_statements
+        b = BlockLevel()
+        calls_from_dict[0] = True
+        try:
+            nodes = make_merge_from_spec(Named(ty), b)
+        finally:
+            calls_from_dict[0] = False
+        cur = b.var('cur')
+        check = ast.If(
+            ast.UnaryOp(ast.Not(), ast_isinstance(cur, ty)), [
+                ast_raise_type_err(
+                    f'expected an instance of {ty.__qualname__}, got {{!r}}.',
+                    cur)
+            ], [])
+        return ast_function(
+            'merge_' + ty.__name__, [cur.to_name(), b.to_name()],
+            [check, *nodes, ast.Return(ast_name(b.var('ret')))])
+
+    def make_write_function_ast(ty: type):
+        budget[0] = policy.max_statements
+        b = BlockLevel()
+        nodes = make_write_from_spec(Named(ty), b)
+        return ast_function('write_' + ty.__name__, [b.to_name(), 'write'],
+                            merge_writes(nodes))
+
+    def make_json_function_ast(ty: type):
+        # def to_json_<Type>(b__0):
+        #     buf = _StringIO()
+        #     write_<Type>(b__0, buf.write)
+        #     return buf.getvalue().encode()
+        b = BlockLevel()
+        return ast_function('to_json_' + ty.__name__, [b.to_name()], [
+            ast.Assign([ast_name('buf', is_lhs=True)],
+                       ast_call(ast_name('_StringIO'), [])),
+            ast.Expr(
+                ast_call(
+                    ast_name('write_' + ty.__name__),
+                    [ast_name(b), ast_attr(ast_name('buf'), 'write')])),
+            ast.Return(
+                ast_call(
+                    ast_attr(
+                        ast_call(ast_attr(ast_name('buf'), 'getvalue'), []),
+                        'encode'), []))
+        ])
+
+    if selections is not None:
+        fns = [
+            make_decoder_ast(name, ty, selection)
+            for name, (ty, selection) in selections.items()
+        ]
+        exports = ast.Return(
+            ast.Dict([ast.Str(name) for name in selections],
+                     [ast_name(name) for name in selections]))
+    else:
+        emitted = types if generated is None else [
+            each for each in types if each in generated
+        ]
+        fns = [
+            *map(make_function_ast, emitted),
+            *map(make_dump_function_ast, emitted),
+            *map(make_write_function_ast, emitted),
+            *map(make_json_function_ast, emitted),
+            *map(make_clone_function_ast, emitted),
+            *map(make_clone_graph_function_ast, emitted),
+            *(map(make_merge_function_ast, emitted) if merge else ())
+        ]
+        # `None` in place of the functions not generated.
+        prefixes = ['make_', 'to_dict_', 'to_json_', 'clone_', 'clone_graph_',
+                    'merge_' if merge else None]
+        if trusted:
+            fns.extend(
+                make_function_ast(each, 'make_trusted_') for each in emitted)
+            prefixes.append('make_trusted_')
+
+        exports = ast.Return(
+            ast.Dict(*map(
+                list,
+                zip(*[(ast.Str(each.__qualname__),
+                       ast.Tuple([
+                           ast_name(prefix + each.__name__)
+                           if prefix else ast.NameConstant(None)
+                           for prefix in prefixes
+                       ], ast.Load())) for each in emitted]))))
 
     closure = ast.FunctionDef(
         name='make',
@@ -287,29 +1586,223 @@ def generate_method_maker() -> t.Tuple[t.List[type], ast.Module]:
     closure.body = [
         *[
             ast.Assign([ast_name(name, is_lhs=True)], ast_name(name[1:]))
-            for name in local_bindings
+            for name in sorted(local_bindings)
         ], *closure.body
     ]
 
     ast.fix_missing_locations(closure)
     # pprint(closure)
-    mod = ast.Module([closure])
+    mod = ast.Module([*prelude, closure])
+    ast.fix_missing_locations(mod)
     return types, mod
 
 
-def generate(use_cython=False):
-    types, mod = generate_method_maker()
+def generate(use_cython=False,
+             backend='ast',
+             lazy=False,
+             incremental=False,
+             policy: InlinePolicy = None,
+             validate=True,
+             trusted=False,
+             merge=False):
+    """
+    :param backend: 'ast', or 'bytecode' to assemble code objects directly,
+    see `graphql_bc`, which takes none of the other options.
+    :param lazy: generate the codecs of a type and the types reachable from it
+    on first use, instead of generating all the registered types up front.
+    :param incremental: keep the codecs up to date when types are registered or
+    removed later on, only the changed types and the types inlining them are
+    regenerated, on first use.
+    :param policy: see `InlinePolicy`.
+    :param validate: check the types of concrete values in `from_dict`,
+    skip it for data validated upstream.
+    :param trusted: also install `from_dict_trusted` skipping the checks,
+    next to the validating `from_dict`.
+    :param merge: also generate `merge_from_dict`, otherwise the one of
+    `merge` is used, which costs no codegen.
+    """
+    if backend == 'bytecode':
+        from .graphql_bc import generate as bc_generate
+        return bc_generate(use_cython, lazy, incremental, policy, validate,
+                           trusted, merge)
+    if backend != 'ast':
+        raise ValueError(f'unknown backend {backend!r}.')
+
+    options.update(
+        use_cython=use_cython,
+        policy=policy,
+        validate=validate,
+        trusted=trusted,
+        merge=merge)
+    SchemaMonitor.incremental = incremental
+    dirty.clear()
+    if lazy:
+        install_trampolines(list(SchemaMonitor.schemas))
+        return
+
+    generate_types(None, use_cython, policy, validate, trusted, merge=merge)
+
+
+# the options of the last `generate`, for the codecs generated on first use.
+options = {}
+# qualnames of the types whose codecs are trampolines, see `load`.
+dirty: t.Set[str] = set()
+
+
+def calls_cycles_only(policy: t.Optional[InlinePolicy]) -> bool:
+    """
+    whether the codecs inline every type but the ones in their cycles, whose
+    functions are called instead.
+    """
+    policy = policy or default_policy
+    return policy.max_depth is None and policy.max_statements is None \
+        and policy.max_sites is None
+
+
+def load(ty: type):
+    """
+    generate the codecs of the dirty types reachable from `ty`.
+    the types in a cycle with a dirty type refer to the changed types as well,
+    so the functions called by the regenerated ones are regenerated too, unless
+    the policy calls other types.
+    """
+    types = []
+    while True:
+        # the resolved forward refs reach more types.
+        reached = SchemaMonitor.reachable(ty)
+        if len(reached) == len(types):
+            break
+        types = reached
+        SchemaMonitor.resolve(
+            strict=True, qualnames=[each.__qualname__ for each in types])
+    policy = options['policy']
+    generated = [
+        each for each in types if each.__qualname__ in dirty
+    ] if calls_cycles_only(policy) else types
+    generate_types(types, options['use_cython'], policy, options['validate'],
+                   options['trusted'], generated, options['merge'])
+    dirty.difference_update(each.__qualname__ for each in generated)
+
+
+def install_trampolines(qualnames: t.Iterable[str]):
+    names = ('from_dict', 'to_dict', 'to_json', 'clone', 'clone_graph',
+             *(['merge_from_dict'] if options['merge'] else []),
+             *(['from_dict_trusted'] if options['trusted'] else []))
+    for qualname in qualnames:
+        ty, _ = SchemaMonitor.schemas[qualname]
+        dirty.add(qualname)
+        for name in names:
+            setattr(ty, name, Trampoline(name, load))
+        if not options['merge'] and 'merge_from_dict' in ty.__dict__:
+            delattr(ty, 'merge_from_dict')
+
+
+def invalidate(qualnames: t.Set[str]):
+    if SchemaMonitor.incremental:
+        install_trampolines(qualnames)
+
+
+SchemaMonitor.listeners.append(invalidate)
+
+
+def generate_types(types: t.Optional[t.List[type]],
+                   use_cython=False,
+                   policy: InlinePolicy = None,
+                   validate=True,
+                   trusted=False,
+                   generated: t.Collection[type] = None,
+                   merge=False):
+    types, mod = generate_method_maker(
+        types,
+        policy=policy,
+        trusted=trusted or not validate,
+        generated=generated,
+        merge=merge)
     if use_cython:
-        with io.StringIO() as ios:
-            Unparser(mod, ios)
-            source = ios.getvalue()
-            mod = compile_module(source, 'generated_module')
-            make = getattr(mod, 'make')
+        mod = compile_module(unparse(mod), 'generated_module')
+        make = getattr(mod, 'make')
     else:
         ctx = {t.__name__: t for t in types}
         exec(compile(mod, "<generated module>", 'exec'), ctx)
         make = ctx['make']
-    fn_dict: dict = make(*types)
-    for qualname, fn in fn_dict.items():
+    install(make(*types), validate)
+
+
+def unparse(mod: ast.Module) -> str:
+    with io.StringIO() as ios:
+        Unparser(mod, ios)
+        return ios.getvalue()
+
+
+def install(fn_dict: dict, validate=True):
+    """
+    :param validate: whether `from_dict` checks the types of concrete values,
+    or is the trusted decoder, which must be generated.
+    """
+    for qualname, (from_dict, to_dict, to_json, clone, clone_graph, merge,
+                   *trusted) in fn_dict.items():
         ty, _ = SchemaMonitor.schemas[qualname]
-        setattr(ty, 'from_dict', staticmethod(fn))
+        if trusted:
+            from_dict_trusted, = trusted
+            setattr(ty, 'from_dict_trusted', staticmethod(from_dict_trusted))
+            if not validate:
+                from_dict = from_dict_trusted
+        setattr(ty, 'from_dict', staticmethod(from_dict))
+        setattr(ty, 'to_dict', to_dict)
+        setattr(ty, 'to_json', to_json)
+        setattr(ty, 'clone', clone)
+        setattr(ty, 'clone_graph', graph_cloner(clone_graph))
+        if merge is not None:
+            setattr(ty, 'merge_from_dict', staticmethod(merge))
+        elif 'merge_from_dict' in ty.__dict__:
+            # the one of `Json`, see `generate(merge=False)`.
+            delattr(ty, 'merge_from_dict')
+
+
+def graph_cloner(clone_graph: t.Callable[[t.Any, dict], t.Any]):
+    def clone(self):
+        return clone_graph(self, {})
+
+    return clone
+
+
+def generate_source(policy: InlinePolicy = None, trusted=False,
+                    merge=False) -> str:
+    """
+    source of an importable module holding the generated `make` closure,
+    see `auto_json.compile` and `load_precompiled`.
+    """
+    types, mod = generate_method_maker(
+        policy=policy, trusted=trusted, merge=merge)
+    header = textwrap.dedent(f'''
+    # generated by auto_json.compile, do not edit.
+    FINGERPRINT = {SchemaMonitor.fingerprint()!r}
+    TYPES = {[each.__qualname__ for each in types]!r}
+    ''')
+    return header + unparse(mod)
+
+
+def load_precompiled(module: t.Union[str, ModuleType],
+                     use_cython=False) -> bool:
+    """
+    install the codecs from a module written by `auto_json.compile`,
+    or generate them when the module is missing or its schema fingerprint is stale.
+    :return: whether the precompiled codecs are used.
+    """
+    if isinstance(module, str):
+        try:
+            module = importlib.import_module(module)
+        except ImportError:
+            warnings.warn(f'precompiled codecs {module!r} not found.')
+            generate(use_cython)
+            return False
+
+    if module.FINGERPRINT != SchemaMonitor.fingerprint():
+        warnings.warn(
+            f'precompiled codecs {module.__name__!r} are stale, regenerating.')
+        generate(use_cython)
+        return False
+
+    install(module.make(*(SchemaMonitor.schemas[each][0]
+                          for each in module.TYPES)))
+    return True
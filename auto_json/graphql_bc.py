@@ -1,3 +1,550 @@
 """
-bytecode 层面的graphql优化
+bytecode 层面的graphql优化:
+
+直接从spec汇编出CodeType, 跳过ast构建, fix_missing_locations以及compile,
+在注册了大量schema时可显著降低启动开销。
+
+    1. 与ast版本采用相同的内联以及递归截断策略;
+    2. 中间值尽量留在栈上:
+       字段取值使用`BINARY_SUBSCR`而不是`data.__getitem__`的方法调用,
+       列表/字典使用`LIST_APPEND`/`MAP_ADD`而不是`append`/`__setitem__`;
+    3. 类型, isinstance等作为常量由`LOAD_CONST`加载。
+
+仅支持CPython 3.6 ~ 3.8 的wordcode, 其他版本退回ast后端。
 """
+from .schema_analyse import *
+import builtins
+from json import dumps
+import dis
+import sys
+import types
+
+supported = sys.implementation.name == 'cpython' and (
+    3, 6) <= sys.version_info[:2] <= (3, 8)
+
+opmap = dis.opmap
+CO_OPTIMIZED = 0x1
+CO_NEWLOCALS = 0x2
+CO_NOFREE = 0x40
+
+# dis.cmp_op.index('is'), ...
+COMPARE_EQ = 2
+COMPARE_IN = 6
+COMPARE_IS = 8
+
+
+class Label:
+    __slots__ = ['offset', 'depth']
+
+    def __init__(self):
+        self.offset = None
+        self.depth = None
+
+
+class Assembler:
+    def __init__(self, name: str, args: t.List[str]):
+        self.co_name = name
+        self.argcount = len(args)
+        self.instrs: t.List[t.Tuple[str, t.Union[int, Label]]] = []
+        self.consts = [None]
+        self.const_ids = {}
+        self.names = []
+        self.varnames = list(args)
+        self.depth = 0
+        self.max_depth = 0
+
+    def const(self, value) -> int:
+        # types, functions and other unhashable constants are keyed by identity.
+        key = id(value), type(value)
+        idx = self.const_ids.get(key)
+        if idx is None:
+            idx = self.const_ids[key] = len(self.consts)
+            self.consts.append(value)
+        return idx
+
+    def name(self, name: str) -> int:
+        if name not in self.names:
+            self.names.append(name)
+        return self.names.index(name)
+
+    def local(self, name: str) -> int:
+        if name not in self.varnames:
+            self.varnames.append(name)
+        return self.varnames.index(name)
+
+    def _adjust(self, effect: int):
+        self.depth += effect
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+
+    def emit(self, opname: str, arg: t.Union[int, Label] = 0):
+        op = opmap[opname]
+        self.instrs.append((opname, arg))
+        if opname == 'FOR_ITER':
+            # the exhausted branch pops the iterator.
+            self.jump_to(arg, self.depth - 1)
+            self._adjust(1)
+            return
+
+        if op < dis.HAVE_ARGUMENT:
+            self._adjust(dis.stack_effect(op))
+        else:
+            self._adjust(
+                dis.stack_effect(op, 0 if isinstance(arg, Label) else arg))
+        if isinstance(arg, Label):
+            self.jump_to(arg, self.depth)
+
+    def jump_to(self, label: Label, depth: int):
+        if label.depth is None:
+            label.depth = depth
+
+    def mark(self, label: Label):
+        self.instrs.append((None, label))
+        if label.depth is not None:
+            self.depth = label.depth
+
+    def load_const(self, value):
+        self.emit('LOAD_CONST', self.const(value))
+
+    def assemble(self) -> bytes:
+        sizes = [1] * len(self.instrs)
+        while True:
+            offsets = []
+            offset = 0
+            for (opname, arg), size in zip(self.instrs, sizes):
+                offsets.append(offset)
+                if opname is None:
+                    arg.offset = offset
+                else:
+                    offset += 2 * size
+
+            code = bytearray()
+            changed = False
+            for i, ((opname, arg), offset) in enumerate(
+                    zip(self.instrs, offsets)):
+                if opname is None:
+                    continue
+                op = opmap[opname]
+                if isinstance(arg, Label):
+                    if op in dis.hasjrel:
+                        arg = arg.offset - (offset + 2 * sizes[i])
+                    else:
+                        arg = arg.offset
+                size = 1
+                while arg >> (8 * size):
+                    size += 1
+                if size != sizes[i]:
+                    sizes[i] = size
+                    changed = True
+                for shift in range(size - 1, 0, -1):
+                    code.append(opmap['EXTENDED_ARG'])
+                    code.append((arg >> (8 * shift)) & 0xff)
+                code.append(op)
+                code.append(arg & 0xff)
+            if not changed:
+                return bytes(code)
+
+    def to_code(self) -> types.CodeType:
+        codestring = self.assemble()
+        args = [
+            self.argcount, 0,
+            len(self.varnames), self.max_depth,
+            CO_OPTIMIZED | CO_NEWLOCALS | CO_NOFREE, codestring,
+            tuple(self.consts),
+            tuple(self.names),
+            tuple(self.varnames), '<generated bytecode>', self.co_name, 1, b'',
+            (), ()
+        ]
+        if sys.version_info >= (3, 8):
+            # posonlyargcount
+            args.insert(1, 0)
+        return types.CodeType(*args)
+
+
+new = object.__new__
+
+if sys.version_info >= (3, 8):
+
+    def emit_map_add(asm: Assembler, i: int):
+        # stack: key, value
+        asm.emit('MAP_ADD', i)
+else:
+
+    def emit_map_add(asm: Assembler, i: int):
+        # stack: value, key
+        asm.emit('ROT_TWO')
+        asm.emit('MAP_ADD', i)
+
+
+def emit_call(asm: Assembler, fn, n_args: int):
+    """
+    call `fn` with the top `n_args` values of the stack.
+    """
+    asm.load_const(fn)
+    if n_args == 1:
+        asm.emit('ROT_TWO')
+    elif n_args == 2:
+        asm.emit('ROT_THREE')
+    else:
+        raise ValueError(n_args)
+    asm.emit('CALL_FUNCTION', n_args)
+
+
+def emit_type_error(asm: Assembler, msg: str):
+    """
+    stack: value -> raise TypeError(msg.format(value))
+    """
+    emit_call(asm, msg.format, 1)
+    emit_call(asm, TypeError, 1)
+    asm.emit('RAISE_VARARGS', 1)
+
+
+def emit_dispatch(asm: Assembler, branches: t.List[t.Tuple[type, t.Callable]],
+                  spec: Spec):
+    """
+    stack: value -> result of the branch for `value.__class__`
+    """
+    end, no_match = Label(), Label()
+    asm.emit('DUP_TOP')
+    asm.emit('LOAD_ATTR', asm.name('__class__'))
+    for cls, emit_branch in branches:
+        next_branch = Label()
+        asm.emit('DUP_TOP')
+        asm.load_const(cls)
+        asm.emit('COMPARE_OP', COMPARE_IS)
+        asm.emit('POP_JUMP_IF_FALSE', next_branch)
+        asm.emit('POP_TOP')
+        emit_branch()
+        asm.emit('JUMP_FORWARD', end)
+        asm.mark(next_branch)
+    asm.emit('POP_TOP')
+    emit_type_error(asm, f'no member of {spec_repr(spec)} matches {{!r}}.')
+    asm.mark(end)
+
+
+def emit_decode(asm: Assembler, spec: Spec, recur=(), level=0):
+    """
+    stack: data -> decoded value
+    """
+
+    def _emit_decode(spec_, level_=level):
+        emit_decode(asm, spec_, (*recur, spec_), level_)
+
+    if recur.count(spec) == 2 and isinstance(spec, Named):
+        # avoid recursive expanding
+        asm.emit('LOAD_GLOBAL', asm.name('make_' + spec.typ.__name__))
+        asm.emit('ROT_TWO')
+        asm.emit('CALL_FUNCTION', 1)
+        return
+
+    if isinstance(spec, ForwardRef):
+        raise TypeError
+
+    if isinstance(spec, Concrete):
+        typ = spec.typ
+        if typ is object:
+            return
+        ok = Label()
+        asm.emit('DUP_TOP')
+        asm.load_const(isinstance)
+        asm.emit('ROT_TWO')
+        asm.load_const(typ)
+        asm.emit('CALL_FUNCTION', 2)
+        asm.emit('POP_JUMP_IF_TRUE', ok)
+        emit_type_error(asm,
+                        'expected an instance of ' + repr(typ) + ', got {!r}.')
+        asm.mark(ok)
+        return
+
+    if isinstance(spec, List):
+        loop, end = Label(), Label()
+        asm.emit('BUILD_LIST', 0)
+        asm.emit('ROT_TWO')
+        asm.emit('GET_ITER')
+        asm.mark(loop)
+        asm.emit('FOR_ITER', end)
+        _emit_decode(spec.elem, level + 1)
+        asm.emit('LIST_APPEND', 2)
+        asm.emit('JUMP_ABSOLUTE', loop)
+        asm.mark(end)
+        return
+
+    if isinstance(spec, Union):
+        layout = union_layout(spec)
+
+        def emit_member(member: Spec):
+            if isinstance(member, Concrete):
+                # the class is already checked.
+                return lambda: None
+            return lambda: _emit_decode(member)
+
+        def emit_object():
+            end = Label()
+            if layout.discriminator is not None:
+                tag = asm.local(f'tag_{level}')
+                asm.emit('DUP_TOP')
+                asm.emit('LOAD_ATTR', asm.name('get'))
+                asm.load_const(layout.discriminator)
+                asm.emit('CALL_FUNCTION', 1)
+                asm.emit('STORE_FAST', tag)
+            for key, member in layout.by_key:
+                next_member = Label()
+                if layout.discriminator is not None:
+                    # tag == key
+                    asm.emit('LOAD_FAST', tag)
+                    asm.load_const(key)
+                    asm.emit('COMPARE_OP', COMPARE_EQ)
+                else:
+                    # key in data
+                    asm.emit('DUP_TOP')
+                    asm.load_const(key)
+                    asm.emit('ROT_TWO')
+                    asm.emit('COMPARE_OP', COMPARE_IN)
+                asm.emit('POP_JUMP_IF_FALSE', next_member)
+                emit_member(member)()
+                asm.emit('JUMP_FORWARD', end)
+                asm.mark(next_member)
+            if layout.default:
+                emit_member(layout.default)()
+            else:
+                emit_type_error(
+                    asm, f'no member of {spec_repr(spec)} matches {{!r}}.')
+            asm.mark(end)
+
+        branches = [(cls, emit_member(member))
+                    for cls, member in layout.by_type]
+        if layout.by_key or layout.default:
+            branches.append((dict, emit_object))
+        emit_dispatch(asm, branches, spec)
+        return
+
+    if isinstance(spec, Dict):
+        loop, end = Label(), Label()
+        asm.emit('BUILD_MAP', 0)
+        asm.emit('ROT_TWO')
+        asm.emit('LOAD_ATTR', asm.name('items'))
+        asm.emit('CALL_FUNCTION', 0)
+        asm.emit('GET_ITER')
+        asm.mark(loop)
+        asm.emit('FOR_ITER', end)
+        # stack: value, key
+        asm.emit('UNPACK_SEQUENCE', 2)
+        _emit_decode(spec.key, level + 1)
+        asm.emit('ROT_TWO')
+        _emit_decode(spec.value, level + 1)
+        emit_map_add(asm, 2)
+        asm.emit('JUMP_ABSOLUTE', loop)
+        asm.mark(end)
+        return
+
+    if isinstance(spec, Optional):
+        none, end = Label(), Label()
+        asm.emit('DUP_TOP')
+        asm.emit('POP_JUMP_IF_FALSE', none)
+        _emit_decode(spec.typ)
+        asm.emit('JUMP_FORWARD', end)
+        asm.mark(none)
+        asm.emit('POP_TOP')
+        asm.load_const(None)
+        asm.mark(end)
+        return
+
+    if isinstance(spec, Named):
+        named_type = spec.typ
+        obj = asm.local(f'obj_{level}')
+        asm.load_const(new)
+        asm.load_const(named_type)
+        asm.emit('CALL_FUNCTION', 1)
+        asm.emit('STORE_FAST', obj)
+        _, fields = SchemaMonitor.schemas[named_type.__qualname__]
+        for attr, field_spec in fields:
+            # stack: data -> data, data[attr] -> data, value
+            asm.emit('DUP_TOP')
+            asm.load_const(attr)
+            asm.emit('BINARY_SUBSCR')
+            _emit_decode(field_spec, level + 1)
+            asm.emit('LOAD_FAST', obj)
+            asm.emit('STORE_ATTR', asm.name(attr))
+        asm.emit('POP_TOP')
+        asm.emit('LOAD_FAST', obj)
+        return
+
+    raise TypeError(spec)
+
+
+def emit_dump(asm: Assembler, spec: Spec, recur=(), level=0):
+    """
+    stack: object -> dumped value
+    """
+
+    def _emit_dump(spec_, level_=level):
+        emit_dump(asm, spec_, (*recur, spec_), level_)
+
+    if recur.count(spec) == 2 and isinstance(spec, Named):
+        # avoid recursive expanding
+        asm.emit('LOAD_GLOBAL', asm.name('to_dict_' + spec.typ.__name__))
+        asm.emit('ROT_TWO')
+        asm.emit('CALL_FUNCTION', 1)
+        return
+
+    if isinstance(spec, ForwardRef):
+        raise TypeError
+
+    if isinstance(spec, Concrete):
+        return
+
+    if isinstance(spec, List):
+        if isinstance(spec.elem, Concrete):
+            emit_call(asm, list, 1)
+            return
+        loop, end = Label(), Label()
+        asm.emit('BUILD_LIST', 0)
+        asm.emit('ROT_TWO')
+        asm.emit('GET_ITER')
+        asm.mark(loop)
+        asm.emit('FOR_ITER', end)
+        _emit_dump(spec.elem, level + 1)
+        asm.emit('LIST_APPEND', 2)
+        asm.emit('JUMP_ABSOLUTE', loop)
+        asm.mark(end)
+        return
+
+    if isinstance(spec, Union):
+        layout = union_layout(spec)
+
+        def emit_member(member: Spec, tag: t.Optional[str]):
+            def emit_branch():
+                _emit_dump(member)
+                if tag is not None:
+                    # stack: dumped -> dumped; dumped[discriminator] = tag
+                    asm.emit('DUP_TOP')
+                    asm.load_const(tag)
+                    asm.emit('ROT_TWO')
+                    asm.load_const(layout.discriminator)
+                    asm.emit('STORE_SUBSCR')
+
+            return emit_branch
+
+        emit_dispatch(asm, [(cls, emit_member(member, tag))
+                            for cls, member, tag in layout.by_class()], spec)
+        return
+
+    if isinstance(spec, Dict):
+        if isinstance(spec.key, Concrete) and isinstance(spec.value, Concrete):
+            emit_call(asm, dict, 1)
+            return
+        loop, end = Label(), Label()
+        asm.emit('BUILD_MAP', 0)
+        asm.emit('ROT_TWO')
+        asm.emit('LOAD_ATTR', asm.name('items'))
+        asm.emit('CALL_FUNCTION', 0)
+        asm.emit('GET_ITER')
+        asm.mark(loop)
+        asm.emit('FOR_ITER', end)
+        asm.emit('UNPACK_SEQUENCE', 2)
+        _emit_dump(spec.key, level + 1)
+        asm.emit('ROT_TWO')
+        _emit_dump(spec.value, level + 1)
+        emit_map_add(asm, 2)
+        asm.emit('JUMP_ABSOLUTE', loop)
+        asm.mark(end)
+        return
+
+    if isinstance(spec, Optional):
+        end = Label()
+        asm.emit('DUP_TOP')
+        asm.load_const(None)
+        asm.emit('COMPARE_OP', COMPARE_IS)
+        # `None` is already on the stack.
+        asm.emit('POP_JUMP_IF_TRUE', end)
+        _emit_dump(spec.typ)
+        asm.mark(end)
+        return
+
+    if isinstance(spec, Named):
+        named_type = spec.typ
+        _, fields = SchemaMonitor.schemas[named_type.__qualname__]
+        if not fields:
+            asm.emit('POP_TOP')
+            asm.emit('BUILD_MAP', 0)
+            return
+        obj = asm.local(f'obj_{level}')
+        asm.emit('STORE_FAST', obj)
+        # stack: value1, value2, ..., keys -> dict
+        for attr, field_spec in fields:
+            asm.emit('LOAD_FAST', obj)
+            asm.emit('LOAD_ATTR', asm.name(attr))
+            _emit_dump(field_spec, level + 1)
+        asm.load_const(tuple(attr for attr, _ in fields))
+        asm.emit('BUILD_CONST_KEY_MAP', len(fields))
+        return
+
+    raise TypeError(spec)
+
+
+def make_function(name: str, spec: Spec, emit, namespace: dict):
+    asm = Assembler(name, ['data'])
+    asm.emit('LOAD_FAST', 0)
+    emit(asm, spec)
+    asm.emit('RETURN_VALUE')
+    return types.FunctionType(asm.to_code(), namespace, name)
+
+
+def generate_functions() -> t.Dict[str, t.Tuple[t.Callable, t.Callable]]:
+    namespace = {'__builtins__': builtins}
+    ret = {}
+    for qualname, (ty, _) in SchemaMonitor.schemas.items():
+        make_name, to_dict_name = 'make_' + ty.__name__, 'to_dict_' + ty.__name__
+        make = namespace[make_name] = make_function(make_name, Named(ty),
+                                                    emit_decode, namespace)
+        to_dict = namespace[to_dict_name] = make_function(
+            to_dict_name, Named(ty), emit_dump, namespace)
+        ret[qualname] = make, to_dict
+    return ret
+
+
+def to_json(self) -> bytes:
+    # as the `to_json` of graphql_ast writes it.
+    return dumps(self.to_dict(), ensure_ascii=False,
+                 separators=(',', ':')).encode()
+
+
+def generate(use_cython=False,
+             lazy=False,
+             incremental=False,
+             policy=None,
+             validate=True,
+             trusted=False,
+             merge=False):
+    """
+    only `from_dict` and `to_dict` are assembled, `to_json`, `clone`,
+    `clone_graph`, `merge_from_dict` and `from_dict_trusted` are the ones of
+    `Json`, replacing the methods installed by an earlier `generate`.
+    the options of `graphql_ast.generate` are not supported.
+    """
+    from .graphql_ast import generate as ast_generate, dirty
+    if not supported:
+        return ast_generate(use_cython, 'ast', lazy, incremental, policy,
+                            validate, trusted, merge)
+    unsupported = [
+        name for name, given in (
+            ('use_cython', use_cython), ('lazy', lazy),
+            ('incremental', incremental), ('policy', policy is not None),
+            ('validate', not validate), ('trusted', trusted),
+            ('merge', merge)) if given
+    ]
+    if unsupported:
+        raise ValueError(
+            f'the bytecode backend does not support {", ".join(unsupported)}.')
+    SchemaMonitor.incremental = False
+    dirty.clear()
+
+    for qualname, (from_dict, to_dict) in generate_functions().items():
+        ty, _ = SchemaMonitor.schemas[qualname]
+        setattr(ty, 'from_dict', staticmethod(from_dict))
+        setattr(ty, 'to_dict', to_dict)
+        setattr(ty, 'to_json', to_json)
+        for name in ('clone', 'clone_graph', 'merge_from_dict',
+                     'from_dict_trusted'):
+            if name in ty.__dict__:
+                delattr(ty, name)
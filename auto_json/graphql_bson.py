@@ -0,0 +1,768 @@
+"""
+schema specialised bson codec:
+
+    the element type codes and key fragments(`code + key + '\\0'`)
+    of every field are known when generating, so that each type gets
+    generated functions packing/unpacking every run of fixed-size items
+    between two variable payloads(heads, numbers, string sizes, NULs)
+    with one precompiled struct, and decoding matches those fragments
+    in declaration order(falling back to a lookup by the raw key bytes)
+    to set attributes directly, without any intermediate dict.
+
+    no pymongo is required.
+"""
+from .schema_analyse import *
+from .graphql_naive import ref_func
+from contextlib import contextmanager
+from itertools import count
+import struct
+
+int32 = struct.Struct('<i')
+int64 = struct.Struct('<q')
+double = struct.Struct('<d')
+
+pack_int32 = int32.pack
+pack_int32_into = int32.pack_into
+unpack_int32 = int32.unpack_from
+pack_int64 = int64.pack
+unpack_int64 = int64.unpack_from
+pack_double = double.pack
+unpack_double = double.unpack_from
+
+BSON_DOUBLE = 0x01
+BSON_STRING = 0x02
+BSON_DOCUMENT = 0x03
+BSON_ARRAY = 0x04
+BSON_BOOL = 0x08
+BSON_NULL = 0x0A
+BSON_INT32 = 0x10
+BSON_INT64 = 0x12
+
+SIZE_PLACEHOLDER = b'\x00\x00\x00\x00'
+
+# cstring keys of array elements: b'0\x00', b'1\x00', ...
+index_keys = [str(i).encode() + b'\x00' for i in range(1024)]
+
+# element type code and struct format of the scalars written inline.
+scalar_formats = {
+    str: (BSON_STRING, None),
+    int: (BSON_INT64, 'q'),
+    float: (BSON_DOUBLE, 'd'),
+    NoneType: (BSON_NULL, None),
+}
+
+fixed_sizes = {
+    BSON_DOUBLE: 8,
+    BSON_BOOL: 1,
+    BSON_NULL: 0,
+    BSON_INT32: 4,
+    BSON_INT64: 8,
+}
+
+
+def index_key(i: int) -> bytes:
+    return index_keys[i] if i < 1024 else str(i).encode() + b'\x00'
+
+
+def skip_element(buf: bytes, offset: int, code: int) -> int:
+    size = fixed_sizes.get(code)
+    if size is not None:
+        return offset + size
+    if code is BSON_STRING:
+        return offset + 4 + unpack_int32(buf, offset)[0]
+    if code is BSON_DOCUMENT or code is BSON_ARRAY:
+        return offset + unpack_int32(buf, offset)[0]
+    raise TypeError(f'unsupported bson element type {code:#x}.')
+
+
+def decode_str(buf: bytes, offset: int) -> t.Tuple[str, int]:
+    end = offset + 4 + unpack_int32(buf, offset)[0]
+    return buf[offset + 4:end - 1].decode('utf-8'), end
+
+
+def expect(code: int, expected: int, spec: Spec):
+    raise TypeError(f'expected bson element type {expected:#x} for {spec}, '
+                    f'got {code:#x}.')
+
+
+# heads(`code + index key`) of array elements by element type code.
+element_heads = {}
+
+
+def array_heads(code: int, n: int) -> t.List[bytes]:
+    heads = element_heads.get(code)
+    if heads is None:
+        heads = element_heads[code] = [
+            bytes([code]) + each for each in index_keys
+        ]
+    if n > len(heads):
+        return heads + [
+            bytes([code]) + index_key(i) for i in range(len(heads), n)
+        ]
+    return heads
+
+
+class Mismatch(Exception):
+    """
+    the document is not laid out as written by the generated encoder.
+    """
+
+
+class Emitter:
+    """
+    the source of a generated function, where the fixed-size items
+    (constant bytes, and values of a struct format) between two lines are
+    packed/unpacked by one precompiled struct.
+    """
+
+    def __init__(self, bind: t.Callable[[t.Any], str], decoding: bool):
+        self.bind = bind
+        self.decoding = decoding
+        self.lines = []
+        self.indent = 1
+        # (struct format, expression to pack or target to unpack),
+        # the format is `None` for constant bytes.
+        self.run = []
+        self.names = count()
+
+    def fresh(self, prefix: str) -> str:
+        return f'{prefix}{next(self.names)}'
+
+    def const(self, value: bytes):
+        self.run.append((None, value))
+
+    def fixed(self, fmt: str, expr: str):
+        self.run.append((fmt, expr))
+
+    def emit(self, line: str):
+        self.lines.append('    ' * self.indent + line)
+
+    def line(self, line: str, flush=True):
+        """
+        :param flush: lines not touching the buffer can be put before the run.
+        """
+        if flush:
+            self.flush()
+        self.emit(line)
+
+    @contextmanager
+    def block(self, header: str, run: list = None):
+        """
+        :param run: the pending items to put at the start of the block
+        instead of before it, for headers not touching the buffer.
+        """
+        if run is None:
+            self.line(header)
+        else:
+            self.emit(header)
+            self.run = list(run)
+        self.indent += 1
+        yield
+        self.flush()
+        self.indent -= 1
+
+    def flush(self):
+        run = []
+        for fmt, item in self.run:
+            if fmt is None and run and run[-1][0] is None:
+                run[-1] = None, run[-1][1] + item
+            else:
+                run.append((fmt, item))
+        self.run = []
+        if not run:
+            return
+        if len(run) == 1 and run[0][0] is None:
+            const = run[0][1]
+            if self.decoding:
+                self.emit(f'if not buf.startswith({const!r}, offset):')
+                self.emit('    raise Mismatch')
+                self.emit(f'offset += {len(const)}')
+            else:
+                self.emit(f'buf += {const!r}')
+            return
+
+        packer = struct.Struct('<' + ''.join(
+            f'{len(item)}s' if fmt is None else fmt for fmt, item in run))
+        if not self.decoding:
+            args = ', '.join(repr(item) if fmt is None else item
+                             for fmt, item in run)
+            self.emit(f'buf += {self.bind(packer.pack)}({args})')
+            return
+
+        targets = []
+        checks = []
+        for fmt, item in run:
+            if fmt is None:
+                head = self.fresh('h')
+                checks.append(f'{head} != {item!r}')
+                item = head
+            targets.append(item)
+        self.emit(f'{", ".join(targets)}, = '
+                  f'{self.bind(packer.unpack_from)}(buf, offset)')
+        if checks:
+            self.emit(f'if {" or ".join(checks)}:')
+            self.emit('    raise Mismatch')
+        self.emit(f'offset += {packer.size}')
+
+    def source(self, header: str) -> str:
+        self.flush()
+        return '\n'.join([header, *self.lines])
+
+
+def generate():
+    codecs = {}
+    # the generated functions `encode_<id>` and `decode_<id>` of named types,
+    # looked up in `ns` when called so that they can be recursive.
+    named_ids = {}
+    ns = {
+        'BSON_DOCUMENT': BSON_DOCUMENT,
+        'Mismatch': Mismatch,
+        'array_heads': array_heads,
+        'expect': expect,
+        'new': object.__new__,
+        'pack_int32': pack_int32,
+        'pack_int32_into': pack_int32_into,
+        'struct_error': struct.error,
+        'unpack_int32': unpack_int32,
+    }
+    bound = {}
+
+    def bind(value) -> str:
+        """
+        :return: the name of a constant in the generated functions.
+        """
+        name = bound.get(id(value))
+        if name is None:
+            name = bound[id(value)] = f'_{len(bound)}'
+            ns[name] = value
+        return name
+
+    def make_from_spec(spec: Spec) -> t.Tuple[int, t.Callable, t.Callable]:
+        """
+        :return: (element type code, encode(buf, value), decode(buf, offset, code))
+        """
+        codec = codecs.get(spec)
+        if codec:
+            return codec
+
+        ref_encode, ref_decode = ref_func('bson-encode'), ref_func(
+            'bson-decode')
+        code = None
+
+        if isinstance(spec, ForwardRef):
+            raise TypeError
+
+        elif isinstance(spec, Concrete):
+            typ = spec.typ
+
+            if typ is str:
+                code = BSON_STRING
+
+                def encode(buf, value):
+                    value = value.encode('utf-8')
+                    buf += pack_int32(len(value) + 1)
+                    buf += value
+                    buf.append(0)
+
+                def decode(buf, offset, code_):
+                    if code_ is not BSON_STRING:
+                        expect(code_, BSON_STRING, spec)
+                    return decode_str(buf, offset)
+
+            elif typ is int:
+                code = BSON_INT64
+
+                def encode(buf, value):
+                    buf += pack_int64(value)
+
+                def decode(buf, offset, code_):
+                    if code_ is BSON_INT64:
+                        return unpack_int64(buf, offset)[0], offset + 8
+                    if code_ is BSON_INT32:
+                        return unpack_int32(buf, offset)[0], offset + 4
+                    expect(code_, BSON_INT64, spec)
+
+            elif typ is float:
+                code = BSON_DOUBLE
+
+                def encode(buf, value):
+                    buf += pack_double(value)
+
+                def decode(buf, offset, code_):
+                    if code_ is not BSON_DOUBLE:
+                        expect(code_, BSON_DOUBLE, spec)
+                    return unpack_double(buf, offset)[0], offset + 8
+
+            elif typ is NoneType:
+                code = BSON_NULL
+
+                def encode(buf, value):
+                    pass
+
+                def decode(buf, offset, code_):
+                    if code_ is not BSON_NULL:
+                        expect(code_, BSON_NULL, spec)
+                    return None, offset
+            else:
+                raise TypeError(f'cannot encode {typ!r} as bson.')
+
+        elif isinstance(spec, Optional):
+            elem_code, elem_encode, elem_decode = make_from_spec(spec.typ)
+            # the type code is decided per value, see `make_element_writer`.
+            encode = elem_encode
+
+            def decode(buf, offset, code_):
+                if code_ is BSON_NULL:
+                    return None, offset
+                return elem_decode(buf, offset, code_)
+
+        elif isinstance(spec, List):
+            code = BSON_ARRAY
+            write_elem = make_element_writer(spec.elem)
+            _, _, elem_decode = make_from_spec(spec.elem)
+
+            def encode(buf, value):
+                start = len(buf)
+                buf += SIZE_PLACEHOLDER
+                for i, each in enumerate(value):
+                    write_elem(buf, index_key(i), each)
+                buf.append(0)
+                pack_int32_into(buf, start, len(buf) - start)
+
+            def decode(buf, offset, code_):
+                if code_ is not BSON_ARRAY:
+                    expect(code_, BSON_ARRAY, spec)
+                end = offset + unpack_int32(buf, offset)[0] - 1
+                offset += 4
+                ret = []
+                append = ret.append
+                while offset < end:
+                    elem_code = buf[offset]
+                    offset = buf.index(0, offset + 1) + 1
+                    value, offset = elem_decode(buf, offset, elem_code)
+                    append(value)
+                return ret, end + 1
+
+        elif isinstance(spec, Union):
+            # the type code is decided per value, see `make_selector`.
+            layout = union_layout(spec)
+            select = make_selector(spec)
+
+            def encode(buf, value):
+                select(value)[1](buf, value)
+
+            by_code = {}
+            for cls, member in layout.by_type:
+                member_decode = make_from_spec(member)[2]
+                by_code[make_from_spec(member)[0]] = member_decode
+                if cls is int:
+                    by_code[BSON_INT32] = member_decode
+            tags = {
+                key: make_from_spec(member)[2]
+                for key, member in layout.by_key
+            }
+            default_decode = layout.default and make_from_spec(
+                layout.default)[2]
+            has_documents = bool(tags) or default_decode is not None
+
+            def document_decoder(buf, offset):
+                # the member of a document, told apart by its keys as in
+                # `union_layout`, without decoding it.
+                end = offset + unpack_int32(buf, offset)[0] - 1
+                offset += 4
+                keys = set()
+                while offset < end:
+                    elem_code = buf[offset]
+                    key_end = buf.index(0, offset + 1)
+                    key = buf[offset + 1:key_end].decode('utf-8')
+                    if key == layout.discriminator and elem_code is BSON_STRING:
+                        tag, _ = decode_str(buf, key_end + 1)
+                        return tags.get(tag, default_decode)
+                    keys.add(key)
+                    offset = skip_element(buf, key_end + 1, elem_code)
+                if layout.discriminator is None:
+                    for key, _ in layout.by_key:
+                        if key in keys:
+                            return tags[key]
+                return default_decode
+
+            def decode(buf, offset, code_):
+                if code_ is BSON_DOCUMENT and has_documents:
+                    member_decode = document_decoder(buf, offset)
+                else:
+                    member_decode = by_code.get(code_)
+                if member_decode is None:
+                    raise TypeError(
+                        f'no member of {spec_repr(spec)} matches bson element '
+                        f'type {code_:#x}.')
+                return member_decode(buf, offset, code_)
+
+        elif isinstance(spec, Dict):
+            code = BSON_DOCUMENT
+            key = spec.key
+            if not isinstance(key, Concrete) or key.typ not in (str, int,
+                                                                float):
+                raise TypeError(f'bson document keys cannot be {key}.')
+            key_typ = key.typ
+            write_value = make_element_writer(spec.value)
+            _, _, value_decode = make_from_spec(spec.value)
+
+            def encode(buf, value):
+                start = len(buf)
+                buf += SIZE_PLACEHOLDER
+                for k, v in value.items():
+                    write_value(buf, str(k).encode('utf-8') + b'\x00', v)
+                buf.append(0)
+                pack_int32_into(buf, start, len(buf) - start)
+
+            def decode(buf, offset, code_):
+                if code_ is not BSON_DOCUMENT:
+                    expect(code_, BSON_DOCUMENT, spec)
+                end = offset + unpack_int32(buf, offset)[0] - 1
+                offset += 4
+                ret = {}
+                while offset < end:
+                    elem_code = buf[offset]
+                    key_end = buf.index(0, offset + 1)
+                    k = buf[offset + 1:key_end].decode('utf-8')
+                    if key_typ is not str:
+                        k = key_typ(k)
+                    ret[k], offset = value_decode(buf, key_end + 1,
+                                                  elem_code)
+                return ret, end + 1
+
+        elif isinstance(spec, Named):
+            code = BSON_DOCUMENT
+            named_type = spec.typ
+            _, fields = SchemaMonitor.schemas[named_type.__qualname__]
+            # register before visiting fields to stop at recursive types.
+            codecs[spec] = code, ref_encode, ref_decode
+            named_ids[spec] = type_id = len(named_ids)
+
+            attrs = [attr for attr, _ in fields]
+            field_decoders = {
+                attr.encode('utf-8'): (attr, make_from_spec(field_spec)[2])
+                for attr, field_spec in fields
+            }
+            n_fields = len(fields)
+
+            def decode_by_key(buf, offset, end, obj):
+                seen = 0
+                while offset < end:
+                    elem_code = buf[offset]
+                    key_end = buf.index(0, offset + 1)
+                    field = field_decoders.get(buf[offset + 1:key_end])
+                    if field is None:
+                        offset = skip_element(buf, key_end + 1, elem_code)
+                        continue
+                    attr, field_decode = field
+                    value, offset = field_decode(buf, key_end + 1, elem_code)
+                    setattr(obj, attr, value)
+                    seen += 1
+                if seen != n_fields:
+                    missing = [
+                        each for each in attrs if not hasattr(obj, each)
+                    ]
+                    raise KeyError(*missing)
+
+            # documents written by `encode` hold the fields in declaration
+            # order, which is checked by matching the precomputed element
+            # heads(`code + key + '\0'`) before falling back to a key lookup
+            # on a fresh object.
+            enc = Emitter(bind, decoding=False)
+            enc.line('start = len(buf)')
+            enc.const(SIZE_PLACEHOLDER)
+            dec = Emitter(bind, decoding=True)
+            dec.indent += 1
+            for attr, field_spec in fields:
+                key = attr.encode('utf-8')
+                emit_encode(enc, field_spec, key, f'obj.{attr}')
+                emit_decode(dec, field_spec, key, f'obj.{attr}')
+            enc.const(b'\x00')
+            enc.line('pack_int32_into(buf, start, len(buf) - start)')
+            dec.line('if offset != end:')
+            dec.line('    raise Mismatch')
+
+            named = bind(named_type)
+            exec(
+                enc.source(f'def encode_{type_id}(buf, obj):') + '\n' +
+                dec.source(
+                    f'def decode_{type_id}(buf, offset, code_):\n'
+                    f'    if code_ is not BSON_DOCUMENT:\n'
+                    f'        expect(code_, BSON_DOCUMENT, {bind(spec)})\n'
+                    f'    end = offset + unpack_int32(buf, offset)[0] - 1\n'
+                    f'    start = offset = offset + 4\n'
+                    f'    obj = new({named})\n'
+                    f'    try:') + '\n' +
+                f'    except (Mismatch, struct_error):\n'
+                f'        obj = new({named})\n'
+                f'        {bind(decode_by_key)}(buf, start, end, obj)\n'
+                f'    return obj, end + 1', ns)
+            encode = ns[f'encode_{type_id}']
+            decode = ns[f'decode_{type_id}']
+
+        else:
+            raise TypeError(spec)
+
+        ref_encode.__class__.__call__ = staticmethod(encode)
+        ref_decode.__class__.__call__ = staticmethod(decode)
+        codec = codecs[spec] = code, encode, decode
+        return codec
+
+    def simple(spec: Spec) -> bool:
+        """
+        the kinds of values written/read inline by the generated functions.
+        """
+        return isinstance(spec, Named) or isinstance(
+            spec, Concrete) and spec.typ in scalar_formats
+
+    def emit_encode(e: Emitter, spec: Spec, key: bytes, value: str):
+        """
+        write the element `key` holding the value of the expression `value`.
+        """
+        if isinstance(spec, Optional) and simple(spec.typ):
+            var = e.fresh('v')
+            e.line(f'{var} = {value}', flush=False)
+            # each branch starts with the items pending before the test.
+            run = e.run
+            with e.block(f'if {var} is None:', run):
+                e.const(bytes([BSON_NULL]) + key + b'\x00')
+            with e.block('else:', run):
+                emit_encode(e, spec.typ, key, var)
+
+        elif isinstance(spec, Concrete) and spec.typ in scalar_formats:
+            code, fmt = scalar_formats[spec.typ]
+            e.const(bytes([code]) + key + b'\x00')
+            if spec.typ is str:
+                var = e.fresh('v')
+                e.line(f"{var} = {value}.encode('utf-8')", flush=False)
+                e.fixed('i', f'len({var}) + 1')
+                e.line(f'buf += {var}')
+                e.const(b'\x00')
+            elif fmt:
+                e.fixed(fmt, value)
+
+        elif isinstance(spec, Named):
+            e.const(bytes([BSON_DOCUMENT]) + key + b'\x00')
+            e.line(f'encode_{named_id(spec)}(buf, {value})')
+
+        elif isinstance(spec, List) and simple(spec.elem):
+            elem = spec.elem
+            var, start, head, each = map(e.fresh, ('v', 'start', 'h', 'x'))
+            e.line(f'{var} = {value}', flush=False)
+            e.const(bytes([BSON_ARRAY]) + key + b'\x00')
+            e.line(f'{start} = len(buf)')
+            e.const(SIZE_PLACEHOLDER)
+            code = make_from_spec(elem)[0]
+            with e.block(f'for {head}, {each} in '
+                         f'zip(array_heads({code}, len({var})), {var}):'):
+                e.line(f'buf += {head}')
+                if isinstance(elem, Named):
+                    e.line(f'encode_{named_id(elem)}(buf, {each})')
+                elif elem.typ is str:
+                    e.line(f"{each} = {each}.encode('utf-8')")
+                    e.line(f'buf += pack_int32(len({each}) + 1)')
+                    e.line(f'buf += {each}')
+                    e.line('buf.append(0)')
+                elif elem.typ is not NoneType:
+                    fmt = scalar_formats[elem.typ][1]
+                    e.line(f'buf += {e.bind(struct.Struct("<" + fmt).pack)}'
+                           f'({each})')
+            e.const(b'\x00')
+            e.line(f'pack_int32_into(buf, {start}, len(buf) - {start})')
+
+        else:
+            write = make_element_writer(spec, key)
+            e.line(f'{e.bind(write)}(buf, {value})')
+
+    def emit_decode(e: Emitter, spec: Spec, key: bytes, target: str):
+        """
+        read the element `key` into the assignment target `target`,
+        raising `Mismatch` if the next element is not it.
+        """
+        if isinstance(spec, Optional) and simple(spec.typ):
+            null_head = bytes([BSON_NULL]) + key + b'\x00'
+            with e.block(f'if buf.startswith({null_head!r}, offset):'):
+                e.line(f'{target} = None')
+                e.line(f'offset += {len(null_head)}')
+            with e.block('else:'):
+                emit_decode(e, spec.typ, key, target)
+
+        elif isinstance(spec, Concrete) and spec.typ in scalar_formats:
+            code, fmt = scalar_formats[spec.typ]
+            e.const(bytes([code]) + key + b'\x00')
+            if spec.typ is str:
+                size = e.fresh('n')
+                e.fixed('i', size)
+                e.line(f"{target} = buf[offset:offset + {size} - 1]"
+                       f".decode('utf-8')")
+                e.line(f'offset += {size}')
+            elif fmt:
+                e.fixed(fmt, target)
+            else:
+                e.line(f'{target} = None', flush=False)
+
+        elif isinstance(spec, Named):
+            e.const(bytes([BSON_DOCUMENT]) + key + b'\x00')
+            e.line(f'{target}, offset = decode_{named_id(spec)}'
+                   f'(buf, offset, BSON_DOCUMENT)')
+
+        elif isinstance(spec, List) and simple(spec.elem):
+            elem = spec.elem
+            size, end, values, each = map(e.fresh, ('n', 'end', 'ret', 'x'))
+            elem_decode = f'decode_{named_id(elem)}' if isinstance(
+                elem, Named) else e.bind(make_from_spec(elem)[2])
+            e.const(bytes([BSON_ARRAY]) + key + b'\x00')
+            e.fixed('i', size)
+            e.line(f'{end} = offset + {size} - 5')
+            e.line(f'{values} = []')
+            with e.block(f'while offset < {end}:'):
+                e.line(f'{each} = buf[offset]')
+                e.line('offset = buf.index(0, offset + 1) + 1')
+                e.line(f'{each}, offset = {elem_decode}(buf, offset, {each})')
+                e.line(f'{values}.append({each})')
+            e.line(f'{target} = {values}')
+            e.line(f'offset = {end} + 1')
+
+        else:
+            decode = make_from_spec(spec)[2]
+            key += b'\x00'
+            e.line(f'if not buf.startswith({key!r}, offset + 1):')
+            e.line('    raise Mismatch')
+            e.line(f'{target}, offset = {e.bind(decode)}'
+                   f'(buf, offset + {len(key) + 1}, buf[offset])')
+
+    def named_id(spec: Named) -> int:
+        make_from_spec(spec)
+        return named_ids[spec]
+
+    def make_selector(spec: Union
+                      ) -> t.Callable[[t.Any], t.Tuple[bytes, t.Callable]]:
+        """
+        :return: select(value) -> (element type code, encode(buf, value))
+        of the member matching the class of the value.
+        """
+        layout = union_layout(spec)
+        by_class = {}
+        for cls, member, tag in layout.by_class():
+            code, encode, _ = make_from_spec(member)
+            if tag is not None:
+                encode = make_tagged(encode, layout.discriminator, tag)
+            by_class[cls] = bytes([code]), encode
+
+        def select(value):
+            ret = by_class.get(value.__class__)
+            if ret is None:
+                raise TypeError(
+                    f'no member of {spec_repr(spec)} matches {value!r}.')
+            return ret
+
+        return select
+
+    def make_tagged(encode: t.Callable, discriminator: str, tag: str):
+        """
+        encode documents holding the tag of their member first.
+        """
+        tag = tag.encode('utf-8')
+        element = bytes([BSON_STRING]) + discriminator.encode(
+            'utf-8') + b'\x00' + pack_int32(len(tag) + 1) + tag + b'\x00'
+
+        def encode_tagged(buf, value):
+            start = len(buf)
+            encode(buf, value)
+            buf[start + 4:start + 4] = element
+            pack_int32_into(buf, start, len(buf) - start)
+
+        return encode_tagged
+
+    def make_element_writer(spec: Spec, key: bytes = None):
+        """
+        :param key: the field name, or `None` for array elements/dict values
+        whose keys are given at call time.
+        :return: write(buf, value) if key is given, otherwise write(buf, key, value).
+        """
+        optional = isinstance(spec, Optional)
+        if optional:
+            spec = spec.typ
+        null_code = bytes([BSON_NULL])
+        if isinstance(spec, Union):
+            select = make_selector(spec)
+        else:
+            code, encode, _ = make_from_spec(spec)
+            code = bytes([code])
+            select = None
+
+        if key is None:
+            if select is not None:
+
+                def write(buf, key_, value):
+                    if optional and value is None:
+                        buf += null_code
+                        buf += key_
+                        return
+                    code_, encode_ = select(value)
+                    buf += code_
+                    buf += key_
+                    encode_(buf, value)
+            elif optional:
+
+                def write(buf, key_, value):
+                    if value is None:
+                        buf += null_code
+                        buf += key_
+                    else:
+                        buf += code
+                        buf += key_
+                        encode(buf, value)
+            else:
+
+                def write(buf, key_, value):
+                    buf += code
+                    buf += key_
+                    encode(buf, value)
+
+            return write
+
+        key += b'\x00'
+        null_head = null_code + key
+        if select is not None:
+
+            def write(buf, value):
+                if optional and value is None:
+                    buf += null_head
+                    return
+                code_, encode_ = select(value)
+                buf += code_
+                buf += key
+                encode_(buf, value)
+        elif optional:
+            head = code + key
+
+            def write(buf, value):
+                if value is None:
+                    buf += null_head
+                else:
+                    buf += head
+                    encode(buf, value)
+        else:
+            head = code + key
+
+            def write(buf, value):
+                buf += head
+                encode(buf, value)
+
+        return write
+
+    for ty, _ in SchemaMonitor.schemas.values():
+        _, encode, decode = make_from_spec(Named(ty))
+
+        def to_bson(obj, encode=encode) -> bytes:
+            buf = bytearray()
+            encode(buf, obj)
+            return bytes(buf)
+
+        def from_bson(data: bytes, decode=decode):
+            return decode(bytes(data), 0, BSON_DOCUMENT)[0]
+
+        setattr(ty, 'to_bson', to_bson)
+        setattr(ty, 'from_bson', staticmethod(from_bson))
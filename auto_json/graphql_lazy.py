@@ -0,0 +1,252 @@
+"""
+lazy decoding:
+
+    building = Building.from_dict_lazy(data)
+    building.name            # concrete fields are decoded eagerly
+    building.floors[0].name  # others are decoded on first access, then cached
+
+`from_dict_lazy` makes an instance of a subclass of the type, which holds the raw
+dict and whose `List`/`Dict`/`Named`/`Optional`/`Union` fields are non-data
+descriptors. The decoded value is stored in the instance `__dict__`, shadowing
+the descriptor, so that later accesses are plain attribute lookups.
+
+`to_dict`/`to_json` of a lazy object pass the raw data of untouched fields through.
+
+the `__class__` of a lazy object is the type it is made for, so that the codecs
+dispatching on `obj.__class__`(unions, `merge_from_dict`) take it for one of
+that type, `type(obj)` is the lazy subclass.
+"""
+from .schema_analyse import *
+from json import dumps
+
+new = object.__new__
+
+def identity(x):
+    return x
+
+
+class LazyField:
+    """
+    decodes `_raw[attr]` on first access, then caches it in the instance `__dict__`.
+    """
+    __slots__ = ['attr', 'decode']
+
+    def __init__(self, attr: str, decode: t.Callable):
+        self.attr = attr
+        self.decode = decode
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        attr = self.attr
+        value = instance.__dict__[attr] = self.decode(instance._raw[attr])
+        return value
+
+
+def generate():
+    decoders = {}
+    encoders = {}
+
+    def make_lazy_type(named_type: type, fields) -> type:
+        # types without `__slots__` already have a `__dict__`.
+        slots = ('_raw', ) if named_type.__dictoffset__ else ('_raw',
+                                                             '__dict__')
+        eager = [attr for attr, spec in fields if isinstance(spec, Concrete)]
+        deferred = [(attr, spec) for attr, spec in fields
+                    if not isinstance(spec, Concrete)]
+
+        def to_dict(obj):
+            raw = obj._raw
+            decoded = obj.__dict__
+            ret = {}
+            for attr in eager:
+                ret[attr] = getattr(obj, attr)
+            for attr, encode in field_encoders:
+                if attr in decoded:
+                    ret[attr] = encode(decoded[attr])
+                else:
+                    # never touched, so never changed.
+                    ret[attr] = raw[attr]
+            return ret
+
+        def to_json(obj) -> bytes:
+            return dumps(to_dict(obj), separators=(',', ':')).encode()
+
+        lazy_type = type(
+            named_type.__name__, (named_type, ), {
+                '__slots__': slots,
+                '__qualname__': named_type.__qualname__,
+                '__module__': named_type.__module__,
+                '__class__': property(lambda _: named_type),
+                'to_dict': to_dict,
+                'to_json': to_json,
+            })
+        field_encoders = []
+
+        # called after registering the decoder of `named_type`, for recursive types.
+        def make_fields():
+            for attr, spec in deferred:
+                setattr(lazy_type, attr, LazyField(attr, make_decoder(spec)))
+                field_encoders.append((attr, make_encoder(spec)))
+
+        return lazy_type, make_fields
+
+    def make_decoder(spec: Spec) -> t.Callable:
+        decoder = decoders.get(spec)
+        if decoder:
+            return decoder
+
+        if isinstance(spec, ForwardRef):
+            raise TypeError
+
+        elif isinstance(spec, Concrete):
+            typ = spec.typ
+            if typ is object:
+                decoder = identity
+            else:
+
+                def decoder(data):
+                    if isinstance(data, typ):
+                        return data
+                    raise TypeError(
+                        f'expected an instance of {typ!r}, got {data!r}.')
+
+        elif isinstance(spec, List):
+            elem_decoder = make_decoder(spec.elem)
+
+            def decoder(data):
+                return [elem_decoder(each) for each in data]
+
+        elif isinstance(spec, Dict):
+            key_decoder = make_decoder(spec.key)
+            value_decoder = make_decoder(spec.value)
+
+            def decoder(data):
+                return {
+                    key_decoder(k): value_decoder(v)
+                    for k, v in data.items()
+                }
+
+        elif isinstance(spec, Optional):
+            elem_decoder = make_decoder(spec.typ)
+
+            def decoder(data):
+                return elem_decoder(data) if data else None
+
+        elif isinstance(spec, Union):
+            layout = union_layout(spec)
+            by_type = {
+                cls: make_decoder(member)
+                for cls, member in layout.by_type
+            }
+            keyed = [(key, make_decoder(member))
+                     for key, member in layout.by_key]
+            tags = dict(keyed)
+            default = layout.default and make_decoder(layout.default)
+            discriminator = layout.discriminator
+
+            def decoder(data):
+                cls = data.__class__
+                decode = by_type.get(cls)
+                if decode is None and cls is dict:
+                    if discriminator is not None:
+                        decode = tags.get(data.get(discriminator), default)
+                    else:
+                        decode = next(
+                            (each for key, each in keyed if key in data),
+                            default)
+                if decode is None:
+                    raise TypeError(
+                        f'no member of {spec_repr(spec)} matches {data!r}.')
+                return decode(data)
+
+        elif isinstance(spec, Named):
+            named_type = spec.typ
+            _, fields = SchemaMonitor.schemas[named_type.__qualname__]
+            lazy_type, make_fields = make_lazy_type(named_type, fields)
+            eager = [(attr, make_decoder(field_spec))
+                     for attr, field_spec in fields
+                     if isinstance(field_spec, Concrete)]
+
+            def decoder(data):
+                obj = new(lazy_type)
+                obj._raw = data
+                for attr, decode in eager:
+                    setattr(obj, attr, decode(data[attr]))
+                return obj
+
+            decoders[spec] = decoder
+            make_fields()
+            return decoder
+
+        else:
+            raise TypeError(spec)
+
+        decoders[spec] = decoder
+        return decoder
+
+    def make_encoder(spec: Spec) -> t.Callable:
+        """
+        encoders of decoded fields, which may hold lazy objects.
+        """
+        encoder = encoders.get(spec)
+        if encoder:
+            return encoder
+
+        if isinstance(spec, Concrete):
+            encoder = identity
+
+        elif isinstance(spec, List):
+            elem_encoder = make_encoder(spec.elem)
+
+            def encoder(obj):
+                return [elem_encoder(each) for each in obj]
+
+        elif isinstance(spec, Dict):
+            key_encoder = make_encoder(spec.key)
+            value_encoder = make_encoder(spec.value)
+
+            def encoder(obj):
+                return {
+                    key_encoder(k): value_encoder(v)
+                    for k, v in obj.items()
+                }
+
+        elif isinstance(spec, Optional):
+            elem_encoder = make_encoder(spec.typ)
+
+            def encoder(obj):
+                return None if obj is None else elem_encoder(obj)
+
+        elif isinstance(spec, Union):
+            layout = union_layout(spec)
+            discriminator = layout.discriminator
+            by_class = {
+                cls: (make_encoder(member), tag)
+                for cls, member, tag in layout.by_class()
+            }
+
+            def encoder(obj):
+                encode, tag = by_class.get(obj.__class__, (None, None))
+                if encode is None:
+                    raise TypeError(
+                        f'no member of {spec_repr(spec)} matches {obj!r}.')
+                ret = encode(obj)
+                if tag is not None:
+                    ret[discriminator] = tag
+                return ret
+
+        elif isinstance(spec, Named):
+
+            # lazy objects and eagerly decoded/constructed ones alike.
+            def encoder(obj):
+                return obj.to_dict()
+
+        else:
+            raise TypeError(spec)
+
+        encoders[spec] = encoder
+        return encoder
+
+    for ty, _ in SchemaMonitor.schemas.values():
+        setattr(ty, 'from_dict_lazy', staticmethod(make_decoder(Named(ty))))
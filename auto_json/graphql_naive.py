@@ -14,7 +14,15 @@ def identity(x):
     return x
 
 
-def generate():
+new = object.__new__
+
+
+def generate(lazy=False, validate=True):
+    """
+    :param lazy: make the codecs of a type on first use.
+    :param validate: check the types of concrete values, skip it for trusted data.
+    """
+
     def make_from_spec(spec: Spec, recur=None,
                        trace='') -> t.Tuple[_RefFunc, _RefFunc]:
         def _make_from_dict_from_spec(spec_):
@@ -40,7 +48,7 @@ def generate():
 
             to_dict = identity
 
-            if typ is object:
+            if typ is object or not validate:
                 from_dict = identity
             else:
 
@@ -67,7 +75,68 @@ def generate():
                 to_dict = list
 
         elif isinstance(spec, Union):
-            raise NotImplementedError
+            layout = union_layout(spec)
+            discriminator = layout.discriminator
+            # exact class of the data/object -> codec of the member
+            decoders = {
+                cls: _make_from_dict_from_spec(member)[0]
+                for cls, member in layout.by_type
+            }
+            encoders = {}
+            for cls, member, tag in layout.by_class():
+                member_to_dict = _make_from_dict_from_spec(member)[1]
+                if tag is not None:
+
+                    def tagged_to_dict(obj, to_dict_=member_to_dict, tag_=tag):
+                        ret = to_dict_(obj)
+                        ret[discriminator] = tag_
+                        return ret
+
+                    member_to_dict = tagged_to_dict
+                encoders[cls] = member_to_dict
+
+            keyed = [(key, _make_from_dict_from_spec(member)[0])
+                     for key, member in layout.by_key]
+            default_from_dict = layout.default and _make_from_dict_from_spec(
+                layout.default)[0]
+
+            if discriminator is not None:
+                tags = dict(keyed)
+
+                def object_from_dict(data):
+                    member_from_dict = tags.get(
+                        data.get(discriminator), default_from_dict)
+                    if member_from_dict is None:
+                        raise TypeError(
+                            f'no member of {spec} is tagged {data.get(discriminator)!r}.'
+                        )
+                    return member_from_dict(data)
+            else:
+
+                def object_from_dict(data):
+                    for key, member_from_dict in keyed:
+                        if key in data:
+                            return member_from_dict(data)
+                    if default_from_dict is None:
+                        raise TypeError(f'no member of {spec} matches {data}.')
+                    return default_from_dict(data)
+
+            if keyed or default_from_dict:
+                decoders[dict] = object_from_dict
+
+            def from_dict(data):
+                decode = decoders.get(data.__class__)
+                if decode is None:
+                    raise TypeError(f'no member of {spec} matches {data!r}.')
+                return decode(data)
+
+            def union_to_dict(obj):
+                encode = encoders.get(obj.__class__)
+                if encode is None:
+                    raise TypeError(f'no member of {spec} matches {obj!r}.')
+                return encode(obj)
+
+            to_dict = union_to_dict
 
         elif isinstance(spec, Dict):
             (key_from_dict,
@@ -78,7 +147,7 @@ def generate():
 
             def from_dict(data):
                 return {
-                    key_from_dict(k): key_from_dict(v)
+                    key_from_dict(k): value_from_dict(v)
                     for k, v in data.items()
                 }
 
@@ -147,7 +216,7 @@ def generate():
             binds, adds = zip(*map(make_from_dict_for_attr, *zip(*fields)))
 
             def from_dict(data):
-                obj = named_type()
+                obj = new(named_type)
                 for bind in binds:
                     bind(obj, data)
                 return obj
@@ -166,7 +235,14 @@ def generate():
         ref_to_dict.__class__.__call__ = staticmethod(to_dict)
         return ref_from_dict, ref_to_dict
 
-    for ty, _ in SchemaMonitor.schemas.values():
+    def install(ty: type):
         ref_from_dict, ref_to_dict = make_from_spec(Named(ty))
         setattr(ty, 'from_dict', ref_from_dict.__class__.__call__)
         setattr(ty, 'to_dict', ref_to_dict.__class__.__call__)
+
+    for ty, _ in SchemaMonitor.schemas.values():
+        if lazy:
+            setattr(ty, 'from_dict', Trampoline('from_dict', install))
+            setattr(ty, 'to_dict', Trampoline('to_dict', install))
+        else:
+            install(ty)
@@ -0,0 +1,470 @@
+"""
+compiled graphql field selections:
+
+    building.collect('{ name floors { rooms { name } } }')
+    building.collect({'name': None, 'floors': {'rooms': {'name': None}}})
+
+    decode = Building.decoder('{ name floors { name } }')
+    building = decode(data)  # other fields are skipped and left unset
+    building.to_dict()       # only the selected fields
+
+a selection is validated against the schemas and compiled once per
+(type, selection) into an inlined extractor/decoder, in the same way as `graphql_ast`,
+which only visits the selected fields, so that the cost is proportional to
+the output instead of the whole object graph.
+"""
+from .schema_analyse import *
+from .graphql_ast import (CollectLocal, BlockLevel, ast_assign, ast_name,
+                          ast_attr, ast_call, ast_function, ast_is,
+                          ast_if_chain, ast_raise_type_err,
+                          generate_method_maker)
+from copy import deepcopy
+from functools import lru_cache
+from json import dumps
+import ast
+import re
+
+# field name -> sub selection, or `None` for leaves.
+Selection = t.Dict[str, t.Optional['Selection']]
+
+token = re.compile(r'\s*(?:([_A-Za-z][_0-9A-Za-z]*)|([{}])|(,)|(#[^\n]*)|(\S))')
+
+# the selections come from callers, the compiled extractors/decoders and the
+# parsed texts are kept for the most recently used ones.
+cache_size = 1024
+
+unset = object()
+
+# type -> the subclass of the objects decoded by `compile_decoder`.
+partial_types: t.Dict[type, type] = {}
+
+
+def invalidate(qualnames: t.Set[str]):
+    compile_collector.cache_clear()
+    compile_frozen_decoder.cache_clear()
+    partial_encoder.cache_clear()
+    for typ in [k for k in partial_types if k.__qualname__ in qualnames]:
+        del partial_types[typ]
+    install_queries(qualnames)
+
+
+SchemaMonitor.listeners.append(invalidate)
+
+
+def parse_selection(text: str) -> Selection:
+    """
+    parse a graphql selection set like `{ name floors { name } }`,
+    the outermost braces are optional.
+    """
+    tokens = []
+    for name, brace, _, _, bad in token.findall(text):
+        if bad:
+            raise ValueError(f'unexpected {bad!r} in selection {text!r}.')
+        if name or brace:
+            tokens.append(name or brace)
+    tokens.reverse()
+
+    def parse_fields(closing: bool) -> Selection:
+        ret = {}
+        while tokens:
+            tk = tokens.pop()
+            if tk == '}':
+                if not closing:
+                    raise ValueError(f'unbalanced braces in selection {text!r}.')
+                return ret
+            if tk == '{':
+                raise ValueError(
+                    f'expected a field name in selection {text!r}.')
+            if tokens and tokens[-1] == '{':
+                tokens.pop()
+                ret[tk] = parse_fields(True)
+            else:
+                ret[tk] = None
+        if closing:
+            raise ValueError(f'unbalanced braces in selection {text!r}.')
+        return ret
+
+    if tokens and tokens[-1] == '{':
+        tokens.pop()
+        ret = parse_fields(True)
+        if tokens:
+            raise ValueError(
+                f'unexpected {tokens[-1]!r} in selection {text!r}.')
+        return ret
+    return parse_fields(False)
+
+
+def freeze_selection(selection: dict) -> t.Hashable:
+    """
+    nested dicts are sub selections, other values(`None`, `True`, ...) leaves.
+    """
+    return tuple((attr, freeze_selection(sub) if isinstance(sub, dict) else None)
+                 for attr, sub in selection.items())
+
+
+def thaw_selection(frozen: t.Hashable) -> Selection:
+    return {
+        attr: None if sub is None else thaw_selection(sub)
+        for attr, sub in frozen
+    }
+
+
+@lru_cache(maxsize=cache_size)
+def parse_frozen(text: str) -> t.Hashable:
+    return freeze_selection(parse_selection(text))
+
+
+def selection_key(selection: t.Union[str, dict]) -> t.Hashable:
+    """
+    the same selection written differently, as text with other spaces, commas
+    or comments, or as a dict, shares the key.
+    """
+    if isinstance(selection, str):
+        return parse_frozen(selection)
+    return freeze_selection(selection)
+
+
+def as_selection(typ: type, frozen: t.Hashable) -> Selection:
+    if not frozen:
+        raise TypeError(f'empty selection for {typ.__qualname__}.')
+    return thaw_selection(frozen)
+
+
+def make_collect_from_spec(spec: Spec,
+                           selection: t.Optional[Selection],
+                           block: BlockLevel = BlockLevel(),
+                           trace: str = '') -> t.List[ast.AST]:
+    """
+    statements assigning the selected parts of `block` to `block.var('ret')`.
+    """
+    if isinstance(spec, ForwardRef):
+        raise TypeError(f'unresolved forward ref {spec.name!r}.')
+
+    if selection is not None and not any(named_types(spec)):
+        raise TypeError(f'{trace} of {spec_repr(spec)} has no fields to select.')
+
+    if selection is None and any(named_types(spec)):
+        raise TypeError(
+            f'{trace} of {spec_repr(spec)} needs a selection of fields.')
+
+    if isinstance(spec, Concrete):
+        return [ast_assign(block.var('ret'), block)]
+
+    if isinstance(spec, List):
+        lst_var = block.var('ret')
+        if isinstance(spec.elem, Concrete):
+            return [
+                ast_assign(lst_var,
+                           ast_call(ast_name('_list'), [ast_name(block)]))
+            ]
+        append_var = block.var('append')
+        iter_block = block.let()
+        return [
+            ast_assign(lst_var, ast.List([], ast.Load())),
+            ast_assign(append_var, ast_attr(ast_name(lst_var), 'append')),
+            ast.For(
+                target=ast_name(iter_block, is_lhs=True),
+                iter=ast_name(block),
+                body=[
+                    *make_collect_from_spec(spec.elem, selection, iter_block,
+                                            trace),
+                    ast.Expr(
+                        ast_call(
+                            ast_name(append_var),
+                            [ast_name(iter_block.var('ret'))]))
+                ],
+                orelse=[])
+        ]
+
+    if isinstance(spec, Dict):
+        dict_var = block.var('ret')
+        if isinstance(spec.value, Concrete):
+            return [
+                ast_assign(dict_var,
+                           ast_call(ast_name('_dict'), [ast_name(block)]))
+            ]
+        dict_add_var = dict_var.var('append')
+        key_block = block.let().var('key')
+        value_block = block.let().var('value')
+        return [
+            ast_assign(dict_var, ast.Dict([], [])),
+            ast_assign(dict_add_var,
+                       ast_attr(ast_name(dict_var), '__setitem__')),
+            ast.For(
+                target=ast.Tuple([
+                    ast_name(key_block, is_lhs=True),
+                    ast_name(value_block, is_lhs=True)
+                ], ast.Store()),
+                iter=ast_call(ast_attr(ast_name(block), 'items'), []),
+                body=[
+                    *make_collect_from_spec(spec.value, selection,
+                                            value_block, trace),
+                    ast.Expr(
+                        ast_call(
+                            ast_name(dict_add_var), [
+                                ast_name(key_block),
+                                ast_name(value_block.var('ret'))
+                            ]))
+                ],
+                orelse=[])
+        ]
+
+    if isinstance(spec, Optional):
+        return [
+            ast.If(
+                test=ast.Compare(
+                    ast_name(block), [ast.IsNot()], [ast.NameConstant(None)]),
+                body=make_collect_from_spec(spec.typ, selection, block,
+                                            trace),
+                orelse=[ast_assign(block.var('ret'), ast.NameConstant(None))])
+        ]
+
+    if isinstance(spec, Union):
+        if selection is None:
+            # json values of mixed types, copied as a whole.
+            return [
+                ast_assign(block.var('ret'),
+                           ast_call(ast_name('_deepcopy'), [ast_name(block)]))
+            ]
+        layout = union_layout(spec)
+        branches = []
+        selected = set()
+        for cls, member, _ in layout.by_class():
+            if isinstance(member, Named):
+                # fields selected on a union apply to the members declaring them.
+                _, fields = SchemaMonitor.schemas[member.typ.__qualname__]
+                declared = {attr for attr, _ in fields}
+                member_selection = {
+                    attr: sub
+                    for attr, sub in selection.items() if attr in declared
+                }
+                selected.update(member_selection)
+            elif any(named_types(member)):
+                member_selection = selection
+                selected.update(selection)
+            else:
+                member_selection = None
+            branches.append((ast_is(block.var('cls'), '_' + cls.__name__),
+                             make_collect_from_spec(member, member_selection,
+                                                    block, trace)))
+        unknown = [attr for attr in selection if attr not in selected]
+        if unknown:
+            raise TypeError(
+                f'no member of {trace} of {spec_repr(spec)} has field {unknown[0]!r}.'
+            )
+        return [
+            ast_assign(block.var('cls'), ast_attr(ast_name(block),
+                                                  '__class__')),
+            *ast_if_chain(branches, [
+                ast_raise_type_err(
+                    f'no member of {spec_repr(spec)} matches {{!r}}.', block)
+            ])
+        ]
+
+    if isinstance(spec, Named):
+        named_type = spec.typ
+        _, fields = SchemaMonitor.schemas[named_type.__qualname__]
+        fields = dict(fields)
+        field_block = block.let()
+        keys = []
+        values = []
+        suites = []
+        for attr, sub in selection.items():
+            field_spec = fields.get(attr)
+            if field_spec is None:
+                raise TypeError(
+                    f'{named_type.__qualname__} has no field {attr!r}.')
+            keys.append(ast.Str(attr))
+            getter = ast_attr(ast_name(block), attr)
+            if isinstance(field_spec, Concrete) and sub is None:
+                values.append(getter)
+                continue
+            field_var = block.var('ret_' + attr)
+            suites.extend([
+                ast_assign(field_block, getter),
+                *make_collect_from_spec(field_spec, sub, field_block,
+                                        f'{named_type.__qualname__}.{attr}'),
+                ast_assign(field_var, field_block.var('ret'))
+            ])
+            values.append(ast_name(field_var))
+        return [*suites, ast_assign(block.var('ret'), ast.Dict(keys, values))]
+
+    raise TypeError(spec)
+
+
+def compile_selection(typ: type, selection: t.Union[str, dict]) -> t.Callable:
+    """
+    :return: the extractor of `selection` for instances of `typ`, cached.
+    """
+    return compile_collector(typ, selection_key(selection))
+
+
+@lru_cache(maxsize=cache_size)
+def compile_collector(typ: type, frozen: t.Hashable) -> t.Callable:
+    selection = as_selection(typ, frozen)
+
+    b = BlockLevel()
+    fn = ast_function(
+        'collect_' + typ.__name__, [b.to_name()], [
+            *make_collect_from_spec(Named(typ), selection, b),
+            ast.Return(ast_name(b.var('ret')))
+        ])
+    # bind the names used as closure variables, see `graphql_ast`.
+    collected = CollectLocal()
+    collected.visit(fn)
+    types = {
+        each.__name__: each
+        for each in SchemaMonitor.reachable(typ)
+    }
+    closure = ast_function('make', [], [
+        *[
+            ast.Assign([ast_name(name, is_lhs=True)], ast_name(name[1:]))
+            for name in sorted(collected.names)
+        ], fn,
+        ast.Return(ast_name(fn.name))
+    ])
+    mod = ast.Module([closure])
+    ast.fix_missing_locations(mod)
+    ctx = {**types, 'deepcopy': deepcopy, 'NoneType': NoneType}
+    exec(compile(mod, '<generated collector>', 'exec'), ctx)
+    return ctx['make']()
+
+
+def collect(obj, selection: t.Union[str, dict]) -> dict:
+    return compile_selection(obj.__class__, selection)(obj)
+
+
+def make_query(typ: type) -> t.Callable[[t.Any, t.Union[str, dict]], dict]:
+    def query(obj, selection: t.Union[str, dict]) -> dict:
+        return compile_selection(typ, selection)(obj)
+
+    return query
+
+
+def install_queries(qualnames: t.Iterable[str]):
+    """
+    fill the 'query' slots of `SchemaMonitor.methods`, and drop the removed
+    types, which the listeners are not told of.
+    """
+    methods = SchemaMonitor.methods
+    if len(methods) > len(SchemaMonitor.schemas):
+        for qualname in [k for k in methods if k not in SchemaMonitor.schemas]:
+            del methods[qualname]
+    for qualname in qualnames:
+        ty, _ = SchemaMonitor.schemas[qualname]
+        methods.setdefault(qualname, {})['query'] = make_query(ty)
+
+
+def compile_decoder(typ: type, selection: t.Union[str, dict]) -> t.Callable:
+    """
+    :return: a `from_dict` for `typ` decoding only the selected fields, cached.
+    """
+    return compile_frozen_decoder(typ, selection_key(selection))
+
+
+@lru_cache(maxsize=cache_size)
+def compile_frozen_decoder(typ: type, frozen: t.Hashable) -> t.Callable:
+    name = 'decode_' + typ.__name__
+    types, mod = generate_method_maker(
+        SchemaMonitor.reachable(typ), {name: (typ, as_selection(typ, frozen))})
+    ctx = {each.__name__: each for each in types}
+    exec(compile(mod, '<generated decoder>', 'exec'), ctx)
+    return ctx['make'](*map(partial_type, types))[name]
+
+
+def partial_type(typ: type) -> type:
+    """
+    the objects decoded by `compile_decoder` are made of a subclass of their
+    type, whose `to_dict`/`to_json` skip the unset fields.
+    as lazy objects, their `__class__` is `typ`, see `graphql_lazy`.
+    """
+    ret = partial_types.get(typ)
+    if ret is not None:
+        return ret
+
+    def to_json(obj) -> bytes:
+        return dumps(to_dict_partial(obj), ensure_ascii=False,
+                     separators=(',', ':')).encode()
+
+    ret = partial_types[typ] = type(
+        typ.__name__, (typ, ), {
+            '__slots__': (),
+            '__qualname__': typ.__qualname__,
+            '__module__': typ.__module__,
+            '__class__': property(lambda _: typ),
+            'to_dict': to_dict_partial,
+            'to_json': to_json,
+        })
+    return ret
+
+
+@lru_cache(maxsize=cache_size)
+def partial_encoder(spec: Spec) -> t.Callable:
+    """
+    :return: `to_dict` of spec skipping unset fields, see `to_dict_partial`.
+    """
+    if isinstance(spec, ForwardRef):
+        raise TypeError(f'unresolved forward ref {spec.name!r}.')
+
+    if isinstance(spec, Concrete):
+        return lambda obj: obj
+
+    if isinstance(spec, List):
+        elem = partial_encoder(spec.elem)
+        return lambda obj: [elem(each) for each in obj]
+
+    if isinstance(spec, Dict):
+        key, value = partial_encoder(spec.key), partial_encoder(spec.value)
+        return lambda obj: {key(k): value(v) for k, v in obj.items()}
+
+    if isinstance(spec, Optional):
+        elem = partial_encoder(spec.typ)
+        return lambda obj: None if obj is None else elem(obj)
+
+    if isinstance(spec, Union):
+        layout = union_layout(spec)
+        by_class = {
+            cls: (member, tag)
+            for cls, member, tag in layout.by_class()
+        }
+
+        def encode_union(obj):
+            member, tag = by_class.get(obj.__class__, (None, None))
+            if member is None:
+                raise TypeError(f'no member of {spec_repr(spec)} matches {obj!r}.')
+            ret = partial_encoder(member)(obj)
+            if tag is not None:
+                ret[layout.discriminator] = tag
+            return ret
+
+        return encode_union
+
+    if isinstance(spec, Named):
+        typ = spec.typ
+        _, fields = SchemaMonitor.schemas[typ.__qualname__]
+
+        def encode_named(obj):
+            if not isinstance(obj, typ):
+                raise TypeError(
+                    f'expected an instance of {typ.__qualname__}, got {obj!r}.')
+            ret = {}
+            for attr, field_spec in fields:
+                value = getattr(obj, attr, unset)
+                if value is not unset:
+                    ret[attr] = partial_encoder(field_spec)(value)
+            return ret
+
+        return encode_named
+
+    raise TypeError(spec)
+
+
+def to_dict_partial(obj) -> dict:
+    """
+    `to_dict` of the objects decoded by `compile_decoder`, without their unset
+    fields.
+    """
+    return partial_encoder(Named(obj.__class__))(obj)
+
+
+install_queries(list(SchemaMonitor.schemas))
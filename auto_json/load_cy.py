@@ -1,38 +1,198 @@
 import tempfile
+import hashlib
 import os
+import shutil
 import subprocess
+import sys
+import sysconfig
+import time
+from contextlib import contextmanager
 from importlib import util
 from string import Template
 
 template = Template(r"""
-from distutils.core import setup
+from distutils.core import setup, Extension
 from Cython.Build import cythonize
 
-setup(ext_modules=cythonize([$module]))
+setup(ext_modules=cythonize([Extension($name, [$module])]))
 """)
 
+# compiled modules are cached at `<cache_dir>/<fingerprint>/<module><EXT_SUFFIX>`,
+# the fingerprint is a hash of the source, the python ABI tag and the cython version.
+cache_dir = os.environ.get('AUTO_JSON_CACHE_DIR') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'auto_json')
 
-def compile_module(source_code: str, mod_name: str):
-    # TODO:
-    # tempfile.TemporaryDirectory will close unexpectedly before removing the generated module.
-    # Since that we don't delete the temporary dir as a workaround.
-    mod_name = 'cythonextension_' + mod_name
-
-    dirname = tempfile.mkdtemp()
-    mod_path = mod_name + '.pyx'
-    with open(os.path.join(dirname, mod_path), 'w') as pyx_file, open(
-            os.path.join(dirname, 'setup.py'), 'w') as setup_file:
-        pyx_file.write(source_code)
-        setup_file.write(template.substitute(module=repr(mod_path)))
-
-    cwd = os.getcwd()
-    os.chdir(dirname)
-    subprocess.check_call(['python', 'setup.py', 'build_ext', '--inplace'])
-    os.chdir(cwd)
-    pyd_name = next(
-        each for each in os.listdir(dirname) if each.endswith('.pyd'))
-    spec = util.spec_from_file_location(mod_name,
-                                        os.path.join(dirname, pyd_name))
+# the least recently used entries get evicted once the cache exceeds this size.
+max_cache_size = int(
+    os.environ.get('AUTO_JSON_CACHE_SIZE') or 256 * 1024 * 1024)
+
+# seconds after which an unfinished build directory is considered abandoned.
+stale_build_timeout = 3600
+
+ext_suffix = sysconfig.get_config_var('EXT_SUFFIX') or (
+    '.pyd' if sys.platform == 'win32' else '.so')
+
+# `file_lock(path, blocking)` yields whether the lock is held, which is always
+# the case when blocking.
+# the lock files are never removed: a process waiting on a removed one would
+# hold a lock nobody else sees.
+if sys.platform == 'win32':
+    import msvcrt
+
+    @contextmanager
+    def file_lock(path: str, blocking=True):
+        with open(path, 'a+b') as f:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK
+                                   if blocking else msvcrt.LK_NBLCK, 1)
+                    locked = True
+                    break
+                except OSError:
+                    if not blocking:
+                        locked = False
+                        break
+                    # LK_LOCK gives up after 10 seconds.
+                    continue
+            try:
+                yield locked
+            finally:
+                if locked:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    @contextmanager
+    def file_lock(path: str, blocking=True):
+        with open(path, 'a+b') as f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX
+                            if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                locked = True
+            except BlockingIOError:
+                locked = False
+            try:
+                yield locked
+            finally:
+                if locked:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def fingerprint(source_code: str, mod_name: str) -> str:
+    import Cython
+    abi_tag = f'{sys.implementation.cache_tag}{ext_suffix}'
+    h = hashlib.sha256()
+    for each in (source_code, mod_name, abi_tag, Cython.__version__):
+        h.update(each.encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+
+def load_extension(mod_name: str, path: str):
+    spec = util.spec_from_file_location(mod_name, path)
     mod = util.module_from_spec(spec)
     spec.loader.exec_module(mod)
     return mod
+
+
+def build_extension(pyx_path: str) -> str:
+    """
+    cythonize and build `pyx_path` in place.
+    :return: path of the built extension module.
+    """
+    dirname, pyx_name = os.path.split(os.path.abspath(pyx_path))
+    mod_name = os.path.splitext(pyx_name)[0]
+    setup_path = os.path.join(dirname, f'setup_{mod_name}.py')
+    build_temp = tempfile.mkdtemp()
+    with open(setup_path, 'w') as setup_file:
+        setup_file.write(
+            template.substitute(name=repr(mod_name), module=repr(pyx_name)))
+    try:
+        subprocess.check_call(
+            [
+                sys.executable, setup_path, 'build_ext', '--inplace',
+                '--build-temp', build_temp
+            ],
+            cwd=dirname)
+    finally:
+        os.remove(setup_path)
+        shutil.rmtree(build_temp, ignore_errors=True)
+    return os.path.join(dirname, mod_name + ext_suffix)
+
+
+def dir_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for each in files:
+            try:
+                size += os.path.getsize(os.path.join(root, each))
+            except OSError:
+                pass
+    return size
+
+
+def evict(root: str, keep: str):
+    now = time.time()
+    entries = []
+    for each in os.listdir(root):
+        path = os.path.join(root, each)
+        if not os.path.isdir(path):
+            continue
+        if each.startswith('.build-'):
+            if now - os.path.getmtime(path) > stale_build_timeout:
+                shutil.rmtree(path, ignore_errors=True)
+            continue
+        entries.append((os.path.getmtime(path), each, dir_size(path)))
+
+    total = sum(size for _, _, size in entries)
+    for _, each, size in sorted(entries):
+        if total <= max_cache_size:
+            break
+        if each == keep:
+            continue
+        # entries being built or loaded are skipped.
+        with file_lock(os.path.join(root, each + '.lock'), False) as locked:
+            if not locked:
+                continue
+            shutil.rmtree(os.path.join(root, each), ignore_errors=True)
+        total -= size
+
+
+def compile_module(source_code: str, mod_name: str, cache_root: str = None):
+    cache_root = cache_root or cache_dir
+    key = fingerprint(source_code, mod_name)
+    mod_name = f'cythonextension_{mod_name}_{key[:16]}'
+    entry = os.path.join(cache_root, key)
+    mod_path = os.path.join(entry, mod_name + ext_suffix)
+
+    if os.path.exists(mod_path):
+        try:
+            # refresh the entry for LRU eviction.
+            os.utime(entry)
+            return load_extension(mod_name, mod_path)
+        except (ImportError, OSError):
+            # evicted by another process since, built again below.
+            pass
+
+    os.makedirs(cache_root, exist_ok=True)
+    # concurrent workers compiling the same source wait for the first one,
+    # and the entry is not evicted until it is loaded.
+    with file_lock(os.path.join(cache_root, key + '.lock')):
+        if not os.path.exists(mod_path):
+            build_dir = tempfile.mkdtemp(prefix='.build-', dir=cache_root)
+            try:
+                pyx_path = os.path.join(build_dir, mod_name + '.pyx')
+                with open(pyx_path, 'w') as pyx_file:
+                    pyx_file.write(source_code)
+                built = build_extension(pyx_path)
+                os.makedirs(entry, exist_ok=True)
+                os.replace(built, mod_path)
+            finally:
+                shutil.rmtree(build_dir, ignore_errors=True)
+
+        with file_lock(os.path.join(cache_root, '.evict.lock')):
+            evict(cache_root, keep=key)
+
+        return load_extension(mod_name, mod_path)
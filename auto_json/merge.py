@@ -0,0 +1,178 @@
+"""
+updating objects in place from partial data:
+
+    Building.merge_from_dict(building, {'floors': [{'name': 'f1'}]})
+
+only the fields present in the data are decoded, and validated as `from_dict`
+does. the objects already there are updated instead of decoded again, when of
+the same class, and dicts are updated by key. lists are replaced, unless a
+strategy is set for the field, before generating the codecs:
+
+    # merge the elements at the same positions, the extra ones are dropped.
+    SchemaMonitor.merge_lists['Building.floors'] = 'index'
+    # merge the elements with the same `name`, in the order of the data.
+    SchemaMonitor.merge_lists['Floor.rooms'] = 'key:name'
+
+merges are not atomic, the fields before an invalid one are already updated.
+generated by `graphql_ast.generate(merge=True)`, this module is the fallback of
+the other backends and of the codecs generated without merges.
+"""
+from .schema_analyse import *
+
+replace = ('replace', None)
+
+# (spec, list strategy) -> merger(current value, data) -> new value
+mergers: t.Dict[t.Tuple[Spec, tuple], t.Callable[[t.Any, t.Any], t.Any]] = {}
+
+SchemaMonitor.listeners.append(lambda _: mergers.clear())
+
+
+def list_strategy(typ: type, attr: str) -> t.Tuple[str, t.Optional[str]]:
+    """
+    :return: ('replace' | 'index' | 'key', the key field or None),
+    see `SchemaMonitor.merge_lists`.
+    """
+    name = f'{typ.__qualname__}.{attr}'
+    strategy = SchemaMonitor.merge_lists.get(name, 'replace')
+    if strategy in ('replace', 'index'):
+        return strategy, None
+    if strategy.startswith('key:'):
+        return 'key', strategy[len('key:'):]
+    raise ValueError(f'unknown list merge strategy {strategy!r} of {name}.')
+
+
+def check_key(spec: List, key: str):
+    """
+    lists merged by key hold objects declaring the key field.
+    """
+    elem = spec.elem
+    if not isinstance(elem, Named) or key not in dict(
+            SchemaMonitor.schemas[elem.typ.__qualname__][1]):
+        raise TypeError(
+            f'{spec_repr(spec)} cannot be merged by the key {key!r}.')
+
+
+def merger(spec: Spec, strategy: tuple = replace
+           ) -> t.Callable[[t.Any, t.Any], t.Any]:
+    fn = mergers.get((spec, strategy))
+    if fn is None:
+        fn = mergers[spec, strategy] = make_merger(spec, strategy)
+    return fn
+
+
+def make_merger(spec: Spec, strategy: tuple
+                ) -> t.Callable[[t.Any, t.Any], t.Any]:
+    from .graph import decoder
+
+    if isinstance(spec, ForwardRef):
+        raise TypeError(f'forward ref: {spec}.')
+
+    decode = decoder(spec)
+
+    if isinstance(spec, Concrete):
+        return lambda _, data: decode(data, {})
+
+    if isinstance(spec, Optional):
+        # the strategy of a field applies to its optional list.
+        elem = merger(spec.typ, strategy)
+        return lambda cur, data: elem(cur, data) if data else None
+
+    if isinstance(spec, List):
+        kind, key = strategy
+        if kind == 'replace':
+            return lambda _, data: decode(data, {})
+        elem = merger(spec.elem)
+
+        if kind == 'index':
+
+            def merge_index(cur, data):
+                if cur.__class__ is not list:
+                    return decode(data, {})
+                n = len(cur)
+                for i, each in enumerate(data):
+                    if i < n:
+                        cur[i] = elem(cur[i], each)
+                    else:
+                        cur.append(elem(None, each))
+                del cur[len(data):]
+                return cur
+
+            return merge_index
+
+        check_key(spec, key)
+
+        def merge_key(cur, data):
+            if cur.__class__ is not list:
+                return decode(data, {})
+            index = {getattr(each, key): each for each in cur}
+            cur[:] = [elem(index.get(each[key]), each) for each in data]
+            return cur
+
+        return merge_key
+
+    if isinstance(spec, Dict):
+        key_decode, value = decoder(spec.key), merger(spec.value)
+
+        def merge_dict(cur, data):
+            if cur.__class__ is not dict:
+                return decode(data, {})
+            for k, v in data.items():
+                k = key_decode(k, {})
+                cur[k] = value(cur.get(k), v)
+            return cur
+
+        return merge_dict
+
+    if isinstance(spec, Union):
+        layout = union_layout(spec)
+        by_type = dict(layout.by_type)
+        tags = dict(layout.by_key)
+
+        def merge_union(cur, data):
+            member = by_type.get(data.__class__)
+            if member is None and isinstance(data, dict):
+                if layout.discriminator is not None:
+                    member = tags.get(
+                        data.get(layout.discriminator), layout.default)
+                else:
+                    member = next(
+                        (each for key, each in layout.by_key if key in data),
+                        layout.default)
+            if member is None:
+                raise TypeError(
+                    f'no member of {spec_repr(spec)} matches {data!r}.')
+            return merger(member)(cur, data)
+
+        return merge_union
+
+    if isinstance(spec, Named):
+        typ = spec.typ
+        _, fields = SchemaMonitor.schemas[typ.__qualname__]
+        # resolved on first call, for recursive types.
+        field_mergers = []
+
+        def merge_named(cur, data):
+            if not isinstance(cur, typ):
+                return decode(data, {})
+            if not isinstance(data, dict):
+                raise TypeError(
+                    f'expected a dict of {typ.__qualname__}, got {data!r}.')
+            if not field_mergers:
+                field_mergers.extend(
+                    (attr, merger(field_spec, list_strategy(typ, attr)))
+                    for attr, field_spec in fields)
+            for attr, merge in field_mergers:
+                if attr in data:
+                    setattr(cur, attr, merge(getattr(cur, attr, None), data[attr]))
+            return cur
+
+        return merge_named
+
+    raise TypeError(spec)
+
+
+def merge_from_dict(typ: type, obj, data: dict):
+    if not isinstance(obj, typ):
+        raise TypeError(
+            f'expected an instance of {typ.__qualname__}, got {obj!r}.')
+    return merger(Named(typ))(obj, data)
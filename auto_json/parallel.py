@@ -0,0 +1,160 @@
+"""
+bulk codecs running in a process pool:
+
+    areas = Building.from_dict_many(records, workers=4, fn=total_area)
+    records = Building.to_dict_many(buildings)  # in-process
+
+records are sent to the workers in chunks of `chunksize` to amortise the IPC,
+and inputs shorter than `threshold` are handled in-process.
+
+the decoded objects are not sent back, which costs more than decoding them:
+workers return what `fn`(a module level function) makes of them, and without
+`fn` the records are decoded in-process, where `workers` is rejected.
+for the same reason `to_dict_many` encodes in-process: the objects would be
+sent to the workers and the dicts back.
+
+workers install the codecs once, in the initializer of the pool(on their first
+task before python 3.7): forked workers inherit the generated ones, others
+import the modules registering the schemas and call
+`load_precompiled(precompiled)`(see `auto_json.compile`), or `generate(use_cython)`
+which reuses the cached cython extension, see `configure`.
+"""
+from .schema_analyse import SchemaMonitor
+from concurrent.futures import ProcessPoolExecutor
+import importlib
+import itertools
+import os
+import sys
+import typing as t
+
+default_chunksize = 1000
+default_threshold = 5000
+
+# how workers install the codecs, see `configure`.
+settings = {
+    'modules': None,
+    'precompiled': None,
+    'use_cython': False,
+}
+
+# (workers, settings) -> pool, reused across calls.
+pools: t.Dict[tuple, ProcessPoolExecutor] = {}
+
+# whether the codecs are installed in this worker.
+initialized = False
+
+# `ProcessPoolExecutor(initializer=...)` requires python 3.7, before which the
+# tasks carry the arguments of `init_worker`.
+init_in_tasks = sys.version_info < (3, 7)
+
+
+def configure(modules: t.List[str] = None,
+              precompiled: str = None,
+              use_cython: bool = False):
+    """
+    :param modules: modules registering the schemas, default to the modules
+    of the registered types.
+    :param precompiled: module written by `auto_json.compile`.
+    """
+    settings.update(
+        modules=modules, precompiled=precompiled, use_cython=use_cython)
+    shutdown()
+
+
+def shutdown():
+    for pool in pools.values():
+        pool.shutdown()
+    pools.clear()
+
+
+def init_worker(modules: t.Tuple[str, ...], precompiled: t.Optional[str],
+                use_cython: bool):
+    global initialized
+    if initialized:
+        return
+    initialized = True
+    for each in modules:
+        importlib.import_module(each)
+    if all('from_dict' in ty.__dict__
+           for ty, _ in SchemaMonitor.schemas.values()):
+        # forked from a process which has generated the codecs.
+        return
+    from .graphql_ast import generate, load_precompiled
+    SchemaMonitor.resolve(strict=True)
+    if precompiled:
+        load_precompiled(precompiled, use_cython)
+    else:
+        generate(use_cython)
+
+
+def worker_args() -> tuple:
+    modules = settings['modules'] or sorted(
+        {ty.__module__
+         for ty, _ in SchemaMonitor.schemas.values()})
+    return tuple(modules), settings['precompiled'], settings['use_cython']
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    args = worker_args()
+    key = workers, args
+    pool = pools.get(key)
+    if pool is None:
+        pool = pools[key] = ProcessPoolExecutor(
+            workers) if init_in_tasks else ProcessPoolExecutor(
+                workers, initializer=init_worker, initargs=args)
+    return pool
+
+
+def decode_chunk(args: t.Optional[tuple], qualname: str, fn: t.Callable,
+                 chunk: list) -> list:
+    if args is not None:
+        init_worker(*args)
+    from_dict = SchemaMonitor.schemas[qualname][0].from_dict
+    return [fn(from_dict(each)) for each in chunk]
+
+
+def chunked(items: list, chunksize: int) -> t.Iterator[list]:
+    for i in range(0, len(items), chunksize):
+        yield items[i:i + chunksize]
+
+
+def run_many(typ: type, task: t.Callable, fn: t.Optional[t.Callable],
+             items: t.Iterable, workers: t.Optional[int], chunksize: int,
+             threshold: int, in_process: t.Callable) -> list:
+    items = items if isinstance(items, list) else list(items)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(items) < threshold:
+        return list(map(in_process, items))
+    pool = get_pool(workers)
+    return list(
+        itertools.chain.from_iterable(
+            pool.map(task,
+                     itertools.repeat(
+                         worker_args() if init_in_tasks else None),
+                     itertools.repeat(typ.__qualname__), itertools.repeat(fn),
+                     chunked(items, chunksize))))
+
+
+def from_dict_many(typ: type,
+                   items: t.Iterable[dict],
+                   workers: int = None,
+                   chunksize: int = default_chunksize,
+                   threshold: int = default_threshold,
+                   fn: t.Callable = None) -> list:
+    """
+    :param fn: applied to each decoded object in the workers, whose results are
+    returned instead of the objects. without it, the records are decoded
+    in-process and `workers` must not be given.
+    """
+    if fn is None:
+        if workers is not None:
+            raise ValueError(
+                'from_dict_many decodes in the workers only with `fn`, the '
+                'decoded objects are not sent back.')
+        return list(map(typ.from_dict, items))
+    return run_many(typ, decode_chunk, fn, items, workers, chunksize,
+                    threshold, lambda each: fn(typ.from_dict(each)))
+
+
+def to_dict_many(typ: type, items: t.Iterable) -> t.List[dict]:
+    return list(map(typ.to_dict, items))
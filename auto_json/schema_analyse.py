@@ -1,4 +1,5 @@
 import typing as t
+import hashlib
 import warnings
 
 NoneType = None.__class__
@@ -7,36 +8,215 @@ T = t.TypeVar('T')
 
 
 class AutoJsonMeta(type):
-    def __new__(mcs, name, bases, ns: dict):
+    # default of the `slots` class keyword:
+    #   class Room(AutoJson, slots=True): ...
+    # slotted classes store fields in `__slots__` derived from `__annotations__`
+    # instead of a per-instance `__dict__`.
+    slots = False
+    # default of the `tracked` class keyword, tracked instances notice the
+    # assignments of their fields, see `tracking`.
+    tracked = False
+
+    def __new__(mcs,
+                name,
+                bases,
+                ns: dict,
+                slots: bool = None,
+                tracked: bool = None):
         if ns.get('_root', False):
             return super().__new__(mcs, name, bases, ns)
         bases = tuple(filter(lambda it: AutoJson is not it, bases))
 
+        annotations = ns.get('__annotations__', {})
+        tracked = mcs.tracked if tracked is None else tracked
+        if (mcs.slots if slots is None else slots) and '__slots__' not in ns:
+            extra = ()
+            if tracked:
+                # tracked objects are weakly referred by their holders.
+                extra = ('_tracking', ) if any(
+                    each.__weakrefoffset__
+                    for each in bases) else ('_tracking', '__weakref__')
+            ns = {**ns, '__slots__': tuple(annotations) + extra}
+
         ret = type(name, (*bases, Json), ns)
         SchemaMonitor.register(ret)
 
-        annotations = ns.get('__annotations__', [])
-
-        def __init__(self, **kwargs):
-            if not kwargs:
-                return
-            for each in annotations:
-
-                setattr(self, each, kwargs[each])
-
         template_format = f'{ret.__name__}({{}})'.format
 
         def __repr__(self):
+            # the fields left unset by `Type.decoder(selection)` are skipped.
             return template_format(', '.join(
-                f'{each}={getattr(self, each)!r}' for each in annotations))
+                f'{each}={getattr(self, each)!r}' for each in annotations
+                if hasattr(self, each)))
 
-        ret.__init__ = __init__
+        ret.__init__ = make_init(annotations)
         ret.__repr__ = __repr__
+        if tracked:
+            from .tracking import track
+            track(ret, annotations)
         return ret
 
 
+def make_init(annotations: t.Iterable[str]):
+    """
+    __init__(self, **kwargs) assigning all the fields from kwargs.
+    """
+    assigns = ''.join(f'\n    self.{each} = kwargs[{each!r}]'
+                      for each in annotations)
+    ctx = {}
+    exec(f'def __init__(self, **kwargs):\n    if not kwargs:\n        return'
+         f'{assigns}', ctx)
+    return ctx['__init__']
+
+
 class Json:
-    pass
+    __slots__ = ()
+
+    @classmethod
+    def from_dict_trusted(cls, data: dict) -> 'Json':
+        """
+        `from_dict` of data validated upstream, which skips the type checks
+        when generated with `graphql_ast.generate(trusted=True)`.
+        """
+        return cls.from_dict(data)
+
+    def collect(self, selection: t.Union[str, dict]) -> dict:
+        """
+        the fields in a graphql selection set, see `graphql_query`.
+        """
+        from .graphql_query import collect
+        return collect(self, selection)
+
+    def clone(self) -> 'Json':
+        """
+        deep copy, generated by `graphql_ast`, the concrete values are shared.
+        """
+        return self.__class__.from_dict(self.to_dict())
+
+    def clone_graph(self) -> 'Json':
+        """
+        deep copy preserving the shared objects and the cycles, see `graph`.
+        """
+        from .graph import clone_graph
+        return clone_graph(self)
+
+    def to_dict_graph(self) -> dict:
+        """
+        `to_dict` encoding shared objects once, with `$id`/`$ref`, see `graph`.
+        """
+        from .graph import to_dict_graph
+        return to_dict_graph(self)
+
+    def to_json_graph(self) -> bytes:
+        from .graph import to_json_graph
+        return to_json_graph(self)
+
+    @classmethod
+    def from_dicts_columnar(cls, records: t.Iterable[dict], **kwargs):
+        """
+        decode records into a table of one column per field, see `columnar`.
+        """
+        from .columnar import from_dicts_columnar
+        return from_dicts_columnar(cls, records, **kwargs)
+
+    @classmethod
+    def merge_from_dict(cls, obj: 'Json', data: dict) -> 'Json':
+        """
+        update `obj` in place from the fields present in `data`, see `merge`.
+        """
+        from .merge import merge_from_dict
+        return merge_from_dict(cls, obj, data)
+
+    def diff(self, old: dict) -> t.List[dict]:
+        """
+        JSON-Patch operations from the data `old` to the current `to_dict()`,
+        cheap for tracked types whose `old` is an earlier output, see `tracking`.
+        """
+        from .tracking import diff
+        return diff(old, self.to_dict())
+
+    def patch(self, ops: t.List[dict]) -> 'Json':
+        """
+        apply JSON-Patch operations in place, see `tracking`.
+        """
+        from .tracking import patch_object
+        patch_object(self, ops)
+        return self
+
+    @classmethod
+    def from_dict_graph(cls, data: dict) -> 'Json':
+        """
+        decode the output of `to_dict_graph`, restoring the shared objects.
+        """
+        from .graph import from_dict_graph
+        return from_dict_graph(cls, data)
+
+    @classmethod
+    def decoder(cls, selection: t.Union[str, dict]) -> t.Callable[[dict], 'Json']:
+        """
+        a `from_dict` decoding only the fields in a graphql selection set,
+        the others are left unset, see `graphql_query`.
+        """
+        from .graphql_query import compile_decoder
+        return compile_decoder(cls, selection)
+
+    @classmethod
+    def iter_from_json(cls, fileobj, chunk_size: int = 64 * 1024,
+                       **kwargs) -> t.Iterator['Json']:
+        """
+        decode the objects of a top level json array in a file one by one,
+        see `stream`.
+        """
+        from .stream import iter_from_json
+        return iter_from_json(cls, fileobj, chunk_size, **kwargs)
+
+    @classmethod
+    def iter_from_ndjson(cls, fileobj,
+                         chunk_size: int = 64 * 1024) -> t.Iterator['Json']:
+        """
+        decode the objects of a newline delimited json file one by one,
+        see `stream`.
+        """
+        from .stream import iter_from_ndjson
+        return iter_from_ndjson(cls, fileobj, chunk_size)
+
+    @classmethod
+    def from_dict_many(cls, items: t.Iterable[dict], workers: int = None,
+                       **kwargs) -> list:
+        """
+        decode in a process pool, returning `fn` of the objects, see `parallel`.
+        without `fn`, the objects are decoded in-process, and passing `workers`
+        raises `ValueError`.
+        """
+        from .parallel import from_dict_many
+        return from_dict_many(cls, items, workers, **kwargs)
+
+    @classmethod
+    def to_dict_many(cls, items: t.Iterable['Json']) -> t.List[dict]:
+        """
+        encode in-process, sending the objects to a process pool costs more,
+        see `parallel`.
+        """
+        from .parallel import to_dict_many
+        return to_dict_many(cls, items)
+
+    @classmethod
+    def aiter_decode(cls, reader, framing: str = 'ndjson',
+                     **kwargs) -> t.AsyncIterator['Json']:
+        """
+        decode records from an `asyncio.StreamReader`, see `aio`.
+        """
+        from .aio import aiter_decode
+        return aiter_decode(cls, reader, framing, **kwargs)
+
+    @classmethod
+    def aencode_to(cls, writer, objs, framing: str = 'ndjson',
+                   **kwargs) -> t.Awaitable[int]:
+        """
+        encode records to an `asyncio.StreamWriter`, see `aio`.
+        """
+        from .aio import aencode_to
+        return aencode_to(cls, writer, objs, framing, **kwargs)
 
 
 class AutoJson(metaclass=AutoJsonMeta):
@@ -54,10 +234,92 @@ class AutoJson(metaclass=AutoJsonMeta):
     def to_json(self) -> bytes:
         raise TypeError
 
+    def collect(self, selection: t.Union[str, dict]) -> dict:
+        raise TypeError
+
+    def clone(self: T) -> T:
+        raise TypeError
+
+    def clone_graph(self: T) -> T:
+        raise TypeError
+
+    def to_dict_graph(self) -> dict:
+        raise TypeError
+
+    def to_json_graph(self) -> bytes:
+        raise TypeError
+
+    def diff(self, old: dict) -> t.List[dict]:
+        raise TypeError
+
+    def patch(self: T, ops: t.List[dict]) -> T:
+        raise TypeError
+
+    @classmethod
+    def from_dict_graph(cls: t.Type[T], data: dict) -> T:
+        raise TypeError
+
     @classmethod
     def from_dict(cls: t.Type[T], data: dict) -> T:
         raise TypeError
 
+    @classmethod
+    def from_bson(cls: t.Type[T], data: bytes) -> T:
+        raise TypeError
+
+    @classmethod
+    def from_dict_trusted(cls: t.Type[T], data: dict) -> T:
+        raise TypeError
+
+    @classmethod
+    def from_dict_lazy(cls: t.Type[T], data: dict) -> T:
+        raise TypeError
+
+    @classmethod
+    def merge_from_dict(cls: t.Type[T], obj: T, data: dict) -> T:
+        raise TypeError
+
+    @classmethod
+    def from_dicts_columnar(cls,
+                            records: t.Iterable[dict],
+                            intern: t.Union[bool, t.Collection[str]] = False,
+                            use_numpy: bool = None):
+        raise TypeError
+
+    @classmethod
+    def decoder(cls: t.Type[T],
+                selection: t.Union[str, dict]) -> t.Callable[[dict], T]:
+        raise TypeError
+
+    @classmethod
+    def iter_from_json(cls: t.Type[T], fileobj, chunk_size: int = 64 * 1024,
+                       **kwargs) -> t.Iterator[T]:
+        raise TypeError
+
+    @classmethod
+    def iter_from_ndjson(cls: t.Type[T], fileobj,
+                         chunk_size: int = 64 * 1024) -> t.Iterator[T]:
+        raise TypeError
+
+    @classmethod
+    def from_dict_many(cls: t.Type[T], items: t.Iterable[dict],
+                       workers: int = None, **kwargs) -> list:
+        raise TypeError
+
+    @classmethod
+    def to_dict_many(cls: t.Type[T], items: t.Iterable[T]) -> t.List[dict]:
+        raise TypeError
+
+    @classmethod
+    def aiter_decode(cls: t.Type[T], reader, framing: str = 'ndjson',
+                     **kwargs) -> t.AsyncIterator[T]:
+        raise TypeError
+
+    @classmethod
+    def aencode_to(cls: t.Type[T], writer, objs, framing: str = 'ndjson',
+                   **kwargs) -> t.Awaitable[int]:
+        raise TypeError
+
 
 class Spec:
     pass
@@ -95,7 +357,7 @@ class Optional(Spec, t.NamedTuple):
 
 
 class Union(Spec, t.NamedTuple):
-    args: t.List[Spec]
+    args: t.Tuple[Spec, ...]
 
 
 class List(Spec, t.NamedTuple):
@@ -107,11 +369,50 @@ class Dict(Spec, t.NamedTuple):
     value: Spec
 
 
+def _spec_eq(self, other):
+    return self.__class__ is other.__class__ and tuple.__eq__(self, other)
+
+
+def _spec_ne(self, other):
+    return not _spec_eq(self, other)
+
+
+def _spec_hash(self):
+    return hash((self.__class__, tuple.__hash__(self)))
+
+
+# the specs are cache keys, where `Optional(X)` is not `List(X)` though the
+# tuples are equal.
+for _each in (Named, ForwardRef, Concrete, Optional, Union, List, Dict):
+    _each.__eq__ = _spec_eq
+    _each.__ne__ = _spec_ne
+    _each.__hash__ = _spec_hash
+del _each
+
+
 class SchemaMonitor:
     # schemas: qualname -> (type, [(field_name, field_type_spec)])
     schemas: t.Dict[str, t.Tuple[type, t.List[t.Tuple[str, Spec]]]] = {}
-    # methods: qualname -> (from_dict, to_dict, query)
-    methods: t.Dict[str, t.List[t.Callable]]
+    # methods: qualname -> {'query': query(obj, selection)}, the compiled
+    # selection queries of `graphql_query`.
+    methods: t.Dict[str, t.Dict[str, t.Callable]] = {}
+    # when set, `Named` members of unions are told apart by this field,
+    # holding `type_tag(member)`, e.g: '__typename' as GraphQL does.
+    # otherwise a field only declared by one of the members is looked for.
+    discriminator: t.Optional[str] = None
+    # 'Type.field' -> how `merge_from_dict` merges the list of the field:
+    # 'replace'(default), 'index', or 'key:<field of the elements>', see `merge`.
+    merge_lists: t.Dict[str, str] = {}
+    # qualname -> qualnames of the types referring to it in their fields,
+    # registered or not yet.
+    referrers: t.Dict[str, t.Set[str]] = {}
+    # called with the qualnames of the types whose codecs are outdated by
+    # `register` or `remove`, see `graphql_ast.generate(incremental=True)`.
+    listeners: t.List[t.Callable[[t.Set[str]], None]] = []
+    # set by `graphql_ast.generate(incremental=True)`: `register` resolves the
+    # schemas at once, and `register`/`remove` relink the referring schemas.
+    # otherwise `resolve` is called before generating the codecs.
+    incremental = False
 
     def __init__(self):
         raise TypeError("Monitor is a singleton.")
@@ -123,7 +424,10 @@ class SchemaMonitor:
         if isinstance(subscript, type):
             subscript = subscript.__qualname__
 
-        del cls.schemas[subscript]
+        _, fields = cls.schemas.pop(subscript)
+        for each in referred_names(fields):
+            cls.referrers[each].discard(subscript)
+        cls.changed(subscript)
 
     @classmethod
     def register(cls, typ: type):
@@ -134,26 +438,198 @@ class SchemaMonitor:
         qualname = typ.__qualname__
         if qualname in cls.schemas:
             warnings.warn(f"Overwriting json type schema {qualname!r}.")
+            _, fields = cls.schemas[qualname]
+            for each in referred_names(fields):
+                cls.referrers[each].discard(qualname)
+
+        fields = [(k, describe(t)) for k, t in typ.__annotations__.items()]
+        cls.schemas[qualname] = typ, fields
+        for each in referred_names(fields):
+            cls.referrers.setdefault(each, set()).add(qualname)
+        if cls.incremental:
+            cls.resolve(qualnames=[qualname])
+        cls.changed(qualname)
+
+    @classmethod
+    def dependents(cls, qualname: str) -> t.Set[str]:
+        """
+        `qualname` and the registered types referring to it, transitively,
+        i.e, the types whose generated codecs inline its schema.
+        """
+        ret = set()
+        stack = [qualname]
+        while stack:
+            each = stack.pop()
+            if each in ret:
+                continue
+            ret.add(each)
+            stack.extend(cls.referrers.get(each, ()))
+        return {each for each in ret if each in cls.schemas}
+
+    @classmethod
+    def changed(cls, qualname: str):
+        """
+        notify the listeners of the outdated types, and in incremental mode,
+        link the referrers of `qualname` to its current schema.
+        """
+        if cls.incremental:
+            referrers = cls.referrers.get(qualname, ())
+            for each in referrers:
+                if each not in cls.schemas:
+                    continue
+                _, fields = cls.schemas[each]
+                for i, (attr, spec) in enumerate(fields):
+                    fields[i] = attr, unlink(spec, qualname)
+            cls.resolve(qualnames=referrers)
+        if cls.listeners:
+            affected = cls.dependents(qualname)
+            for listener in cls.listeners:
+                listener(affected)
 
-        cls.schemas[typ.__qualname__] = typ, [
-            (k, describe(t)) for k, t in typ.__annotations__.items()
+    @classmethod
+    def reachable(cls, typ: type) -> t.List[type]:
+        """
+        the types whose schemas are needed to generate codecs for `typ`,
+        in the order of registration.
+        """
+        visited = set()
+        stack = [typ.__qualname__]
+        while stack:
+            qualname = stack.pop()
+            if qualname in visited:
+                continue
+            visited.add(qualname)
+            _, fields = cls.schemas[qualname]
+            for _, spec in fields:
+                stack.extend(
+                    each.__qualname__ for each in named_types(spec))
+        return [
+            ty for qualname, (ty, _) in cls.schemas.items()
+            if qualname in visited
         ]
 
     @classmethod
-    def resolve(cls, strict=False):
-        for _, (ty, fields) in cls.schemas.items():
+    def fingerprint(cls) -> str:
+        """
+        a digest of the registered types, their union tags, their field specs
+        and the list merge strategies, used to check whether codecs generated
+        ahead of time are stale.
+        """
+        h = hashlib.sha256()
+        h.update(f'{cls.discriminator}\x01'.encode())
+        for qualname, (typ, fields) in cls.schemas.items():
+            h.update(f'{qualname}\x02{type_tag(typ)}'.encode())
+            for attr, spec in fields:
+                h.update(f'\x00{attr}:{spec_repr(spec)}'.encode())
+            h.update(b'\x01')
+        for name, strategy in sorted(cls.merge_lists.items()):
+            h.update(f'{name}={strategy}\x01'.encode())
+        return h.hexdigest()
+
+    @classmethod
+    def resolve(cls, strict=False, qualnames: t.Iterable[str] = None):
+        """
+        :param qualnames: types to resolve, default to all the registered ones.
+        """
+        if qualnames is None:
+            qualnames = list(cls.schemas)
+        for qualname in qualnames:
+            if qualname not in cls.schemas:
+                continue
+            _, fields = cls.schemas[qualname]
             for i in range(len(fields)):
                 attr, field = fields[i]
                 fields[i] = attr, backref(field, strict=strict)
 
 
+def type_tag(typ: type) -> str:
+    return typ.__dict__.get('__typename__', typ.__name__)
+
+
+class UnionLayout(t.NamedTuple):
+    """
+    dispatch table of a `Union`, computed when generating.
+    """
+    # members which are not json objects: [(class of the data, member)]
+    by_type: t.List[t.Tuple[type, Spec]]
+    # members decoded from json objects: [(tag or distinguishing key, member)]
+    by_key: t.List[t.Tuple[str, Spec]]
+    # the json object member used when no key matches.
+    default: t.Optional[Spec]
+    # the field holding the tags of `by_key`, `None` if `by_key` holds keys.
+    discriminator: t.Optional[str]
+
+    def by_class(self) -> t.List[t.Tuple[type, Spec, t.Optional[str]]]:
+        """
+        members to encode: [(class of the object, member, tag to add or None)]
+        """
+        ret = [(cls, member, None) for cls, member in self.by_type]
+        for key, member in self.by_key:
+            ret.append((member.typ, member,
+                        key if self.discriminator is not None else None))
+        if self.default:
+            ret.append((dict if isinstance(self.default, Dict) else
+                        self.default.typ, self.default, None))
+        return ret
+
+
+def union_layout(spec: Union) -> UnionLayout:
+    by_type = {}
+    named = []
+    default = None
+    for each in spec.args:
+        if isinstance(each, Named):
+            named.append(each)
+            continue
+        if isinstance(each, Dict):
+            if default is not None:
+                raise TypeError(f'{spec} has ambiguous members {default} and {each}.')
+            default = each
+            continue
+        if isinstance(each, Concrete):
+            cls = each.typ
+        elif isinstance(each, List):
+            cls = list
+        else:
+            raise TypeError(f'{spec} cannot dispatch on {each}.')
+        if cls in by_type:
+            raise TypeError(f'{spec} has ambiguous members {by_type[cls]} and {each}.')
+        by_type[cls] = each
+
+    discriminator = SchemaMonitor.discriminator
+    if discriminator is not None:
+        by_key = [(type_tag(each.typ), each) for each in named]
+        return UnionLayout(list(by_type.items()), by_key, default, discriminator)
+
+    fields = {
+        each: {attr for attr, _ in SchemaMonitor.schemas[each.typ.__qualname__][1]}
+        for each in named
+    }
+    by_key = []
+    for each in named:
+        others = set().union(*(v for k, v in fields.items() if k != each))
+        keys = sorted(fields[each] - others)
+        if keys:
+            by_key.append((keys[0], each))
+        elif default is None:
+            default = each
+        else:
+            raise TypeError(
+                f'{spec} cannot tell {each} from {default}, '
+                f'set `SchemaMonitor.discriminator` to dispatch on a field.')
+    return UnionLayout(list(by_type.items()), by_key, default, None)
+
+
 def backref(spec: Spec, strict) -> Spec:
     def _backref(_):
         return backref(_, strict)
 
-    if isinstance(spec, (Optional, Concrete, Named)):
+    if isinstance(spec, (Concrete, Named)):
         return spec
 
+    if isinstance(spec, Optional):
+        return Optional(_backref(spec.typ))
+
     if isinstance(spec, ForwardRef):
         type_and_fields = SchemaMonitor.schemas.get(spec.name)
         if type_and_fields:
@@ -172,8 +648,98 @@ def backref(spec: Spec, strict) -> Spec:
 
     if isinstance(spec, Union):
 
-        return Union(list(map(_backref, spec.args)))
+        return Union(tuple(map(_backref, spec.args)))
+
+    raise TypeError(spec)
+
+
+def named_types(spec: Spec) -> t.Iterator[type]:
+    if isinstance(spec, Named):
+        yield spec.typ
+    elif isinstance(spec, (Optional, List)):
+        yield from named_types(spec[0])
+    elif isinstance(spec, Dict):
+        yield from named_types(spec.key)
+        yield from named_types(spec.value)
+    elif isinstance(spec, Union):
+        for each in spec.args:
+            yield from named_types(each)
+
+
+def referred_names(fields: t.List[t.Tuple[str, Spec]]) -> t.Set[str]:
+    """
+    qualnames of the types referred by the fields, resolved or not.
+    """
+    ret = set()
+
+    def visit(spec: Spec):
+        if isinstance(spec, Named):
+            ret.add(spec.typ.__qualname__)
+        elif isinstance(spec, ForwardRef):
+            ret.add(spec.name)
+        elif isinstance(spec, (Optional, List)):
+            visit(spec[0])
+        elif isinstance(spec, Dict):
+            visit(spec.key)
+            visit(spec.value)
+        elif isinstance(spec, Union):
+            for each in spec.args:
+                visit(each)
+
+    for _, spec in fields:
+        visit(spec)
+    return ret
+
+
+def unlink(spec: Spec, qualname: str) -> Spec:
+    """
+    turn the references to `qualname` back into `ForwardRef`s.
+    """
+    if isinstance(spec, Named):
+        if spec.typ.__qualname__ == qualname:
+            return ForwardRef(qualname)
+        return spec
+    if isinstance(spec, (Optional, List)):
+        return spec.__class__(unlink(spec[0], qualname))
+    if isinstance(spec, Dict):
+        return Dict(unlink(spec.key, qualname), unlink(spec.value, qualname))
+    if isinstance(spec, Union):
+        return Union(tuple(unlink(each, qualname) for each in spec.args))
+    return spec
+
 
+class Trampoline:
+    """
+    placeholder of a generated method.
+    on first access, `load(owner)` is called to generate and install the real methods,
+    which replace this descriptor, so that later calls run at full speed.
+    """
+
+    def __init__(self, name: str, load: t.Callable[[type], None]):
+        self.name = name
+        self.load = load
+
+    def __get__(self, instance, owner):
+        self.load(owner)
+        if owner.__dict__.get(self.name) is self:
+            raise TypeError(f'{owner.__qualname__}.{self.name} is not generated.')
+        return getattr(owner if instance is None else instance, self.name)
+
+
+def spec_repr(spec: Spec) -> str:
+    """
+    process independent representation of specs.
+    """
+    if isinstance(spec, (Named, Concrete)):
+        return f'{spec.__class__.__name__}({spec.typ.__qualname__})'
+    if isinstance(spec, ForwardRef):
+        return f'ForwardRef({spec.name})'
+    if isinstance(spec, (Optional, List)):
+        return f'{spec.__class__.__name__}({spec_repr(spec[0])})'
+    if isinstance(spec, Dict):
+        return f'Dict({spec_repr(spec.key)}, {spec_repr(spec.value)})'
+    if isinstance(spec, Union):
+        return f'Union({", ".join(map(spec_repr, spec.args))})'
     raise TypeError(spec)
 
 
@@ -200,7 +766,7 @@ def describe(ty: t.Union[str, t.Type]) -> Spec:
             if len(args) is 2 and NoneConcrete in args:
                 e_ty = args[args[0] == NoneConcrete]
                 return Optional(e_ty)
-            return Union(args)
+            return Union(tuple(args))
         elif is_origin(t.Dict):
             key, value = map(describe, args)
             return Dict(key, value)
@@ -0,0 +1,144 @@
+"""
+random access to NDJSON dumps of AutoJson objects:
+
+    with NDJSONStore('buildings.ndjson', Building, key='name') as store:
+        store[10]           # the 11th record
+        store.get('school') # the record whose `name` is 'school'
+
+the file is memory mapped, and the offsets of the records(and the key index)
+are persisted to a sidecar file(`<path>.idx` by default), which is reused until
+the file changes. the sidecar is a json header line holding the signature and
+the keys, followed by the offsets as raw 64-bit integers. only the requested record is sliced out of the mapping and
+decoded with the generated `from_dict`.
+"""
+from .schema_analyse import SchemaMonitor, Concrete
+from array import array
+from json import dumps, loads
+import mmap
+import os
+import sys
+import typing as t
+
+# bump when the layout of the index file changes.
+index_version = 2
+
+
+class NDJSONStore:
+    def __init__(self,
+                 path: str,
+                 typ: type,
+                 key: t.Optional[str] = None,
+                 index_path: t.Optional[str] = None):
+        """
+        :param key: a `Concrete` field to look up records by, see `get`.
+        """
+        if key is not None:
+            _, fields = SchemaMonitor.schemas[typ.__qualname__]
+            if not isinstance(dict(fields).get(key), Concrete):
+                raise TypeError(
+                    f'{typ.__qualname__}.{key} is not a concrete field.')
+
+        self.path = path
+        self.typ = typ
+        self.key = key
+        self.index_path = index_path or path + '.idx'
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        # empty files cannot be mapped.
+        self._buf = mmap.mmap(
+            self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.offsets, self.keys = self._load_index() or self._build_index()
+
+    def _signature(self):
+        stat = os.fstat(self._file.fileno())
+        return [
+            index_version, sys.byteorder, stat.st_size, stat.st_mtime_ns,
+            self.key
+        ]
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                header = loads(f.readline().decode('utf-8'))
+                if header['signature'] != self._signature():
+                    return None
+                offsets = array('q')
+                offsets.fromfile(f, header['count'])
+        except (OSError, EOFError, ValueError, KeyError, TypeError):
+            return None
+        keys = header['keys']
+        if keys is None:
+            return offsets, {}
+        if len(keys) != len(offsets):
+            return None
+        return offsets, {k: i for i, k in enumerate(keys)}
+
+    def _build_index(self):
+        buf = self._buf
+        find = buf.find
+        offsets = array('q')
+        # the key of each record.
+        keys = []
+        key = self.key
+        start = 0
+        size = len(buf)
+        while start < size:
+            end = find(b'\n', start)
+            if end == -1:
+                end = size
+            line = buf[start:end]
+            if line.strip():
+                if key is not None:
+                    keys.append(loads(line.decode('utf-8'))[key])
+                offsets.append(start)
+            start = end + 1
+
+        tmp_path = f'{self.index_path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(dumps({
+                    'signature': self._signature(),
+                    'count': len(offsets),
+                    'keys': keys if key is not None else None
+                }).encode() + b'\n')
+                offsets.tofile(f)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            # a read-only location only costs rescanning next time.
+            pass
+        return offsets, {k: i for i, k in enumerate(keys)}
+
+    def raw(self, i: int) -> bytes:
+        """
+        the source of the `i`th record.
+        """
+        start = self.offsets[i]
+        end = self._buf.find(b'\n', start)
+        return self._buf[start:] if end == -1 else self._buf[start:end]
+
+    def __getitem__(self, i: int):
+        return self.typ.from_dict(loads(self.raw(i).decode('utf-8')))
+
+    def get(self, key, default=None):
+        i = self.keys.get(key)
+        if i is None:
+            return default
+        return self[i]
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __iter__(self):
+        for i in range(len(self.offsets)):
+            yield self[i]
+
+    def close(self):
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
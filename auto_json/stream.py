@@ -0,0 +1,180 @@
+"""
+streaming decoders of large files:
+
+    with open('buildings.json', 'rb') as f:
+        for building in Building.iter_from_json(f):  # [{...}, {...}, ...]
+            ...
+
+    with open('buildings.ndjson', 'rb') as f:
+        for building in Building.iter_from_ndjson(f):  # one object per line
+            ...
+
+files are read in chunks of `chunk_size` and decoded one top level element
+at a time, so that the memory is bounded by the largest element instead of the file.
+an element of a json array longer than `max_element` characters is rejected.
+"""
+from json import JSONDecoder, JSONDecodeError, loads
+import codecs
+import re
+import typing as t
+
+default_chunk_size = 64 * 1024
+default_max_element = 256 * 1024 * 1024
+
+raw_decode = JSONDecoder().raw_decode
+whitespaces = re.compile(r'\s*')
+# the text after a decoding error which more input may complete:
+# a number or a literal cut by the end of the buffer.
+partial_token = re.compile(r'[\w.+-]*\Z')
+
+
+def iter_text(fileobj, chunk_size: int) -> t.Iterator[str]:
+    decoder = None
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder('utf-8')()
+            chunk = decoder.decode(chunk)
+            if not chunk:
+                # within a multibyte character.
+                continue
+        yield chunk
+    if decoder is not None:
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+
+def is_incomplete(err: JSONDecodeError) -> bool:
+    """
+    whether decoding failed at the end of the buffer, instead of malformed text.
+    """
+    if err.msg.startswith('Unterminated string'):
+        return True
+    if err.msg.startswith('Invalid \\uXXXX escape'):
+        return len(err.doc) - err.pos < 6
+    return partial_token.match(err.doc, err.pos) is not None
+
+
+def iter_array(fileobj,
+               chunk_size: int = default_chunk_size,
+               max_element: int = default_max_element) -> t.Iterator[dict]:
+    """
+    :return: the objects of a top level json array one by one.
+    """
+    chunks = iter_text(fileobj, chunk_size)
+    buf = ''
+    i = 0
+    exhausted = False
+    # the next token: '[', 'first' element or ']', 'element' after a comma,
+    # ',' or ']' after an element, or nothing after the array, 'end'.
+    expect = '['
+    while True:
+        i = whitespaces.match(buf, i).end()
+        if i == len(buf):
+            if exhausted:
+                break
+            buf, i = next(chunks, ''), 0
+            exhausted = not buf
+            continue
+
+        c = buf[i]
+        if expect == '[':
+            if c != '[':
+                raise ValueError(f'expected a json array, got {c!r}.')
+            expect = 'first'
+            i += 1
+            continue
+        if expect == 'end':
+            raise ValueError(f'unexpected {c!r} after the json array.')
+        if expect == ',':
+            if c == ',':
+                expect = 'element'
+            elif c == ']':
+                expect = 'end'
+            else:
+                raise ValueError(
+                    f"expected ',' or ']' in the json array, got {c!r}.")
+            i += 1
+            continue
+        if c == ']' and expect == 'first':
+            expect = 'end'
+            i += 1
+            continue
+        if c != '{':
+            raise ValueError(
+                f'expected a json object in the array, got {c!r}.')
+
+        try:
+            value, i = raw_decode(buf, i)
+        except JSONDecodeError as err:
+            if exhausted or not is_incomplete(err):
+                raise
+            if len(buf) - i > max_element:
+                raise ValueError(
+                    f'a json element exceeds {max_element} characters.'
+                ) from None
+            # the object is not complete, read at least as much as is buffered,
+            # so that a large object is rescanned for O(log(size)) times.
+            pieces = [buf[i:]]
+            size = 0
+            while size < max(chunk_size, len(pieces[0])):
+                chunk = next(chunks, '')
+                if not chunk:
+                    exhausted = True
+                    break
+                pieces.append(chunk)
+                size += len(chunk)
+            buf, i = ''.join(pieces), 0
+            continue
+        expect = ','
+        yield value
+
+    if expect != 'end':
+        raise ValueError('unexpected end of the json array.')
+
+
+def iter_lines(fileobj,
+               chunk_size: int = default_chunk_size) -> t.Iterator[bytes]:
+    pieces = []
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        start = 0
+        end = chunk.find(b'\n')
+        while end != -1:
+            if pieces:
+                pieces.append(chunk[start:end])
+                yield b''.join(pieces)
+                pieces = []
+            else:
+                yield chunk[start:end]
+            start = end + 1
+            end = chunk.find(b'\n', start)
+        if start < len(chunk):
+            pieces.append(chunk[start:])
+    if pieces:
+        yield b''.join(pieces)
+
+
+def iter_from_json(typ: type,
+                   fileobj,
+                   chunk_size: int = default_chunk_size,
+                   max_element: int = default_max_element) -> t.Iterator:
+    from_dict = typ.from_dict
+    for each in iter_array(fileobj, chunk_size, max_element):
+        yield from_dict(each)
+
+
+def iter_from_ndjson(typ: type, fileobj,
+                     chunk_size: int = default_chunk_size) -> t.Iterator:
+    from_dict = typ.from_dict
+    for line in iter_lines(fileobj, chunk_size):
+        if line.strip():
+            yield from_dict(loads(line.decode('utf-8')))
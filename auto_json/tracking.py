@@ -0,0 +1,517 @@
+"""
+dirty tracking of long-lived object graphs:
+
+    class Building(AutoJson, tracked=True):
+        ...
+
+    tracking.generate()  # after generating the codecs
+    old = building.to_dict()
+    building.floors[0].name = 'f1'
+    building.to_dict()   # only `floors[0]` and `building` are encoded again
+    building.diff(old)   # [{'op': 'replace', 'path': '/floors/0/name', 'value': 'f1'}]
+
+tracked objects cache their last `to_dict`/`to_json` output, which is reused by
+the objects holding them. assigning a field drops the caches of the object and
+of the objects holding it. containers mutated in place are not noticed, call
+`touch(obj)` on the object holding them.
+
+`to_dict` returns a new dict each call, but the dicts and lists inside are the
+caches shared by the outputs, which are frozen: mutating them raises a
+`TypeError`, and `copy.deepcopy` gives plain ones. `patch` copies the frozen
+containers it goes through. `diff` compares them by identity, so that it costs
+as much as what changed.
+"""
+from .schema_analyse import *
+from .validate import escape
+from json import JSONEncoder, dumps
+from json.encoder import encode_basestring
+from weakref import ref
+
+# types declared with `tracked=True`.
+tracked_types: t.Set[type] = set()
+
+# spec -> encoder(value, holder), holder: the tracked object holding the value.
+encoders: t.Dict[Spec, t.Callable[[t.Any, t.Any], t.Any]] = {}
+# spec -> writer(value, holder) -> json text
+writers: t.Dict[Spec, t.Callable[[t.Any, t.Any], str]] = {}
+
+
+def invalidate(_):
+    encoders.clear()
+    writers.clear()
+
+
+SchemaMonitor.listeners.append(invalidate)
+
+json_encode = JSONEncoder(separators=(',', ':')).encode
+
+
+def read_only(self, *args, **kwargs):
+    raise TypeError(f'{self.__class__.__name__} is a cached output of tracked '
+                    f'objects, copy it to modify.')
+
+
+class FrozenDict(dict):
+    __slots__ = ()
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = \
+        read_only
+
+    def __reduce__(self):
+        return dict, (dict(self), )
+
+
+class FrozenList(list):
+    __slots__ = ()
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = append = clear = \
+        extend = insert = pop = remove = reverse = sort = read_only
+
+    def __reduce__(self):
+        return list, (list(self), )
+
+
+def thaw(x):
+    """
+    a plain copy of a frozen container.
+    """
+    if x.__class__ is FrozenDict:
+        return dict(x)
+    if x.__class__ is FrozenList:
+        return list(x)
+    return x
+
+
+class State:
+    """
+    the caches of a tracked object, `None` when dirty.
+    """
+    __slots__ = ('dict', 'json', 'holders')
+
+    def __init__(self):
+        self.dict = None
+        self.json = None
+        # weak references to the objects whose cached outputs include this one,
+        # `ref(obj)` is the same object on each call.
+        self.holders = set()
+
+
+def track(typ: type, annotations: t.Iterable[str]):
+    """
+    called by `AutoJsonMeta` for `tracked=True` types.
+    """
+    fields = frozenset(annotations)
+    setattr_ = object.__setattr__
+
+    def __setattr__(self, name, value):
+        if name in fields:
+            release(getattr(self, name, None), self)
+            setattr_(self, name, value)
+            touch(self)
+        else:
+            setattr_(self, name, value)
+
+    typ.__setattr__ = __setattr__
+    tracked_types.add(typ)
+
+
+def touch(obj):
+    """
+    drop the caches of `obj` and of the objects holding it.
+    """
+    stack = [obj]
+    while stack:
+        state = getattr(stack.pop(), '_tracking', None)
+        if state is None or state.dict is None and state.json is None:
+            # the holders of a dirty object are dirty.
+            continue
+        state.dict = state.json = None
+        holders = [each() for each in state.holders]
+        if None in holders:
+            state.holders = {
+                each
+                for each in state.holders if each() is not None
+            }
+        stack.extend(each for each in holders if each is not None)
+
+
+def release(value, holder):
+    """
+    `holder` no longer holds the tracked objects in `value`, a replaced field.
+    """
+    stack = [value]
+    while stack:
+        each = stack.pop()
+        state = getattr(each, '_tracking', None)
+        if state is not None:
+            state.holders.discard(ref(holder))
+        elif isinstance(each, (list, tuple)):
+            stack.extend(each)
+        elif isinstance(each, dict):
+            stack.extend(each.values())
+
+
+def get_state(obj) -> State:
+    state = getattr(obj, '_tracking', None)
+    if state is None:
+        state = State()
+        object.__setattr__(obj, '_tracking', state)
+    return state
+
+
+def identity(x, _):
+    return x
+
+
+def encoder(spec: Spec) -> t.Callable[[t.Any, t.Any], t.Any]:
+    fn = encoders.get(spec)
+    if fn is None:
+        fn = encoders[spec] = make_encoder(spec)
+    return fn
+
+
+def writer(spec: Spec) -> t.Callable[[t.Any, t.Any], str]:
+    fn = writers.get(spec)
+    if fn is None:
+        fn = writers[spec] = make_writer(spec)
+    return fn
+
+
+def make_encoder(spec: Spec) -> t.Callable[[t.Any, t.Any], t.Any]:
+    if isinstance(spec, ForwardRef):
+        raise TypeError(f'forward ref: {spec}.')
+
+    if isinstance(spec, Concrete):
+        return identity
+
+    if isinstance(spec, List):
+        elem = encoder(spec.elem)
+        if elem is identity:
+            return lambda obj, _: FrozenList(obj)
+        return lambda obj, holder: FrozenList([elem(each, holder) for each in obj])
+
+    if isinstance(spec, Dict):
+        key, value = encoder(spec.key), encoder(spec.value)
+        return lambda obj, holder: FrozenDict({
+            key(k, holder): value(v, holder)
+            for k, v in obj.items()
+        })
+
+    if isinstance(spec, Optional):
+        elem = encoder(spec.typ)
+        return lambda obj, holder: None if obj is None else elem(obj, holder)
+
+    if isinstance(spec, Union):
+        layout = union_layout(spec)
+        by_class = {
+            cls: (member, tag)
+            for cls, member, tag in layout.by_class()
+        }
+
+        def encode_union(obj, holder):
+            member, tag = by_class.get(obj.__class__, (None, None))
+            if member is None:
+                raise TypeError(f'no member of {spec_repr(spec)} matches {obj!r}.')
+            ret = encoder(member)(obj, holder)
+            if tag is not None:
+                # the cached dict is shared.
+                ret = FrozenDict({**ret, layout.discriminator: tag})
+            return ret
+
+        return encode_union
+
+    if isinstance(spec, Named):
+        typ = spec.typ
+        if typ not in tracked_types:
+            return lambda obj, _: obj.to_dict()
+
+        _, fields = SchemaMonitor.schemas[typ.__qualname__]
+        # resolved on first call, for recursive types.
+        field_encoders = []
+
+        def encode_named(obj, holder):
+            state = get_state(obj)
+            if holder is not None:
+                state.holders.add(ref(holder))
+            ret = state.dict
+            if ret is not None:
+                return ret
+            if not field_encoders:
+                field_encoders.extend(
+                    (attr, encoder(field_spec)) for attr, field_spec in fields)
+            ret = FrozenDict({
+                attr: encode(getattr(obj, attr), obj)
+                for attr, encode in field_encoders
+            })
+            state.dict = ret
+            return ret
+
+        return encode_named
+
+    raise TypeError(spec)
+
+
+def make_writer(spec: Spec) -> t.Callable[[t.Any, t.Any], str]:
+    if isinstance(spec, ForwardRef):
+        raise TypeError(f'forward ref: {spec}.')
+
+    if isinstance(spec, Concrete):
+        return lambda obj, _: json_encode(obj)
+
+    if isinstance(spec, List):
+        elem = writer(spec.elem)
+        return lambda obj, holder: '[' + ','.join(
+            [elem(each, holder) for each in obj]) + ']'
+
+    if isinstance(spec, Dict):
+        value = writer(spec.value)
+        return lambda obj, holder: '{' + ','.join([
+            encode_basestring(str(k)) + ':' + value(v, holder)
+            for k, v in obj.items()
+        ]) + '}'
+
+    if isinstance(spec, Optional):
+        elem = writer(spec.typ)
+        return lambda obj, holder: 'null' if obj is None else elem(obj, holder)
+
+    if isinstance(spec, Union):
+        layout = union_layout(spec)
+        by_class = {
+            cls: (member, tag)
+            for cls, member, tag in layout.by_class()
+        }
+        discriminator = layout.discriminator and encode_basestring(
+            layout.discriminator)
+
+        def write_union(obj, holder):
+            member, tag = by_class.get(obj.__class__, (None, None))
+            if member is None:
+                raise TypeError(f'no member of {spec_repr(spec)} matches {obj!r}.')
+            ret = writer(member)(obj, holder)
+            if tag is not None:
+                head = '{' + discriminator + ':' + encode_basestring(tag)
+                ret = head + '}' if ret == '{}' else head + ',' + ret[1:]
+            return ret
+
+        return write_union
+
+    if isinstance(spec, Named):
+        typ = spec.typ
+        if typ not in tracked_types:
+            return lambda obj, _: json_encode(obj.to_dict())
+
+        _, fields = SchemaMonitor.schemas[typ.__qualname__]
+        field_writers = []
+
+        def write_named(obj, holder):
+            state = get_state(obj)
+            if holder is not None:
+                state.holders.add(ref(holder))
+            ret = state.json
+            if ret is not None:
+                return ret
+            if not field_writers:
+                field_writers.extend(
+                    (encode_basestring(attr) + ':', attr, writer(field_spec))
+                    for attr, field_spec in fields)
+            ret = '{' + ','.join([
+                key + write(getattr(obj, attr), obj)
+                for key, attr, write in field_writers
+            ]) + '}'
+            state.json = ret
+            return ret
+
+        return write_named
+
+    raise TypeError(spec)
+
+
+def to_dict(obj) -> dict:
+    return dict(encoder(Named(obj.__class__))(obj, None))
+
+
+def to_json(obj) -> bytes:
+    return writer(Named(obj.__class__))(obj, None).encode()
+
+
+def generate():
+    """
+    install the caching `to_dict`/`to_json` on the tracked types,
+    after generating the codecs.
+    """
+    for typ in tracked_types:
+        if SchemaMonitor.schemas.get(typ.__qualname__, (None, ))[0] is typ:
+            typ.to_dict = to_dict
+            typ.to_json = to_json
+
+
+def diff(old, new, path: str = '') -> t.List[dict]:
+    """
+    JSON-Patch(RFC 6902) operations turning `old` into `new`,
+    identical values are skipped without being compared.
+    """
+    ops = []
+
+    def _diff(old_, new_, path_):
+        if old_ is new_:
+            return
+        if isinstance(old_, dict) and isinstance(new_, dict):
+            for k in old_:
+                if k not in new_:
+                    ops.append({'op': 'remove', 'path': f'{path_}/{escape(k)}'})
+            for k, v in new_.items():
+                if k in old_:
+                    _diff(old_[k], v, f'{path_}/{escape(k)}')
+                else:
+                    ops.append({
+                        'op': 'add',
+                        'path': f'{path_}/{escape(k)}',
+                        'value': v
+                    })
+        elif isinstance(old_, list) and isinstance(new_, list):
+            n = min(len(old_), len(new_))
+            for i in range(n):
+                _diff(old_[i], new_[i], f'{path_}/{i}')
+            for i in range(n, len(new_)):
+                ops.append({'op': 'add', 'path': f'{path_}/{i}', 'value': new_[i]})
+            for i in reversed(range(n, len(old_))):
+                ops.append({'op': 'remove', 'path': f'{path_}/{i}'})
+        elif old_.__class__ is not new_.__class__ or old_ != new_:
+            ops.append({'op': 'replace', 'path': path_, 'value': new_})
+
+    _diff(old, new, path)
+    return ops
+
+
+def unescape(token: str) -> str:
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def split_pointer(path: str) -> t.List[str]:
+    if not path:
+        return []
+    if not path.startswith('/'):
+        raise ValueError(f'invalid JSON pointer {path!r}.')
+    return [unescape(each) for each in path[1:].split('/')]
+
+
+def patch(doc, ops: t.List[dict]):
+    """
+    apply JSON-Patch `add`/`remove`/`replace` operations to json data in place,
+    the frozen containers on the paths are copied.
+    :return: the patched data, which is a copy when frozen or replaced by
+    operations on the root.
+    """
+    for op in ops:
+        tokens = split_pointer(op['path'])
+        kind = op['op']
+        if kind not in ('add', 'remove', 'replace'):
+            raise ValueError(f'unsupported operation {kind!r}.')
+        if not tokens:
+            if kind == 'remove':
+                raise ValueError('cannot remove the root.')
+            doc = op['value']
+            continue
+        parent = doc = thaw(doc)
+        for token in tokens[:-1]:
+            key = int(token) if isinstance(parent, list) else token
+            child = parent[key]
+            thawed = thaw(child)
+            if thawed is not child:
+                parent[key] = thawed
+            parent = thawed
+        last = tokens[-1]
+        if isinstance(parent, list):
+            index = len(parent) if last == '-' else int(last)
+            if kind == 'add':
+                parent.insert(index, op['value'])
+            elif kind == 'remove':
+                del parent[index]
+            else:
+                parent[index] = op['value']
+        elif kind == 'remove':
+            del parent[last]
+        else:
+            parent[last] = op['value']
+    return doc
+
+
+def resolve_member(spec: Spec, value) -> Spec:
+    """
+    the spec of an object in the codecs, without `Optional` and `Union`.
+    """
+    while True:
+        if isinstance(spec, Optional):
+            spec = spec.typ
+        elif isinstance(spec, Union):
+            for cls, member, _ in union_layout(spec).by_class():
+                if value.__class__ is cls:
+                    spec = member
+                    break
+            else:
+                raise TypeError(f'no member of {spec_repr(spec)} matches {value!r}.')
+        else:
+            return spec
+
+
+def patch_object(obj, ops: t.List[dict]):
+    """
+    apply JSON-Patch `add`/`remove`/`replace` operations to an object graph,
+    the values are decoded by the specs of their locations.
+    """
+    from .graph import decoder
+
+    for op in ops:
+        tokens = split_pointer(op['path'])
+        kind = op['op']
+        if kind not in ('add', 'remove', 'replace'):
+            raise ValueError(f'unsupported operation {kind!r}.')
+        if not tokens:
+            raise ValueError('cannot replace the patched object itself.')
+
+        # the object holding the container being patched.
+        holder = parent = obj
+        spec = Named(obj.__class__)
+        for i, token in enumerate(tokens):
+            spec = resolve_member(spec, parent)
+            if isinstance(spec, Named):
+                holder = parent
+                _, fields = SchemaMonitor.schemas[spec.typ.__qualname__]
+                child_spec = dict(fields).get(token)
+                if child_spec is None:
+                    raise ValueError(
+                        f'{spec.typ.__qualname__} has no field {token!r}.')
+            elif isinstance(spec, List):
+                child_spec = spec.elem
+            elif isinstance(spec, Dict):
+                child_spec = spec.value
+            else:
+                raise ValueError(f'cannot patch into {spec_repr(spec)}.')
+            if i == len(tokens) - 1:
+                break
+            if isinstance(spec, Named):
+                parent = getattr(parent, token)
+            elif isinstance(spec, List):
+                parent = parent[int(token)]
+            else:
+                parent = parent[token]
+            spec = child_spec
+
+        value = None if kind == 'remove' else decoder(child_spec)(op['value'], {})
+        if isinstance(spec, Named):
+            if kind == 'remove':
+                raise ValueError(f'cannot remove the field at {op["path"]!r}.')
+            setattr(parent, token, value)
+            continue
+        if isinstance(spec, List):
+            index = len(parent) if token == '-' else int(token)
+            if kind == 'add':
+                parent.insert(index, value)
+            elif kind == 'remove':
+                del parent[index]
+            else:
+                parent[index] = value
+        elif kind == 'remove':
+            del parent[token]
+        else:
+            parent[token] = value
+        # containers are mutated in place.
+        touch(holder)
@@ -0,0 +1,134 @@
+"""
+locating invalid data on the slow path only:
+
+generated decoders do not track where they are in the data, when one fails,
+the data is validated again by the path tracking validator of the type, made on
+first use, which raises a `ValidationError` like
+
+    at '/floors/2/rooms/0/name': expected Concrete(str), got 3.
+
+the path is a JSON pointer(RFC 6901) into the data.
+"""
+from .schema_analyse import *
+
+# spec -> validator(data, path), raising `ValidationError`.
+validators: t.Dict[Spec, t.Callable[[t.Any, str], None]] = {}
+
+SchemaMonitor.listeners.append(lambda _: validators.clear())
+
+missing = object()
+
+
+class ValidationError(TypeError):
+    def __init__(self, path: str, expected: Spec, got=missing):
+        """
+        :param got: the invalid value, `missing` if the field is absent.
+        """
+        self.path = path
+        self.expected = expected
+        self.got = got
+        if got is missing:
+            msg = f'at {path!r}: missing field of {spec_repr(expected)}.'
+        else:
+            msg = f'at {path!r}: expected {spec_repr(expected)}, got {got!r}.'
+        super().__init__(msg)
+
+
+def escape(key) -> str:
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def validator(spec: Spec) -> t.Callable[[t.Any, str], None]:
+    fn = validators.get(spec)
+    if fn is None:
+        fn = validators[spec] = make_validator(spec)
+    return fn
+
+
+def make_validator(spec: Spec) -> t.Callable[[t.Any, str], None]:
+    # mirrors the checks of the generated decoders, see `graphql_ast`.
+    if isinstance(spec, ForwardRef):
+        raise TypeError(f'forward ref: {spec}.')
+
+    if isinstance(spec, Concrete):
+        typ = spec.typ
+
+        def validate(data, path):
+            if typ is not object and not isinstance(data, typ):
+                raise ValidationError(path, spec, data)
+
+    elif isinstance(spec, List):
+        elem = validator(spec.elem)
+
+        def validate(data, path):
+            if not isinstance(data, list):
+                raise ValidationError(path, spec, data)
+            for i, each in enumerate(data):
+                elem(each, f'{path}/{i}')
+
+    elif isinstance(spec, Dict):
+        key, value = validator(spec.key), validator(spec.value)
+
+        def validate(data, path):
+            if not isinstance(data, dict):
+                raise ValidationError(path, spec, data)
+            for k, v in data.items():
+                key(k, f'{path}/{escape(k)}')
+                value(v, f'{path}/{escape(k)}')
+
+    elif isinstance(spec, Optional):
+        elem = validator(spec.typ)
+
+        def validate(data, path):
+            # falsy values are decoded as None.
+            if data:
+                elem(data, path)
+
+    elif isinstance(spec, Union):
+        layout = union_layout(spec)
+        by_type = {cls: member for cls, member in layout.by_type}
+        tags = dict(layout.by_key)
+
+        def validate(data, path):
+            member = by_type.get(data.__class__)
+            if member is None and isinstance(data, dict):
+                if layout.discriminator is not None:
+                    member = tags.get(
+                        data.get(layout.discriminator), layout.default)
+                else:
+                    member = next(
+                        (each for key, each in layout.by_key if key in data),
+                        layout.default)
+            if member is None:
+                raise ValidationError(path, spec, data)
+            validator(member)(data, path)
+
+    elif isinstance(spec, Named):
+        _, fields = SchemaMonitor.schemas[spec.typ.__qualname__]
+
+        def validate(data, path):
+            if not isinstance(data, dict):
+                raise ValidationError(path, spec, data)
+            for attr, field_spec in fields:
+                field_path = f'{path}/{escape(attr)}'
+                if attr not in data:
+                    raise ValidationError(field_path, field_spec)
+                # resolved on call, for recursive types.
+                validator(field_spec)(data[attr], field_path)
+    else:
+        raise TypeError(spec)
+
+    return validate
+
+
+def raise_invalid(typ: type, data, err: Exception):
+    """
+    called by the generated decoders on failures, raise a `ValidationError`
+    locating the invalid value, or return if none is found.
+    """
+    try:
+        validator(Named(typ))(data, '')
+    except ValidationError as e:
+        # nested decoders have already located it relative to themselves.
+        raise e from (err.__cause__
+                      if isinstance(err, ValidationError) else err)
@@ -0,0 +1,71 @@
+import typing as t
+import json
+import time
+from auto_json.schema_analyse import AutoJson, SchemaMonitor
+from auto_json.graphql_ast import generate
+from auto_json import tracking
+
+
+class Building(AutoJson, tracked=True):
+    name: str
+    floors: t.List['Floor']
+
+
+class Floor(AutoJson, tracked=True):
+    name: str
+    rooms: t.List['Room']
+
+
+class Room(AutoJson, tracked=True):
+    name: str
+    area: float
+    bookmark: t.Dict[str, str]
+
+
+SchemaMonitor.resolve(strict=True)
+generate()
+to_dict, to_json = Building.to_dict, Building.to_json
+tracking.generate()
+
+n_floors = 100
+n_rooms = 50
+n_mutations = 200
+
+building = Building(
+    name='b',
+    floors=[
+        Floor(
+            name=f'floor{i}',
+            rooms=[
+                Room(name=f'room{j}', area=1.5, bookmark={'k': 'v'})
+                for j in range(n_rooms)
+            ]) for i in range(n_floors)
+    ])
+
+
+def mutate(i):
+    building.floors[i % n_floors].rooms[i % n_rooms].area = float(i)
+
+
+assert building.to_dict() == to_dict(building)
+assert json.loads(building.to_json()) == json.loads(to_json(building))
+
+print('==================')
+print(f'{n_floors * n_rooms} rooms, one of them changed between the encodings')
+for title, encode in [
+    ('to_dict', to_dict),
+    ('tracked to_dict', Building.to_dict),
+    ('to_json', to_json),
+    ('tracked to_json', Building.to_json),
+]:
+    start = time.perf_counter()
+    for i in range(n_mutations):
+        mutate(i)
+        encode(building)
+    print(f'{title:<16} {(time.perf_counter() - start) / n_mutations * 1e3:.3f}ms')
+
+old = building.to_dict()
+mutate(n_mutations)
+start = time.perf_counter()
+ops = building.diff(old)
+print(f'diff             {(time.perf_counter() - start) * 1e3:.3f}ms: {ops}')
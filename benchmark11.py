@@ -0,0 +1,64 @@
+import typing as t
+import time
+import tracemalloc
+from auto_json.schema_analyse import AutoJson, SchemaMonitor
+from auto_json.graphql_ast import generate
+
+
+class Room(AutoJson):
+    name: str
+    kind: str
+    area: float
+    floor: int
+    rent: t.Optional[float]
+
+
+SchemaMonitor.resolve(strict=True)
+generate()
+
+n_records = 200000
+records = [{
+    'name': f'room{i}',
+    'kind': ('office', 'lab', 'hall')[i % 3],
+    'area': i * 0.5,
+    'floor': i % 40,
+    'rent': i % 4 and i * 1.5 or None
+} for i in range(n_records)]
+
+
+def decode_rows(records_):
+    return [Room.from_dict(each) for each in records_]
+
+
+def decode_columns(records_):
+    return Room.from_dicts_columnar(records_, intern={'kind'})
+
+
+def retained_memory(fn, *args):
+    tracemalloc.start()
+    ret = fn(*args)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ret, current
+
+
+rows, rows_memory = retained_memory(decode_rows, records)
+table, table_memory = retained_memory(decode_columns, records)
+assert table[12345].to_dict() == rows[12345].to_dict()
+
+print('==================')
+print(f'{n_records} rooms')
+for title, fn in [('object per row', decode_rows),
+                  ('columnar', decode_columns)]:
+    start = time.perf_counter()
+    fn(records)
+    print(f'{title} decode costs {time.perf_counter() - start:.3f}s')
+print(f'object per row retains {rows_memory / 2**20:.1f}MB')
+print(f'columnar retains {table_memory / 2**20:.1f}MB')
+
+start = time.perf_counter()
+total = sum(each.area for each in rows)
+print(f'object per row sum(area) costs {time.perf_counter() - start:.4f}s')
+start = time.perf_counter()
+assert sum(table.column('area')) == total
+print(f'columnar sum(area) costs {time.perf_counter() - start:.4f}s')
@@ -5,9 +5,11 @@ import copy
 from pprint import pprint
 from timeit import timeit
 import json
+import tracemalloc
 from auto_json.schema_analyse import AutoJson, SchemaMonitor
 from auto_json.graphql_naive import generate as naive_generate
 from auto_json.graphql_ast import generate as ast_generate
+from auto_json.graphql_lazy import generate as lazy_generate
 with open('data.json', 'rb') as fr:
     data = json.load(fr)
 
@@ -29,13 +31,22 @@ class Room(AutoJson):
 
 
 SchemaMonitor.resolve(strict=True)
+SchemaMonitor.merge_lists['Building.floors'] = 'index'
 
+naive_generate(validate=False)
+t1 = Building.from_dict
 naive_generate()
 f1 = Building.from_dict
-ast_generate()
+e1 = Building.to_dict
+ast_generate(trusted=True)
 f2 = Building.from_dict
-ast_generate(use_cython=True)
+t2 = Building.from_dict_trusted
+e2 = Building.to_dict
+ast_generate(use_cython=True, trusted=True)
 f3 = Building.from_dict
+t3 = Building.from_dict_trusted
+e3 = Building.to_dict
+lazy_generate()
 
 building = Building.from_dict(data)
 
@@ -56,7 +67,7 @@ inc = building
 
 
 def expand_vertically(b: Building):
-    b = Building.from_dict(b.to_dict())
+    b = b.clone()
     last = b.floors[-1].rooms[-1]
 
     while last.dimension_gate:
@@ -67,7 +78,7 @@ def expand_vertically(b: Building):
 
 
 def expand_horizontally(b: Building):
-    b = Building.from_dict(b.to_dict())
+    b = b.clone()
 
     b.floors.append(
         Floor(
@@ -76,6 +87,20 @@ def expand_horizontally(b: Building):
     return b
 
 
+def expand_shared(b: Building):
+    # the previous building is referred twice, without copying.
+    return Building(
+        name="_",
+        floors=[
+            Floor(
+                name="_",
+                rooms=[
+                    Room(name="_", bookmark={}, dimension_gate=b),
+                    Room(name="_", bookmark={}, dimension_gate=b)
+                ])
+        ])
+
+
 def benchmark():
     print('==================')
     print('naive version costs: ',
@@ -92,9 +117,213 @@ def benchmark():
               **ctx, 'fn': f3
           }))
 
+    print('naive version encoding costs: ',
+          timeit('fn(obj)', number=100000, globals={
+              **ctx, 'fn': e1
+          }))
+    print('ast level generated encoder costs',
+          timeit('fn(obj)', number=100000, globals={
+              **ctx, 'fn': e2
+          }))
+
+    print('ast level generated encoder with cython compilation costs',
+          timeit('fn(obj)', number=100000, globals={
+              **ctx, 'fn': e3
+          }))
+
+
+def benchmark_trusted():
+    for title, fn, trusted in [('naive', f1, t1), ('ast', f2, t2),
+                               ('ast with cython compilation', f3, t3)]:
+        assert trusted(ctx['data']).to_dict() == ctx['data']
+        print(title, 'validating decoder costs',
+              timeit('fn(data)', number=1000, globals={
+                  **ctx, 'fn': fn
+              }), 'trusted decoder costs',
+              timeit('fn(data)', number=1000, globals={
+                  **ctx, 'fn': trusted
+              }))
+
+
+def round_trip(obj):
+    return Building.from_dict(obj.to_dict())
+
+
+def benchmark_clone():
+    obj = ctx['obj']
+    assert obj.clone().to_dict() == ctx['data']
+    for title, fn in [('from_dict(to_dict()) costs', round_trip),
+                      ('generated clone costs', Building.clone),
+                      ('clone_graph costs', Building.clone_graph)]:
+        print(title,
+              timeit('fn(obj)', number=1000, globals={
+                  **ctx, 'fn': fn
+              }))
+
+
+def decode_and_copy(obj, data_):
+    # decode the updated data, and copy the fields over by hand.
+    new = Building.from_dict(data_)
+    obj.name = new.name
+    obj.floors = new.floors
+
+
+def benchmark_merge():
+    # a partial update renaming the building and its first floor,
+    # the other floors are merged by index with nothing to update.
+    updated = copy.deepcopy(ctx['data'])
+    updated['name'] = updated['floors'][0]['name'] = 'renamed'
+    partial = {
+        'name': 'renamed',
+        'floors': [{'name': 'renamed'}] + [{}] * (len(updated['floors']) - 1)
+    }
+    target = ctx['obj'].clone()
+    assert Building.merge_from_dict(target, partial).to_dict() == updated
+    print('from_dict + copy costs',
+          timeit('fn(target, data)', number=1000, globals={
+              **ctx, 'fn': decode_and_copy, 'target': target, 'data': updated
+          }))
+    print('merge_from_dict costs',
+          timeit('fn(target, data)', number=1000, globals={
+              **ctx, 'fn': Building.merge_from_dict, 'target': target,
+              'data': partial
+          }))
+
+
+def benchmark_graph():
+    # shared objects are encoded at each occurrence by to_dict,
+    # and once in graph mode.
+    for title, obj in [('expanded', ctx['obj']), ('shared', ctx['shared'])]:
+        restored = Building.from_dict_graph(obj.to_dict_graph())
+        assert restored.to_dict() == obj.to_dict()
+        print(title, 'to_dict costs',
+              timeit('fn(obj)', number=100, globals={
+                  **ctx, 'fn': Building.to_dict, 'obj': obj
+              }), 'json size', len(obj.to_json()))
+        print(title, 'to_dict_graph costs',
+              timeit('fn(obj)', number=100, globals={
+                  **ctx, 'fn': Building.to_dict_graph, 'obj': obj
+              }), 'json size', len(obj.to_json_graph()))
+
+
+def peak_memory(fn, *args):
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def dumps_to_dict(obj):
+    return json.dumps(obj.to_dict()).encode()
+
+
+def benchmark_json():
+    obj = ctx['obj']
+    assert json.loads(obj.to_json()) == ctx['data']
+    print('to_dict + json.dumps costs',
+          timeit('fn(obj)', number=1000, globals={
+              **ctx, 'fn': dumps_to_dict
+          }), 'peak memory', peak_memory(dumps_to_dict, obj))
+    print('generated to_json costs',
+          timeit('fn(obj)', number=1000, globals={
+              **ctx, 'fn': Building.to_json
+          }), 'peak memory', peak_memory(Building.to_json, obj))
+
+
+def to_dict_then_project(obj):
+    data_ = obj.to_dict()
+    return {
+        'name': data_['name'],
+        'floors': [{
+            'name': floor['name']
+        } for floor in data_['floors']]
+    }
+
+
+def benchmark_collect():
+    # only the top level is visited, no matter how deep the building grows.
+    obj = ctx['obj']
+    selection = '{ name floors { name } }'
+    assert obj.collect(selection) == to_dict_then_project(obj)
+    print('to_dict + projection costs',
+          timeit('fn(obj)', number=1000, globals={
+              **ctx, 'fn': to_dict_then_project
+          }))
+    print('compiled collect costs',
+          timeit(
+              'fn(obj, selection)',
+              number=1000,
+              globals={
+                  **ctx, 'fn': Building.collect,
+                  'selection': selection
+              }))
+
+
+def benchmark_decoder():
+    # the rooms, and the buildings behind their gates, are never decoded.
+    decode = Building.decoder('{ name floors { name } }')
+    projected = decode(ctx['data'])
+    assert [each.name for each in projected.floors] == [
+        each.name for each in ctx['obj'].floors
+    ]
+    print('full from_dict costs',
+          timeit('fn(data)', number=1000, globals={
+              **ctx, 'fn': Building.from_dict
+          }), 'peak memory', peak_memory(Building.from_dict, ctx['data']))
+    print('projection decoder costs',
+          timeit('fn(data)', number=1000, globals={
+              **ctx, 'fn': decode
+          }), 'peak memory', peak_memory(decode, ctx['data']))
+
+
+def first_field(decode, data_):
+    return decode(data_).floors[0].name
+
+
+def touch_all(b: Building):
+    for floor in b.floors:
+        for room in floor.rooms:
+            room.bookmark
+            if room.dimension_gate:
+                touch_all(room.dimension_gate)
+
+
+def decode_and_touch_all(decode, data_):
+    touch_all(decode(data_))
+
+
+def decode_and_encode(decode, data_):
+    return decode(data_).to_dict()
+
+
+def benchmark_lazy():
+    data_ = ctx['data']
+    assert Building.from_dict_lazy(data_).to_dict() == data_
+    for title, fn in [('time to first field', first_field),
+                      ('decode + touch all fields', decode_and_touch_all),
+                      ('decode + to_dict untouched', decode_and_encode)]:
+        print(title, 'eager costs',
+              timeit('fn(decode, data)', number=1000, globals={
+                  **ctx, 'fn': fn, 'decode': Building.from_dict
+              }), 'lazy costs',
+              timeit('fn(decode, data)', number=1000, globals={
+                  **ctx, 'fn': fn, 'decode': Building.from_dict_lazy
+              }))
+
 
 building_ = building
+shared = building
 for each in range(10):
     building_ = expand_vertically(building_)
-    ctx = {'data': building_.to_dict()}
+    shared = expand_shared(shared)
+    ctx = {'data': building_.to_dict(), 'obj': building_, 'shared': shared}
     benchmark()
+    benchmark_trusted()
+    benchmark_json()
+    benchmark_graph()
+    benchmark_clone()
+    benchmark_merge()
+    benchmark_collect()
+    benchmark_decoder()
+    benchmark_lazy()
@@ -0,0 +1,85 @@
+import typing as t
+from timeit import timeit
+import json
+from auto_json.schema_analyse import AutoJson, SchemaMonitor
+from auto_json.graphql_ast import generate as ast_generate
+from auto_json.graphql_bson import generate as bson_generate
+try:
+    import bson
+except ImportError:
+    bson = None
+
+with open('data.json', 'rb') as fr:
+    data = json.load(fr)
+
+
+class Building(AutoJson):
+    name: str
+    floors: t.List['Floor']
+
+
+class Floor(AutoJson):
+    name: str
+    rooms: t.List['Room']
+
+
+class Room(AutoJson):
+    name: str
+    dimension_gate: t.Optional[Building]
+    bookmark: t.Dict[str, str]
+
+
+SchemaMonitor.resolve(strict=True)
+ast_generate()
+bson_generate()
+
+building = Building.from_dict(data)
+raw = building.to_bson()
+
+# round trips
+assert Building.from_bson(raw).to_dict() == data
+assert Building.from_bson(raw).to_bson() == raw
+empty = Building(name='', floors=[])
+assert Building.from_bson(empty.to_bson()).to_dict() == empty.to_dict()
+if bson:
+    assert bson.decode(raw) == data
+    assert Building.from_bson(bson.encode(data)).to_dict() == data
+
+if bson:
+
+    def encode_dict(obj):
+        return bson.encode(obj.to_dict())
+
+    def decode_dict(raw_):
+        return Building.from_dict(bson.decode(raw_))
+
+    baseline = 'to_dict + bson.encode'
+else:
+
+    def encode_dict(obj):
+        return json.dumps(obj.to_dict()).encode()
+
+    def decode_dict(raw_):
+        return Building.from_dict(json.loads(raw_))
+
+    baseline = 'to_dict + json.dumps'
+
+ctx = {'obj': building, 'raw': raw, 'encoded': encode_dict(building)}
+number = 100000
+print('==================')
+print(baseline, 'costs',
+      timeit('fn(obj)', number=number, globals={
+          **ctx, 'fn': encode_dict
+      }))
+print('generated to_bson costs',
+      timeit('fn(obj)', number=number, globals={
+          **ctx, 'fn': Building.to_bson
+      }))
+print('decoding with from_dict costs',
+      timeit('fn(encoded)', number=number, globals={
+          **ctx, 'fn': decode_dict
+      }))
+print('generated from_bson costs',
+      timeit('fn(raw)', number=number, globals={
+          **ctx, 'fn': Building.from_bson
+      }))
@@ -0,0 +1,77 @@
+import typing as t
+from timeit import timeit
+import json
+from auto_json.schema_analyse import AutoJson, AutoJsonMeta, SchemaMonitor
+from auto_json.graphql_naive import generate as naive_generate
+from auto_json.graphql_ast import generate as ast_generate
+
+with open('data.json', 'rb') as fr:
+    data = json.load(fr)
+
+
+class Building(AutoJson):
+    name: str
+    floors: t.List['Floor']
+
+
+class Floor(AutoJson):
+    name: str
+    rooms: t.List['Room']
+
+
+class Room(AutoJson):
+    name: str
+    dimension_gate: t.Optional[Building]
+    bookmark: t.Dict[str, str]
+
+
+# hundreds of registered schemas.
+n_schemas = 300
+for i in range(n_schemas):
+    AutoJsonMeta(
+        f'Generated{i}', (AutoJson, ), {
+            '__annotations__': {
+                'id': int,
+                'label': str,
+                'weight': float,
+                'tags': t.List[str],
+                'rooms': t.List['Room'],
+                'building': t.Optional[Building],
+            }
+        })
+
+SchemaMonitor.resolve(strict=True)
+
+backends = {
+    'naive': naive_generate,
+    'ast': ast_generate,
+    'bytecode': lambda: ast_generate(backend='bytecode'),
+}
+
+print('==================')
+print(f'codegen costs for {len(SchemaMonitor.schemas)} schemas:')
+for name, generate in backends.items():
+    print(name, timeit(generate, number=10) / 10)
+
+obj = Building.from_dict(data)
+print('call costs:')
+for name, generate in backends.items():
+    generate()
+    assert Building.from_dict(data).to_dict() == data
+    print(name, 'from_dict',
+          timeit('fn(data)', number=100000, globals={
+              'data': data,
+              'fn': Building.from_dict
+          }), 'to_dict',
+          timeit('fn(obj)', number=100000, globals={
+              'obj': obj,
+              'fn': Building.to_dict
+          }))
+
+print('lazy generation:')
+for name, generate in (('naive', lambda: naive_generate(lazy=True)),
+                       ('ast', lambda: ast_generate(lazy=True))):
+    print(name, 'installing trampolines',
+          timeit(generate, number=10) / 10, 'first call',
+          timeit(lambda: (generate(), Building.from_dict(data)), number=10) /
+          10)
@@ -0,0 +1,81 @@
+import typing as t
+from timeit import timeit
+import tracemalloc
+from auto_json.schema_analyse import AutoJson, SchemaMonitor
+from auto_json.graphql_naive import generate as naive_generate
+from auto_json.graphql_ast import generate as ast_generate
+
+
+class Building(AutoJson):
+    name: str
+    floors: t.List['Floor']
+
+
+class Floor(AutoJson):
+    name: str
+    rooms: t.List['Room']
+
+
+class Room(AutoJson):
+    name: str
+    dimension_gate: t.Optional[Building]
+    bookmark: t.Dict[str, str]
+
+
+class SlotBuilding(AutoJson, slots=True):
+    name: str
+    floors: t.List['SlotFloor']
+
+
+class SlotFloor(AutoJson, slots=True):
+    name: str
+    rooms: t.List['SlotRoom']
+
+
+class SlotRoom(AutoJson, slots=True):
+    name: str
+    dimension_gate: t.Optional[SlotBuilding]
+    bookmark: t.Dict[str, str]
+
+
+SchemaMonitor.resolve(strict=True)
+
+n_floors, n_rooms = 100, 100
+data = {
+    'name':
+    'tower',
+    'floors': [{
+        'name':
+        f'f{i}',
+        'rooms': [{
+            'name': f'r{i}-{j}',
+            'dimension_gate': None,
+            'bookmark': {}
+        } for j in range(n_rooms)]
+    } for i in range(n_floors)]
+}
+n_objects = 1 + n_floors + n_floors * n_rooms
+
+
+def allocated(fn, *args):
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    ret = fn(*args)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del ret
+    return after - before
+
+
+print('==================')
+for generate_name, generate in (('naive', naive_generate), ('ast',
+                                                           ast_generate)):
+    generate()
+    for cls in (Building, SlotBuilding):
+        assert cls.from_dict(data).to_dict() == data
+        print(generate_name, cls.__name__, 'decoding costs',
+              timeit('fn(data)', number=10, globals={
+                  'data': data,
+                  'fn': cls.from_dict
+              }), 'bytes per object',
+              allocated(cls.from_dict, data) / n_objects)
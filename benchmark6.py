@@ -0,0 +1,89 @@
+import typing as t
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from auto_json.schema_analyse import AutoJson, SchemaMonitor
+from auto_json.graphql_ast import generate as ast_generate
+
+
+class Building(AutoJson):
+    name: str
+    floors: t.List['Floor']
+
+
+class Floor(AutoJson):
+    name: str
+    rooms: t.List['Room']
+
+
+class Room(AutoJson):
+    name: str
+    dimension_gate: t.Optional[Building]
+    bookmark: t.Dict[str, str]
+
+
+SchemaMonitor.resolve(strict=True)
+ast_generate()
+
+with open('data.json', 'rb') as fr:
+    data = json.load(fr)
+
+n_records = 20000
+directory = tempfile.mkdtemp()
+json_path = os.path.join(directory, 'buildings.json')
+ndjson_path = os.path.join(directory, 'buildings.ndjson')
+record = json.dumps(data)
+with open(json_path, 'w') as f:
+    f.write('[' + ','.join([record] * n_records) + ']')
+with open(ndjson_path, 'w') as f:
+    f.write('\n'.join([record] * n_records) + '\n')
+
+
+def load_all(path):
+    with open(path, 'rb') as f:
+        return sum(1 for _ in map(Building.from_dict, json.load(f)))
+
+
+def load_all_ndjson(path):
+    with open(path, 'rb') as f:
+        return sum(1 for line in f
+                   for _ in [Building.from_dict(json.loads(line))])
+
+
+def stream(path):
+    with open(path, 'rb') as f:
+        return sum(1 for _ in Building.iter_from_json(f))
+
+
+def stream_ndjson(path):
+    with open(path, 'rb') as f:
+        return sum(1 for _ in Building.iter_from_ndjson(f))
+
+
+def measure(fn, path):
+    start = time.perf_counter()
+    assert fn(path) == n_records
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+print('==================')
+print('file size', os.path.getsize(json_path))
+for title, fn, path in [
+    ('json.load + from_dict', load_all, json_path),
+    ('iter_from_json', stream, json_path),
+    ('readline + from_dict', load_all_ndjson, ndjson_path),
+    ('iter_from_ndjson', stream_ndjson, ndjson_path),
+]:
+    elapsed, peak = measure(fn, path)
+    print(title, 'costs', elapsed, 'peak memory', peak)
+
+os.remove(json_path)
+os.remove(ndjson_path)
+os.rmdir(directory)
@@ -0,0 +1,64 @@
+import typing as t
+import json
+import time
+from auto_json.schema_analyse import AutoJson, SchemaMonitor
+from auto_json.graphql_ast import generate as ast_generate
+from auto_json import parallel
+
+
+class Building(AutoJson):
+    name: str
+    floors: t.List['Floor']
+
+
+class Floor(AutoJson):
+    name: str
+    rooms: t.List['Room']
+
+
+class Room(AutoJson):
+    name: str
+    dimension_gate: t.Optional[Building]
+    bookmark: t.Dict[str, str]
+
+
+SchemaMonitor.resolve(strict=True)
+ast_generate()
+
+with open('data.json', 'rb') as fr:
+    data = json.load(fr)
+
+n_records = 5000
+records = [data] * n_records
+
+
+def measure(f, *args, **kwargs):
+    start = time.perf_counter()
+    ret = f(*args, **kwargs)
+    return time.perf_counter() - start, ret
+
+
+def count_rooms(building: Building) -> int:
+    return sum(len(floor.rooms) for floor in building.floors)
+
+
+if __name__ == '__main__':
+    print('==================')
+    n_rooms = count_rooms(Building.from_dict(data))
+    elapsed, objs = measure(lambda: list(map(Building.from_dict, records)))
+    print('in-process from_dict costs', elapsed)
+    elapsed, _ = measure(lambda: list(map(Building.to_dict, objs)))
+    print('in-process to_dict costs', elapsed)
+    for workers in (1, 2, 4, 8):
+        # start the pool before measuring.
+        Building.from_dict_many(
+            records[:10], workers, threshold=0, fn=count_rooms)
+        elapsed, counts = measure(
+            Building.from_dict_many,
+            records,
+            workers,
+            threshold=0,
+            fn=count_rooms)
+        assert counts == [n_rooms] * n_records
+        print(workers, 'workers from_dict_many costs', elapsed)
+        parallel.shutdown()
@@ -0,0 +1,91 @@
+import typing as t
+import asyncio
+import json
+import time
+from auto_json.schema_analyse import AutoJson, SchemaMonitor
+from auto_json.graphql_ast import generate as ast_generate
+
+
+class Building(AutoJson):
+    name: str
+    floors: t.List['Floor']
+
+
+class Floor(AutoJson):
+    name: str
+    rooms: t.List['Room']
+
+
+class Room(AutoJson):
+    name: str
+    dimension_gate: t.Optional[Building]
+    bookmark: t.Dict[str, str]
+
+
+SchemaMonitor.resolve(strict=True)
+ast_generate()
+
+with open('data.json', 'rb') as fr:
+    data = json.load(fr)
+
+n_records = 5000
+buildings = [Building.from_dict(data) for _ in range(n_records)]
+
+
+async def readline_decode(reader, framing):
+    n = 0
+    while True:
+        line = await reader.readline()
+        if not line:
+            return n
+        Building.from_dict(json.loads(line.decode('utf-8')))
+        n += 1
+
+
+async def aiter_decode(reader, framing):
+    n = 0
+    async for _ in Building.aiter_decode(reader, framing):
+        n += 1
+    return n
+
+
+async def write_each(writer, framing):
+    for building in buildings:
+        writer.write(json.dumps(building.to_dict()).encode() + b'\n')
+        await writer.drain()
+
+
+async def aencode_to(writer, framing):
+    await Building.aencode_to(writer, buildings, framing)
+
+
+async def measure(encode, decode, framing):
+    done = asyncio.Future()
+
+    async def handle(reader, writer):
+        done.set_result(await decode(reader, framing))
+        writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    await encode(writer, framing)
+    writer.write_eof()
+    assert await done == n_records
+    elapsed = time.perf_counter() - start
+    writer.close()
+    server.close()
+    await server.wait_closed()
+    return elapsed
+
+
+loop = asyncio.get_event_loop()
+print('==================')
+for title, encode, decode, framing in [
+    ('write + readline', write_each, readline_decode, 'ndjson'),
+    ('aencode_to + aiter_decode(ndjson)', aencode_to, aiter_decode, 'ndjson'),
+    ('aencode_to + aiter_decode(length)', aencode_to, aiter_decode, 'length'),
+]:
+    elapsed = loop.run_until_complete(measure(encode, decode, framing))
+    print(title, 'costs', elapsed)
@@ -0,0 +1,89 @@
+import typing as t
+import time
+from auto_json.schema_analyse import AutoJson, SchemaMonitor
+from auto_json.graphql_ast import (InlinePolicy, generate_method_maker,
+                                   count_statements, install, unparse)
+
+# a schema of 300 types: 5 layers of 60 types, each referring to 3 types of
+# the next layer and to a `Meta` type shared by all.
+n_layers = 5
+width = 60
+fanout = 3
+
+
+class Meta(AutoJson):
+    id: int
+    tags: t.List[str]
+
+
+def type_name(layer, i):
+    return f'T{layer}_{i}'
+
+
+for layer in reversed(range(n_layers)):
+    for i in range(width):
+        annotations = {'name': str, 'value': float, 'meta': Meta}
+        if layer + 1 < n_layers:
+            for k in range(fanout):
+                annotations[f'child{k}'] = type_name(layer + 1,
+                                                     (i + k) % width)
+        name = type_name(layer, i)
+        globals()[name] = type(AutoJson)(name, (AutoJson, ), {
+            '__annotations__': annotations,
+            '__qualname__': name
+        })
+
+SchemaMonitor.resolve(strict=True)
+
+
+def make_data(layer, i):
+    ret = {'name': type_name(layer, i), 'value': 1.5,
+           'meta': {'id': i, 'tags': ['a', 'b']}}
+    if layer + 1 < n_layers:
+        for k in range(fanout):
+            ret[f'child{k}'] = make_data(layer + 1, (i + k) % width)
+    return ret
+
+
+data = make_data(0, 0)
+root = globals()[type_name(0, 0)]
+n_calls = 200
+
+print('==================')
+for title, policy in [
+    ('inline all(default)', InlinePolicy()),
+    ('max_depth=2', InlinePolicy(max_depth=2)),
+    ('max_depth=0', InlinePolicy(max_depth=0)),
+    ('max_statements=300', InlinePolicy(max_statements=300)),
+    ('max_sites=10', InlinePolicy(max_sites=10)),
+    ('max_depth=2, max_sites=10', InlinePolicy(max_depth=2, max_sites=10)),
+]:
+    start = time.perf_counter()
+    types, mod = generate_method_maker(policy=policy)
+    ctx = {each.__name__: each for each in types}
+    code = compile(mod, '<generated module>', 'exec')
+    exec(code, ctx)
+    install(ctx['make'](*types))
+    compile_time = time.perf_counter() - start
+
+    source_size = len(unparse(mod))
+    statements = count_statements(mod.body)
+
+    obj = root.from_dict(data)
+    assert obj.to_dict() == data
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        root.from_dict(data)
+    decode_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        obj.to_dict()
+    encode_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        obj.to_json()
+    json_time = time.perf_counter() - start
+    print(f'{title}: source {source_size} chars, {statements} statements, '
+          f'generate + compile costs {compile_time:.3f}, '
+          f'from_dict costs {decode_time:.4f}, to_dict costs {encode_time:.4f}, '
+          f'to_json costs {json_time:.4f}')
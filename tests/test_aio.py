@@ -0,0 +1,128 @@
+import asyncio
+import typing as t
+import unittest
+from auto_json.schema_analyse import AutoJson, SchemaMonitor
+from auto_json.aio import length_prefix
+from auto_json.graphql_naive import generate
+
+
+class AioRoom(AutoJson):
+    name: str
+    area: float
+
+
+class AioFloor(AutoJson):
+    name: str
+    rooms: t.List[AioRoom]
+
+
+SchemaMonitor.resolve(strict=True)
+
+
+def floor(i: int) -> AioFloor:
+    return AioFloor(
+        name=f'f{i}',
+        rooms=[AioRoom(name=f'r{j}', area=j / 2) for j in range(i % 4)])
+
+
+class TestAio(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        generate()
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def serve(self, send, **kwargs) -> list:
+        """
+        run a server decoding `AioFloor`s and a client calling `send(writer)`,
+        :return: the decoded objects.
+        """
+        got = []
+
+        async def handle(reader, writer):
+            try:
+                async for each in AioFloor.aiter_decode(reader, **kwargs):
+                    got.append(each)
+            except ValueError as e:
+                got.append(e)
+            writer.close()
+
+        async def main():
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            await send(writer)
+            writer.write_eof()
+            await reader.read()
+            writer.close()
+            server.close()
+            await server.wait_closed()
+
+        self.loop.run_until_complete(main())
+        return got
+
+    def test_round_trip(self):
+        floors = [floor(i) for i in range(500)]
+
+        async def agen():
+            for each in floors:
+                yield each
+
+        for framing in ('ndjson', 'length'):
+            for objs in (floors, agen()):
+                n = []
+
+                async def send(writer):
+                    n.append(await AioFloor.aencode_to(
+                        writer, objs, framing, chunk_size=100))
+
+                got = self.serve(
+                    send, framing=framing, chunk_size=7, yield_every=3)
+                self.assertEqual(n, [500])
+                self.assertEqual([each.to_dict() for each in got],
+                                 [each.to_dict() for each in floors])
+
+    def test_ndjson_blank_lines_and_tail(self):
+        async def send(writer):
+            writer.write(b'\n{"name": "a", "rooms": []}\n\n'
+                         b'{"name": "b", "rooms": []}')
+
+        got = self.serve(send, chunk_size=5)
+        self.assertEqual([each.name for each in got], ['a', 'b'])
+
+    def test_max_frame(self):
+        async def send_length(writer):
+            writer.write(length_prefix.pack(1 << 20) + b'{')
+
+        got = self.serve(send_length, framing='length', max_frame=1024)
+        self.assertEqual(len(got), 1)
+        self.assertIsInstance(got[0], ValueError)
+
+        async def send_ndjson(writer):
+            writer.write(b'{"name": "a", "rooms": []}\n' + b' ' * 4096)
+
+        got = self.serve(send_ndjson, chunk_size=512, max_frame=1024)
+        self.assertEqual(got[0].name, 'a')
+        self.assertIsInstance(got[1], ValueError)
+
+    def test_incomplete_frame(self):
+        async def send(writer):
+            writer.write(length_prefix.pack(100) + b'{}')
+
+        got = self.serve(send, framing='length')
+        self.assertIsInstance(got[0], ValueError)
+
+    def test_unknown_framing(self):
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(
+                AioFloor.aencode_to(None, [], framing='xml'))
+
+
+if __name__ == '__main__':
+    unittest.main()
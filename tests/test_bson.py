@@ -0,0 +1,162 @@
+import struct
+import typing as t
+import unittest
+from auto_json.schema_analyse import AutoJson, SchemaMonitor
+from auto_json import graphql_bson
+from auto_json.graphql_naive import generate
+
+
+class BsonRoom(AutoJson):
+    name: str
+    area: float
+    level: int
+    note: t.Optional[str]
+
+
+class BsonFloor(AutoJson):
+    name: str
+    rooms: t.List[BsonRoom]
+    tags: t.Dict[str, t.List[int]]
+    by_number: t.Dict[int, BsonRoom]
+    lobby: t.Optional[BsonRoom]
+    upper: t.Optional['BsonFloor']
+
+
+class BsonCat(AutoJson):
+    meow: str
+
+
+class BsonDog(AutoJson):
+    bark: int
+
+
+class BsonZoo(AutoJson):
+    mixed: t.List[t.Union[BsonCat, BsonDog, int, str]]
+    pet: t.Optional[t.Union[BsonCat, BsonDog]]
+
+
+SchemaMonitor.resolve(strict=True)
+
+
+def element(code: int, key: str, payload: bytes = b'') -> bytes:
+    return bytes([code]) + key.encode() + b'\x00' + payload
+
+
+def document(*elements: bytes) -> bytes:
+    body = b''.join(elements)
+    return struct.pack('<i', len(body) + 5) + body + b'\x00'
+
+
+def string(value: str) -> bytes:
+    value = value.encode()
+    return struct.pack('<i', len(value) + 1) + value + b'\x00'
+
+
+def room(**kwargs) -> BsonRoom:
+    return BsonRoom(**{'area': 1.5, 'level': 1, 'note': None, **kwargs})
+
+
+def round_trip(obj):
+    return obj.__class__.from_bson(obj.to_bson()).to_dict()
+
+
+class TestBson(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        generate()
+        graphql_bson.generate()
+
+    def test_concrete(self):
+        obj = room(name='r', area=-0.25, level=2**40, note='n')
+        self.assertEqual(round_trip(obj), obj.to_dict())
+
+    def test_null(self):
+        obj = room(name='r', note=None)
+        self.assertIsNone(BsonRoom.from_bson(obj.to_bson()).note)
+
+    def test_nested(self):
+        upper = BsonFloor(
+            name='upper', rooms=[], tags={}, by_number={}, lobby=None,
+            upper=None)
+        obj = BsonFloor(
+            name='f',
+            rooms=[room(name='a'), room(name='b', note='x')],
+            tags={'even': [0, 2], 'none': []},
+            by_number={1: room(name='c')},
+            lobby=room(name='lobby'),
+            upper=upper)
+        self.assertEqual(round_trip(obj), obj.to_dict())
+        self.assertEqual(round_trip(upper), upper.to_dict())
+
+    def test_union(self):
+        obj = BsonZoo(
+            mixed=[BsonCat(meow='m'), BsonDog(bark=3), 4, 's'],
+            pet=BsonDog(bark=1))
+        back = BsonZoo.from_bson(obj.to_bson())
+        self.assertEqual(
+            [each.__class__ for each in back.mixed],
+            [BsonCat, BsonDog, int, str])
+        self.assertEqual(back.to_dict(), obj.to_dict())
+        obj.pet = None
+        self.assertEqual(round_trip(obj), obj.to_dict())
+
+    def test_union_discriminator(self):
+        SchemaMonitor.discriminator = '__typename'
+        try:
+            graphql_bson.generate()
+            obj = BsonZoo(mixed=[BsonDog(bark=3), BsonCat(meow='m')], pet=None)
+            back = BsonZoo.from_bson(obj.to_bson())
+            self.assertEqual(
+                [each.__class__ for each in back.mixed], [BsonDog, BsonCat])
+            self.assertEqual(back.mixed[0].bark, 3)
+        finally:
+            SchemaMonitor.discriminator = None
+            graphql_bson.generate()
+
+    def test_union_unknown_member(self):
+        with self.assertRaises(TypeError):
+            BsonZoo(mixed=[1.5], pet=None).to_bson()
+
+    def test_fields_out_of_order(self):
+        data = document(
+            element(graphql_bson.BSON_NULL, 'note'),
+            element(graphql_bson.BSON_INT32, 'level', struct.pack('<i', 7)),
+            element(graphql_bson.BSON_STRING, 'unknown', string('skipped')),
+            element(graphql_bson.BSON_DOUBLE, 'area', struct.pack('<d', 2.0)),
+            element(graphql_bson.BSON_STRING, 'name', string('r')))
+        self.assertEqual(
+            BsonRoom.from_bson(data).to_dict(),
+            {'name': 'r', 'area': 2.0, 'level': 7, 'note': None})
+
+    def test_unknown_key_after_fields(self):
+        data = document(
+            element(graphql_bson.BSON_STRING, 'name', string('r')),
+            element(graphql_bson.BSON_DOUBLE, 'area', struct.pack('<d', 2.0)),
+            element(graphql_bson.BSON_INT64, 'level', struct.pack('<q', 7)),
+            element(graphql_bson.BSON_NULL, 'note'),
+            element(graphql_bson.BSON_STRING, 'unknown', string('skipped')))
+        self.assertEqual(
+            BsonRoom.from_bson(data).to_dict(),
+            {'name': 'r', 'area': 2.0, 'level': 7, 'note': None})
+
+    def test_missing_key(self):
+        data = document(
+            element(graphql_bson.BSON_STRING, 'name', string('r')),
+            element(graphql_bson.BSON_DOUBLE, 'area', struct.pack('<d', 2.0)),
+            element(graphql_bson.BSON_NULL, 'note'))
+        with self.assertRaises(KeyError) as ctx:
+            BsonRoom.from_bson(data)
+        self.assertEqual(ctx.exception.args, ('level', ))
+
+    def test_bad_type_code(self):
+        data = document(
+            element(graphql_bson.BSON_INT32, 'name', struct.pack('<i', 1)),
+            element(graphql_bson.BSON_DOUBLE, 'area', struct.pack('<d', 2.0)),
+            element(graphql_bson.BSON_INT32, 'level', struct.pack('<i', 7)),
+            element(graphql_bson.BSON_NULL, 'note'))
+        with self.assertRaisesRegex(TypeError, 'expected bson element type'):
+            BsonRoom.from_bson(data)
+
+
+if __name__ == '__main__':
+    unittest.main()